@@ -0,0 +1,336 @@
+"""
+HTTP / WebSocket serving API for concurrent text sessions.
+
+    POST /chat              {"channel_id", "question", "user_id"?, "username"?} -> {"answer", ...}
+    POST /chat/stream       same body, Server-Sent Events: token* then done (or error)
+    WS   /ws/{channel_id}   {"question", ...} per message -> {"type": "token"|"done"|"error", ...}
+    GET  /health/live       process is up
+    GET  /health/ready      scheduler load, crew pool and Redis status (503 when saturated)
+
+Crew runs execute on a bounded thread pool (API_WORKERS). Questions of the same
+channel run one after the other in arrival order, and different channels run in
+parallel. Admission is checked before any work starts: a channel with
+API_CHANNEL_MAX_PENDING questions in flight gets 429. The whole deployment
+rejects with 503 + Retry-After beyond API_MAX_PENDING questions in flight, so
+overload turns into fast refusals instead of unbounded queues.
+
+    serve_api                                 # uvicorn on API_HOST:API_PORT
+    uvicorn --factory monkedh.api:create_app --workers 4   # one scheduler + crew pool per process
+    MONKEDH_STUB_LLM=1 serve_api              # stubbed answers, no crewai / Azure needed
+    python -m monkedh.api_loadtest --users 50 --questions 4
+"""
+import asyncio
+import functools
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", 8000))
+API_WORKERS = int(os.getenv("API_WORKERS", 4))                          # Exécutions crew simultanées par processus
+API_MAX_PENDING = int(os.getenv("API_MAX_PENDING", 64))                 # Questions en cours + en attente avant 503
+API_CHANNEL_MAX_PENDING = int(os.getenv("API_CHANNEL_MAX_PENDING", 3))  # Questions en attente par canal avant 429
+API_RETRY_AFTER = 5                # Secondes suggérées au client refusé (en-tête Retry-After)
+API_KEEPALIVE_SECONDS = 15         # Commentaire SSE envoyé pendant l'attente (proxies, load balancers)
+QUESTION_MAX_CHARS = 2000
+
+STUB_LLM = os.getenv("MONKEDH_STUB_LLM", "").lower() in ("1", "true", "on")
+STUB_LLM_LATENCY = float(os.getenv("STUB_LLM_LATENCY", 1.5))         # Délai avant le premier token (s)
+STUB_LLM_TOKEN_DELAY = float(os.getenv("STUB_LLM_TOKEN_DELAY", 0.02)) # Délai entre deux tokens (s)
+
+AnswerFn = Callable[[str, str, str, str, Optional[Callable[[str], None]]], str]
+
+
+class ChatRequest(BaseModel):
+    channel_id: str = Field(..., min_length=1, max_length=128)
+    question: str = Field(..., min_length=1, max_length=QUESTION_MAX_CHARS)
+    user_id: Optional[str] = None
+    username: str = "Temoin"
+
+
+class Overloaded(Exception):
+    """Admission refused: status_code 429 (channel) or 503 (deployment)"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def stub_answer(channel_id: str, user_id: str, username: str, question: str, on_token=None) -> str:
+    """Stand-in for the crew in load tests: fixed latency, then word-by-word tokens"""
+    time.sleep(STUB_LLM_LATENCY)
+    answer = (
+        f"Réponse simulée pour « {question[:80]} ». "
+        "En cas d'urgence vitale, APPELEZ IMMÉDIATEMENT LE 190 (SAMU)."
+    )
+    for word in answer.split(" "):
+        if on_token:
+            on_token(word + " ")
+        time.sleep(STUB_LLM_TOKEN_DELAY)
+    return answer
+
+
+def crew_answer_fn(workers: int = API_WORKERS) -> AnswerFn:
+    """process_question backed by a crew pool sized to the worker pool"""
+    from monkedh.crew_pool import CrewPool
+    from monkedh.main import process_question
+
+    crew_pool = CrewPool(size=workers)
+    crew_pool.warm()
+
+    def answer(channel_id, user_id, username, question, on_token=None):
+        return process_question(crew_pool, channel_id, user_id, username, question, on_token=on_token)
+
+    answer.crew_pool = crew_pool
+    return answer
+
+
+class SessionScheduler:
+    """Bounded crew execution with per-channel ordering and admission control (event-loop side)."""
+
+    def __init__(
+        self,
+        answer_fn: AnswerFn,
+        workers: int = API_WORKERS,
+        max_pending: int = API_MAX_PENDING,
+        channel_max_pending: int = API_CHANNEL_MAX_PENDING,
+    ):
+        self.answer_fn = answer_fn
+        self.workers = workers
+        self.max_pending = max_pending
+        self.channel_max_pending = channel_max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crew")
+        self._slots = asyncio.Semaphore(workers)  # Un canal attend ici plutôt que dans la file de l'executor
+        # Counters and locks are only touched from the event loop: no thread lock needed
+        self._channel_locks: Dict[str, asyncio.Lock] = {}
+        self._channel_pending: Dict[str, int] = {}
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+
+    @property
+    def saturated(self) -> bool:
+        return self._pending >= self.max_pending
+
+    def submit(self, request: ChatRequest, on_token: Optional[Callable[[str], None]] = None) -> "asyncio.Task":
+        """
+        Admit a question and schedule it; raises Overloaded when refused.
+
+        The returned task owns the channel slot until the crew run finishes, even if
+        the client disconnects: the next question of the channel never overtakes it.
+        """
+        channel_pending = self._channel_pending.get(request.channel_id, 0)
+        if self.saturated:
+            self._rejected += 1
+            raise Overloaded(503, "Service saturé, réessayez dans quelques instants")
+        if channel_pending >= self.channel_max_pending:
+            self._rejected += 1
+            raise Overloaded(429, "Trop de questions en attente sur ce canal")
+
+        self._pending += 1
+        self._channel_pending[request.channel_id] = channel_pending + 1
+        return asyncio.ensure_future(self._run_ordered(request, on_token))
+
+    async def _run_ordered(self, request: ChatRequest, on_token) -> str:
+        channel_id = request.channel_id
+        lock = self._channel_locks.setdefault(channel_id, asyncio.Lock())
+        try:
+            async with lock, self._slots:  # asyncio.Lock is FIFO: arrival order within a channel
+                self._running += 1
+                try:
+                    call = functools.partial(
+                        self.answer_fn, channel_id, request.user_id or str(uuid.uuid4()),
+                        request.username, request.question, on_token,
+                    )
+                    return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+                finally:
+                    self._running -= 1
+                    self._completed += 1
+        finally:
+            self._pending -= 1
+            remaining = self._channel_pending[channel_id] - 1
+            if remaining:
+                self._channel_pending[channel_id] = remaining
+            else:
+                del self._channel_pending[channel_id]
+                self._channel_locks.pop(channel_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "running": self._running,
+            "queued": self._pending - self._running,
+            "max_pending": self.max_pending,
+            "active_channels": len(self._channel_pending),
+            "completed": self._completed,
+            "rejected": self._rejected,
+        }
+
+
+async def _run_events(
+    scheduler: SessionScheduler, request: ChatRequest
+) -> Tuple["asyncio.Task", AsyncIterator[Tuple[str, Any]]]:
+    """
+    Submit a question with token forwarding (raises Overloaded when refused).
+
+    Returns the task and an iterator of ("token", text), ("keepalive", None)
+    and finally ("done", answer) or ("error", detail).
+    """
+    loop = asyncio.get_running_loop()
+    events: "asyncio.Queue" = asyncio.Queue()
+
+    def on_token(token: str) -> None:  # Worker thread -> event loop
+        loop.call_soon_threadsafe(events.put_nowait, ("token", token))
+
+    task = scheduler.submit(request, on_token)
+    # Runs after the tokens already queued by the worker thread
+    task.add_done_callback(lambda _: events.put_nowait(("end", None)))
+
+    async def iterate():
+        while True:
+            try:
+                kind, token = await asyncio.wait_for(events.get(), timeout=API_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield "keepalive", None
+                continue
+            if kind == "token":
+                yield kind, token
+            elif task.exception() is not None:
+                yield "error", str(task.exception())
+                return
+            else:
+                yield "done", task.result()
+                return
+
+    return task, iterate()
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _overloaded_response(exc: Overloaded) -> JSONResponse:
+    return JSONResponse(
+        {"detail": exc.detail}, status_code=exc.status_code, headers={"Retry-After": str(API_RETRY_AFTER)}
+    )
+
+
+def create_app(answer_fn: Optional[AnswerFn] = None, **scheduler_options) -> FastAPI:
+    """
+    Build the API around an answer function (defaults to the crew, or the stub with MONKEDH_STUB_LLM=1).
+
+    answer_fn(channel_id, user_id, username, question, on_token) -> answer runs on a worker thread.
+    """
+    if answer_fn is None:
+        answer_fn = stub_answer if STUB_LLM else crew_answer_fn(scheduler_options.get("workers", API_WORKERS))
+    scheduler = SessionScheduler(answer_fn, **scheduler_options)
+    app = FastAPI(title="Monkedh - assistant d'urgence", version="0.1.0")
+    app.state.scheduler = scheduler
+
+    @app.post("/chat")
+    async def chat(request: ChatRequest):
+        started = time.perf_counter()
+        try:
+            task = scheduler.submit(request)
+        except Overloaded as exc:
+            return _overloaded_response(exc)
+        answer = await asyncio.shield(task)
+        return {
+            "channel_id": request.channel_id,
+            "answer": answer,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    @app.post("/chat/stream")
+    async def chat_stream(request: ChatRequest):
+        try:
+            _, events = await _run_events(scheduler, request)
+        except Overloaded as exc:
+            return _overloaded_response(exc)
+
+        async def event_stream():
+            started = time.perf_counter()
+            async for kind, value in events:
+                if kind == "keepalive":
+                    yield ": keep-alive\n\n"
+                elif kind == "token":
+                    yield _sse("token", {"text": value})
+                elif kind == "error":
+                    yield _sse("error", {"detail": value})
+                else:
+                    yield _sse("done", {
+                        "answer": value, "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+                    })
+
+        return StreamingResponse(
+            event_stream(), media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.websocket("/ws/{channel_id}")
+    async def chat_websocket(websocket: WebSocket, channel_id: str):
+        """One question at a time per connection; the channel comes from the URL"""
+        await websocket.accept()
+        try:
+            while True:
+                message = await websocket.receive_json()
+                try:
+                    request = ChatRequest(**{**message, "channel_id": channel_id})
+                    _, events = await _run_events(scheduler, request)
+                except Overloaded as exc:
+                    await websocket.send_json({
+                        "type": "error", "status": exc.status_code, "detail": exc.detail,
+                        "retry_after": API_RETRY_AFTER,
+                    })
+                    continue
+                except Exception as exc:
+                    await websocket.send_json({"type": "error", "status": 422, "detail": str(exc)})
+                    continue
+                async for kind, value in events:
+                    if kind == "token":
+                        await websocket.send_json({"type": "token", "text": value})
+                    elif kind == "done":
+                        await websocket.send_json({"type": "done", "answer": value})
+                    elif kind == "error":
+                        await websocket.send_json({"type": "error", "status": 500, "detail": value})
+        except WebSocketDisconnect:
+            pass
+
+    @app.get("/health/live")
+    async def health_live():
+        return {"status": "ok"}
+
+    @app.get("/health/ready")
+    async def health_ready():
+        report: Dict[str, Any] = {"scheduler": scheduler.get_stats(), "stub_llm": answer_fn is stub_answer}
+        crew_pool = getattr(answer_fn, "crew_pool", None)
+        if crew_pool is not None:
+            report["crew_pool"] = crew_pool.get_stats()
+        try:
+            from monkedh.tools.redis_storage import get_redis_memory
+
+            memory = get_redis_memory()
+            client = await asyncio.to_thread(lambda: memory.redis_client)
+            report["redis"] = "ok" if client is not None else "degraded"
+        except Exception as exc:
+            report["redis"] = f"unavailable: {exc}"
+        report["status"] = "saturated" if scheduler.saturated else "ok"
+        return JSONResponse(report, status_code=503 if scheduler.saturated else 200)
+
+    return app
+
+
+def serve():
+    """Command line entry point: uvicorn on API_HOST:API_PORT"""
+    import uvicorn
+
+    uvicorn.run(create_app(), host=API_HOST, port=API_PORT)
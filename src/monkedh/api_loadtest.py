@@ -0,0 +1,102 @@
+"""
+Local load test of the serving API through /chat/stream.
+
+Each simulated user owns a channel and asks its questions one after the other,
+so concurrency = number of users. Reports time to first token, total latency
+and refused requests (429 / 503).
+
+    MONKEDH_STUB_LLM=1 STUB_LLM_LATENCY=1.5 serve_api &
+    python -m monkedh.api_loadtest --users 50 --questions 4
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+
+QUESTIONS = (
+    "Comment faire un massage cardiaque sur un adulte ?",
+    "Mon enfant s'est brûlé la main avec de l'eau chaude, que faire ?",
+    "Comment mettre quelqu'un en position latérale de sécurité ?",
+    "Une personne s'étouffe au restaurant, quels gestes faire ?",
+)
+
+
+def _ask(base_url: str, channel_id: str, question: str, timeout: float) -> Dict[str, Optional[float]]:
+    """One streamed question: {"status", "ttft", "total"} (seconds)"""
+    started = time.perf_counter()
+    first_token = None
+    try:
+        with requests.post(
+            f"{base_url}/chat/stream", json={"channel_id": channel_id, "question": question},
+            stream=True, timeout=timeout,
+        ) as response:
+            if response.status_code != 200:
+                return {"status": response.status_code, "ttft": None, "total": time.perf_counter() - started}
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: ") and event == "token" and first_token is None:
+                    first_token = time.perf_counter() - started
+                elif line.startswith("data: ") and event == "error":
+                    return {"status": 500, "ttft": first_token, "total": time.perf_counter() - started}
+                elif line.startswith("data: ") and event == "done":
+                    break
+        return {"status": 200, "ttft": first_token, "total": time.perf_counter() - started}
+    except requests.RequestException:
+        return {"status": 0, "ttft": first_token, "total": time.perf_counter() - started}
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))] if values else 0.0
+
+
+def run_load_test(base_url: str, users: int, questions: int, timeout: float = 120) -> Dict:
+    results: List[Dict] = []
+    lock = threading.Lock()
+
+    def user_session(_):
+        channel_id = f"loadtest-{uuid.uuid4().hex[:8]}"
+        for i in range(questions):
+            result = _ask(base_url, channel_id, QUESTIONS[i % len(QUESTIONS)], timeout)
+            with lock:
+                results.append(result)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        list(pool.map(user_session, range(users)))
+    elapsed = time.perf_counter() - started
+
+    ok = [r for r in results if r["status"] == 200]
+    ttft = [r["ttft"] for r in ok if r["ttft"] is not None]
+    total = [r["total"] for r in ok]
+    statuses: Dict[str, int] = {}
+    for result in results:
+        statuses[str(result["status"])] = statuses.get(str(result["status"]), 0) + 1
+    return {
+        "users": users,
+        "requests": len(results),
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "ttft_p50_s": round(statistics.median(ttft), 3) if ttft else None,
+        "ttft_p95_s": round(_percentile(ttft, 0.95), 3) if ttft else None,
+        "total_p50_s": round(statistics.median(total), 3) if total else None,
+        "total_p95_s": round(_percentile(total, 0.95), 3) if total else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Test de charge de l'API (SSE)")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=20, help="Utilisateurs simultanés (un canal chacun)")
+    parser.add_argument("--questions", type=int, default=3, help="Questions successives par utilisateur")
+    args = parser.parse_args()
+    print(json.dumps(run_load_test(args.url, args.users, args.questions), indent=2))
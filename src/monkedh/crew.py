@@ -30,13 +30,16 @@ embedder_config = {
             "dimensions": 1536
         }
 
+# Token streaming: final-answer chunks are forwarded to the console / TTS (tools/answer_streaming.py)
+LLM_STREAMING = os.getenv("LLM_STREAMING", "on").lower() not in ("off", "0", "false")
+
 # Azure OpenAI LLM
 llm = LLM(
     model=os.getenv("model"),
     api_key=os.getenv("AZURE_API_KEY"),
     base_url=os.getenv('AZURE_API_BASE'),
     api_version=os.getenv("AZURE_API_VERSION"),
-    stream=False,
+    stream=LLM_STREAMING,
 )
 
 # TokenFactory LLM (Llama-3.1-70B) - without http_client
@@ -0,0 +1,178 @@
+"""
+Pool of prebuilt Monkedh crews reused across questions.
+
+Building a crew constructs the Redis storage, the short-term memory, the agent,
+its tool bindings and the Crew object: that cost used to be paid on every
+question. The pool builds up to CREW_POOL_SIZE crews per worker process (on
+demand, or upfront with warm()), lends one per run, binds its short-term
+memory to the caller's channel and resets per-run state before the crew goes
+back to the pool. A crew whose run raised is discarded: its slot is freed and
+a waiting caller builds the replacement.
+
+Benchmark (construction overhead per question, no LLM call):
+    python -m monkedh.crew_pool --iterations 20
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+CREW_POOL_SIZE = int(os.getenv("CREW_POOL_SIZE", 2))   # Crews préconstruits par processus worker
+
+
+def _default_builder():
+    from monkedh.crew import Monkedh
+
+    # One CrewBase instance per crew: agents and tasks are memoized per instance,
+    # so crews built from the same factory would share them
+    return Monkedh().crew()
+
+
+def bind_crew_channel(crew, channel_id: str) -> None:
+    """Point the crew's short-term memory at a channel"""
+    memory = getattr(crew, "short_term_memory", None)
+    storage = getattr(memory, "storage", None)
+    if storage is not None and hasattr(storage, "bind_channel"):
+        storage.bind_channel(channel_id)
+
+
+def reset_crew(crew) -> None:
+    """Drop the state a run leaves on a crew so the next channel starts clean"""
+    for task in getattr(crew, "tasks", []):
+        task.output = None
+    for agent in getattr(crew, "agents", []):
+        if hasattr(agent, "tools_results"):
+            agent.tools_results = []
+    cache_handler = getattr(crew, "_cache_handler", None)
+    if cache_handler is not None and hasattr(cache_handler, "_cache"):
+        cache_handler._cache.clear()  # Résultats d'outils d'un autre canal
+
+
+class CrewPool:
+    """Fixed-size pool of reusable crews, one run at a time per crew."""
+
+    def __init__(self, builder: Optional[Callable[[], Any]] = None, size: int = CREW_POOL_SIZE):
+        """
+        Args:
+            builder: Callable returning a new Crew (defaults to Monkedh().crew())
+            size: Maximum number of crews built by this process
+        """
+        self.builder = builder or _default_builder
+        self.size = max(1, size)
+        self._idle: List[Any] = []  # Pile: le dernier crew rendu est le plus « chaud »
+        self._created = 0
+        self._lock = threading.Lock()
+        # Signalled when a crew is returned or a slot is freed by a failed run/build
+        self._available = threading.Condition(self._lock)
+        self._build_seconds = 0.0
+        self._runs = 0
+        self._discarded = 0
+
+    def _build(self):
+        started = time.perf_counter()
+        crew = self.builder()
+        with self._lock:
+            self._build_seconds += time.perf_counter() - started
+        return crew
+
+    def warm(self) -> int:
+        """Build every missing crew now instead of on first use; returns the number built"""
+        built = 0
+        while True:
+            with self._lock:
+                if self._created >= self.size:
+                    return built
+                self._created += 1
+            try:
+                crew = self._build()
+            except Exception:
+                self._release_slot()
+                raise
+            self._give_back(crew)
+            built += 1
+
+    def _release_slot(self, discarded: bool = False) -> None:
+        """Forget a crew that failed to build or run and wake a waiter to build its replacement"""
+        with self._available:
+            self._created -= 1
+            if discarded:
+                self._discarded += 1
+            self._available.notify()
+
+    def _give_back(self, crew) -> None:
+        with self._available:
+            self._idle.append(crew)
+            self._available.notify()
+
+    def _take(self):
+        with self._available:
+            while not self._idle and self._created >= self.size:
+                self._available.wait()  # Tous les crews sont occupés: attendre un retour ou une place libre
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+        try:
+            return self._build()
+        except Exception:
+            self._release_slot()
+            raise
+
+    @contextmanager
+    def checkout(self, channel_id: str) -> Iterator[Any]:
+        """Lend a crew bound to `channel_id`; it is reset and returned to the pool afterwards"""
+        crew = self._take()
+        try:
+            bind_crew_channel(crew, channel_id)
+            yield crew
+        except BaseException:
+            # A failed run may leave the crew half-updated: rebuild it on a later checkout
+            self._release_slot(discarded=True)
+            raise
+        with self._lock:
+            self._runs += 1
+        reset_crew(crew)
+        self._give_back(crew)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "idle": len(self._idle),
+                "runs": self._runs,
+                "discarded": self._discarded,
+                "build_seconds": round(self._build_seconds, 3),
+            }
+
+
+def benchmark(iterations: int = 20) -> Dict[str, float]:
+    """Per-question fixed cost (ms): building a crew per question vs. checking one out of the pool"""
+    from monkedh.crew import Monkedh
+
+    factory = Monkedh()
+    factory.crew()  # Premier appel: imports et chargement des outils, hors mesure
+    started = time.perf_counter()
+    for _ in range(iterations):
+        factory.crew()
+    rebuild_ms = (time.perf_counter() - started) * 1000 / iterations
+
+    pool = CrewPool(size=1)
+    pool.warm()
+    started = time.perf_counter()
+    for i in range(iterations):
+        with pool.checkout(f"bench_channel_{i}"):
+            pass
+    pooled_ms = (time.perf_counter() - started) * 1000 / iterations
+
+    return {"iterations": iterations, "rebuild_ms": round(rebuild_ms, 3), "pooled_ms": round(pooled_ms, 3)}
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Coût fixe de construction du crew par question")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(benchmark(args.iterations), indent=2))
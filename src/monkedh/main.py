@@ -4,8 +4,15 @@ import warnings
 import uuid
 import argparse
 
-from monkedh.crew import Monkedh
+from monkedh.crew import Monkedh, llm
+from monkedh.crew_pool import CrewPool
+from monkedh.tools.answer_cache import SemanticAnswerCache
+from monkedh.tools.answer_streaming import SentenceSpeaker, stream_final_answer
+from monkedh.tools.conversation_summary import SUMMARY_PROMPT, ConversationSummarizer, format_turns
+from monkedh.tools.llm_limiter import PRIORITY_BACKGROUND, PRIORITY_URGENT, LLMRateLimiter, RateLimitExceeded
 from monkedh.tools.redis_storage import redis_memory
+from monkedh.tools.tool_prefetch import MISSING_IMAGE_CONTEXT, MISSING_PROTOCOL_CONTEXT, ToolPrefetcher
+from monkedh.tools.triage_router import ROUTE_CREW, TriageRouter
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
@@ -15,38 +22,124 @@ warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 # interpolate any tasks and agents information
 
 
-def process_question(crew_factory, channel_id, user_id, username, question):
-    """Process a question through the CrewAI medical agents."""
+SUMMARY_LIMITER_CHANNEL = "background:conversation_summary"  # Un canal partagé: un résumé LLM à la fois
+
+
+def summarize_with_llm(summary, turns):
+    """
+    Fold older conversation turns into the rolling summary with the crew LLM.
+
+    The call takes a background slot of the shared LLM quota, served after every
+    user turn; RateLimitExceeded makes the summarizer fall back to the extractive summary.
+    """
+    prompt = SUMMARY_PROMPT.format(summary=summary or "(aucun)", turns=format_turns(turns))
+    with llm_limiter.slot(SUMMARY_LIMITER_CHANNEL, priority=PRIORITY_BACKGROUND):
+        return llm.call([{"role": "user", "content": prompt}])
+
+
+conversation_summarizer = ConversationSummarizer(redis_memory, summarize_fn=summarize_with_llm)
+answer_cache = SemanticAnswerCache(redis_memory)
+llm_limiter = LLMRateLimiter(redis_memory)
+triage_router = TriageRouter()
+tool_prefetcher = ToolPrefetcher(Monkedh.image_tool, Monkedh.rag_tool)
+
+NO_HISTORY = "Aucun historique précédent. C'est le début de la conversation."
+BUSY_MESSAGE = "Le service est momentanément saturé. Merci de renvoyer votre question dans quelques instants."
+BUSY_URGENT_MESSAGE = (
+    "Le service est momentanément saturé. En cas d'urgence vitale, "
+    "APPELEZ IMMÉDIATEMENT LE 190 (SAMU) et restez auprès de la victime."
+)
+
+
+def store_answer(channel_id, user_id, username, question, output):
+    """Store the conversation pair and fold older turns into the summary."""
+    redis_memory.store_conversation_pair(
+        channel_id=channel_id,
+        user_id=user_id,
+        user_query=question,
+        bot_response=output,
+        username=username
+    )
+    conversation_summarizer.schedule_update(channel_id)
+
+
+def build_inputs(question, conversation_context="", prefetched=None):
+    """
+    Task inputs for a kickoff: every variable interpolated by tasks.yaml.
+
+    `prefetched` is ToolPrefetcher.collect() output; without it the agent is told
+    to call the image and RAG tools itself.
+    """
+    inputs = {
+        "question": question,
+        "conversation_history": conversation_context or NO_HISTORY,
+        "image_context": MISSING_IMAGE_CONTEXT,
+        "protocol_context": MISSING_PROTOCOL_CONTEXT,
+    }
+    inputs.update(prefetched or {})
+    return inputs
+
+
+def prefetched_inputs(question):
+    """Task inputs of a standalone question (train / test), tools prefetched like a user turn"""
+    return build_inputs(question, prefetched=tool_prefetcher.collect(tool_prefetcher.submit(question)))
+
+
+def process_question(crew_pool, channel_id, user_id, username, question, on_token=None):
+    """
+    Process a question through the CrewAI medical agents.
+
+    When on_token is given, final-answer tokens of the crew are passed to it as they
+    are generated; the complete answer is still returned (fast paths only return it).
+    """
     # Get conversation history
     conversation_history = redis_memory.get_conversation_pairs(
         channel_id=channel_id,
         limit=10
     )
-    conversation_context = redis_memory.build_conversation_context(conversation_history)
+
+    # Small talk, goodbyes and fixed questions get a templated answer without any LLM call,
+    # unless they acknowledge a step of an ongoing exchange
+    decision = triage_router.route(question, channel_id, conversation_history)
+    if decision["route"] != ROUTE_CREW:
+        print(f"\n⚡ Réponse directe ({decision['route']}, {decision['method']}, {decision['latency_ms']:.0f} ms)\n")
+        return decision["answer"]
+
+    # Recurring opening questions are answered from the semantic cache (never mid-conversation)
+    cached = answer_cache.lookup(question, conversation_history)
+    if cached:
+        print(f"\n⚡ Réponse servie depuis le cache ({cached['lookup_ms']:.0f} ms, "
+              f"similarité {cached['similarity']:.2f} avec « {cached['cached_question']} »)\n")
+        store_answer(channel_id, user_id, username, question, cached["answer"])
+        return cached["answer"]
+
+    # Image and protocol lookups run while the context is built
+    prefetch = tool_prefetcher.submit(question, conversation_history)
+    conversation_context, context_stats = conversation_summarizer.build_context(channel_id, conversation_history)
     
-    print(f"\n📚 Contexte récupéré: {len(conversation_history)} messages antérieurs\n")
+    print(f"\n📚 Contexte récupéré: {len(conversation_history)} messages antérieurs "
+          f"(~{context_stats['tokens_used']} tokens, {context_stats['tokens_saved']} économisés)\n")
     
-    inputs = {
-        "question": question,
-        "conversation_history": conversation_context if conversation_context else "Aucun historique précédent. C'est le début de la conversation."
-    }
+    # Collected before taking an LLM slot and a crew: a slow tool must not hold either
+    inputs = build_inputs(question, conversation_context, tool_prefetcher.collect(prefetch))
     
     try:
-        crew = crew_factory.crew()
-        result = crew.kickoff(inputs=inputs)
+        # Shared LLM quota: urgent questions are queued ahead of the others
+        with llm_limiter.slot(channel_id, question), crew_pool.checkout(channel_id) as crew:
+            with stream_final_answer(on_token):
+                result = crew.kickoff(inputs=inputs)
         output = getattr(result, "raw", str(result))
         
         # Store conversation
-        redis_memory.store_conversation_pair(
-            channel_id=channel_id,
-            user_id=user_id,
-            user_query=question,
-            bot_response=output,
-            username=username
-        )
+        store_answer(channel_id, user_id, username, question, output)
+        answer_cache.store(question, output, conversation_history)
         
         return output
         
+    except RateLimitExceeded as exc:
+        print(f"\n⚠️ {exc}\n")
+        return BUSY_URGENT_MESSAGE if exc.priority == PRIORITY_URGENT else BUSY_MESSAGE
+
     except Exception as exc:
         return f"Une erreur est survenue: {exc}"
 
@@ -54,7 +147,8 @@ def process_question(crew_factory, channel_id, user_id, username, question):
 def run_text_mode():
     """Run the chatbot in text mode (original behavior)."""
     print("Assistant RCP virtuel - saisissez vos questions (tapez 'q' pour quitter).")
-    crew_factory = Monkedh()
+    crew_pool = CrewPool(size=1)  # Un seul canal, questions traitées l'une après l'autre
+    crew_pool.warm()
     channel_id = "default_channel"
     user_id = str(uuid.uuid4())
     username = "Temoin"
@@ -69,12 +163,20 @@ def run_text_mode():
         if not question:
             continue
 
-        if question.lower() in {"q", "quit", "exit"}:
+        if triage_router.is_exit(question):
             print("Fermeture de l'assistant. Prenez soin de vous.")
             break
 
-        output = process_question(crew_factory, channel_id, user_id, username, question)
-        print(f"\n{output}\n")
+        streamed = []
+
+        def print_token(token):
+            if not streamed:
+                print()
+            streamed.append(token)
+            print(token, end="", flush=True)
+
+        output = process_question(crew_pool, channel_id, user_id, username, question, on_token=print_token)
+        print("\n" if streamed else f"\n{output}\n")
 
 
 def run_voice_mode(voice_type: str = "shimmer"):
@@ -110,7 +212,8 @@ def run_voice_mode(voice_type: str = "shimmer"):
     
     # Initialize CrewAI
     print("🔧 Initialisation CrewAI...")
-    crew_factory = Monkedh()
+    crew_pool = CrewPool(size=1)  # Un seul canal, questions traitées l'une après l'autre
+    crew_pool.warm()
     channel_id = "voice_channel"
     user_id = str(uuid.uuid4())
     username = "Temoin_Vocal"
@@ -144,8 +247,6 @@ def run_voice_mode(voice_type: str = "shimmer"):
     print(f"🤖 Assistant: {welcome}")
     voice.speak(welcome)
     
-    exit_words = ["quitter", "au revoir", "stop", "arrêter", "fin", "bye"]
-    
     while True:
         try:
             print("\n" + "-"*50)
@@ -163,7 +264,7 @@ def run_voice_mode(voice_type: str = "shimmer"):
             print(f"\n👤 Vous: {user_text}")
             
             # Check for exit
-            if any(word in user_text.lower() for word in exit_words):
+            if triage_router.is_exit(user_text):
                 goodbye = "Au revoir. Prenez soin de vous et n'hésitez pas à rappeler."
                 print(f"🤖 Assistant: {goodbye}")
                 voice.speak(goodbye)
@@ -171,12 +272,18 @@ def run_voice_mode(voice_type: str = "shimmer"):
             
             # Process through CrewAI
             print("\n🔄 Traitement par CrewAI...")
-            response = process_question(crew_factory, channel_id, user_id, username, user_text)
+            # Sentences are spoken as soon as the crew generates them
+            speaker = SentenceSpeaker(voice.speak, clean_for_speech)
+            response = process_question(
+                crew_pool, channel_id, user_id, username, user_text, on_token=speaker.feed
+            )
+            speaker.finish()
             
             clean_response = clean_for_speech(response)
             print(f"\n🤖 Assistant: {clean_response[:300]}...")
             
-            voice.speak(clean_response)
+            if not speaker.spoken:
+                voice.speak(clean_response)
             time.sleep(0.5)
             
         except KeyboardInterrupt:
@@ -211,12 +318,10 @@ def train():
     """
     Train the crew for a given number of iterations.
     """
-    inputs = {
-        "question": (
-            "Je suis a la salle de sport, un homme de 35 ans vient de s'effondrer, il ne respire plus."
-            " J'ai un telephone sur haut-parleur et une trousse de secours. Que faire maintenant ?"
-        )
-    }
+    inputs = prefetched_inputs(
+        "Je suis a la salle de sport, un homme de 35 ans vient de s'effondrer, il ne respire plus."
+        " J'ai un telephone sur haut-parleur et une trousse de secours. Que faire maintenant ?"
+    )
     try:
         Monkedh().crew().train(n_iterations=int(sys.argv[1]), filename=sys.argv[2], inputs=inputs)
 
@@ -237,12 +342,10 @@ def test():
     """
     Test the crew execution and returns the results.
     """
-    inputs = {
-        "question": (
-            "Dans une gare, un adolescent respire a peine, j'ai un DEA automatique et une couverture."
-            " Les secours arrivent dans cinq minutes, comment assurer la RCP en attendant ?"
-        )
-    }
+    inputs = prefetched_inputs(
+        "Dans une gare, un adolescent respire a peine, j'ai un DEA automatique et une couverture."
+        " Les secours arrivent dans cinq minutes, comment assurer la RCP en attendant ?"
+    )
     
     try:
         Monkedh().crew().test(n_iterations=int(sys.argv[1]), eval_llm=sys.argv[2], inputs=inputs)
@@ -0,0 +1,323 @@
+"""
+Semantic answer cache in front of the crew for recurring emergency questions.
+
+Questions are normalized and embedded with the shared local embedder; an answer
+computed for a question asked at the start of a conversation is reused when a new
+conversation starts with a close enough question (cosine >= ANSWER_CACHE_THRESHOLD).
+Questions asked mid-conversation never hit the cache: the victim and the state of
+the emergency established earlier (an infant, a reaction to a first step...)
+change the right answer.
+
+Redis layout (all keys under the current generation, bumped on re-ingestion;
+the {answer_cache} hash tag keeps them in one cluster slot for MULTI/EXEC):
+    {answer_cache}:generation        current generation number
+    {answer_cache}:<gen>:answers     hash  qid -> encoded {user_query, bot_response}
+    {answer_cache}:<gen>:vectors     hash  qid -> float32 embedding bytes
+    {answer_cache}:<gen>:created     zset  qid -> creation time (TTL and size cap)
+    {answer_cache}:stats             hash  hits / misses / stored (bypasses are counted in-process)
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from .memory_codec import decode_entry, encode_entry
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE", "on").lower() not in ("off", "0", "false")
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.92))  # Similarité cosinus minimale
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", 86400 * 7))           # Durée de vie d'une réponse (s)
+ANSWER_CACHE_MAX_ENTRIES = 2000      # Au-delà, les réponses les plus anciennes sont évincées
+ANSWER_CACHE_REFRESH_SECONDS = 30    # Fréquence de resynchronisation de l'index local avec Redis
+KEY_PREFIX = "{answer_cache}"
+
+ERROR_PREFIX = "Une erreur est survenue"
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, unify unicode forms, drop punctuation and extra spaces"""
+    text = unicodedata.normalize("NFKC", question or "").lower()
+    text = re.sub(r"[^\w\s']", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def question_id(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def _embed_text(text: str) -> np.ndarray:
+    from .text_embedding import embed_text  # charge sentence-transformers au premier usage
+
+    return embed_text(text)
+
+
+class SemanticAnswerCache:
+    """Embedding-keyed answer cache stored in Redis, with an in-process vector index."""
+
+    def __init__(
+        self,
+        memory,
+        embed_fn: Optional[Callable[[str], np.ndarray]] = None,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        ttl: int = ANSWER_CACHE_TTL,
+        enabled: bool = ANSWER_CACHE_ENABLED,
+    ):
+        """
+        Args:
+            memory: RedisMemory whose client stores the cache
+            embed_fn: text -> L2-normalized vector (defaults to the shared sentence embedder)
+            threshold: Minimum cosine similarity to serve a cached answer
+            ttl: Lifetime of a cached answer in seconds
+            enabled: False turns every lookup into a bypass
+        """
+        self.memory = memory
+        self.embed_fn = embed_fn or _embed_text
+        self.threshold = threshold
+        self.ttl = ttl
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._generation: Optional[int] = None
+        self._ids: List[str] = []
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._refreshed_at = 0.0
+        self._lookup_ms_total = 0.0
+        self._lookups = 0
+        self._bypassed = 0
+
+    # ------------------------------------------------------------------ keys
+
+    def _key(self, name: str, generation: Optional[int] = None) -> str:
+        if generation is None:
+            generation = self._generation or 0
+        return f"{KEY_PREFIX}:{generation}:{name}"
+
+    # ------------------------------------------------------------------ guards
+
+    def is_cacheable(self, question: str, conversation_history: Optional[List[Dict]] = None) -> bool:
+        """
+        Conversation-state guard: only the first question of a conversation qualifies.
+
+        Answers are cached without context, so any later question (even one that
+        reads as self-contained) is answered by the crew with the conversation context.
+        """
+        return self.enabled and bool(question and question.strip()) and not conversation_history
+
+    # ------------------------------------------------------------------ local index
+
+    def _refresh_index(self, client, force: bool = False) -> None:
+        """Reload the vector index when the generation changed or the local copy is stale"""
+        generation = int(client.get(f"{KEY_PREFIX}:generation") or 0)
+        now = time.monotonic()
+        if not force and generation == self._generation and now - self._refreshed_at < ANSWER_CACHE_REFRESH_SECONDS:
+            return
+
+        created_key = self._key("created", generation)
+        expired_before = time.time() - self.ttl
+        pipe = client.pipeline(transaction=False)
+        pipe.zrangebyscore(created_key, "-inf", expired_before)
+        pipe.zcard(created_key)
+        expired, count = pipe.execute()
+        overflow = max(0, count - len(expired) - ANSWER_CACHE_MAX_ENTRIES)
+        evicted = list(expired)
+        if overflow:
+            evicted += client.zrange(created_key, len(expired), len(expired) + overflow - 1)
+        if evicted:
+            pipe = client.pipeline(transaction=True)
+            pipe.hdel(self._key("answers", generation), *evicted)
+            pipe.hdel(self._key("vectors", generation), *evicted)
+            pipe.zrem(created_key, *evicted)
+            pipe.execute()
+
+        vectors = client.hgetall(self._key("vectors", generation))
+        ids = [qid.decode() for qid in vectors]
+        matrix = (
+            np.vstack([np.frombuffer(raw, dtype=np.float32) for raw in vectors.values()])
+            if vectors else np.zeros((0, 0), dtype=np.float32)
+        )
+        with self._lock:
+            self._generation = generation
+            self._ids, self._matrix = ids, matrix
+            self._refreshed_at = now
+
+    def _add_to_index(self, qid: str, vector: np.ndarray) -> None:
+        with self._lock:
+            if qid in self._ids:
+                return
+            self._ids = self._ids + [qid]
+            self._matrix = vector[None, :] if not self._matrix.size else np.vstack([self._matrix, vector])
+
+    # ------------------------------------------------------------------ public API
+
+    def lookup(self, question: str, conversation_history: Optional[List[Dict]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Return a cached answer for a question, or None.
+
+        Returns:
+            {"answer", "cached_question", "similarity", "lookup_ms"} on a hit
+        """
+        if not self.is_cacheable(question, conversation_history):
+            self._bypassed += 1  # Chemin chaud: pas d'aller-retour Redis
+            return None
+        client = self.memory.redis_client
+        if not client:
+            self._bypassed += 1
+            return None
+
+        started = time.perf_counter()
+        try:
+            self._refresh_index(client)
+            normalized = normalize_question(question)
+            qid = question_id(normalized)
+            with self._lock:
+                ids, matrix = self._ids, self._matrix
+
+            if qid in ids:
+                best, similarity = qid, 1.0
+            elif matrix.size:
+                scores = matrix @ self.embed_fn(normalized)
+                best_row = int(np.argmax(scores))
+                best, similarity = ids[best_row], float(scores[best_row])
+            else:
+                best, similarity = None, 0.0
+
+            entry = None
+            if best is not None and similarity >= self.threshold:
+                raw = client.hget(self._key("answers"), best)
+                entry = decode_entry(raw) if raw else None
+            if entry is None or time.time() - entry.get("unix_timestamp", 0) > self.ttl:
+                self._count(client, "misses", started)
+                return None
+
+            lookup_ms = self._count(client, "hits", started)
+            return {
+                "answer": entry["bot_response"],
+                "cached_question": entry.get("user_query", ""),
+                "similarity": similarity,
+                "lookup_ms": lookup_ms,
+            }
+        except Exception as e:
+            print(f"⚠️ Cache sémantique indisponible: {e}")
+            self._bypassed += 1
+            return None
+
+    def store(self, question: str, answer: str, conversation_history: Optional[List[Dict]] = None) -> bool:
+        """
+        Cache an answer computed by the crew.
+
+        Only answers to the first question of a conversation are stored: they were
+        produced without conversation context and can be reused by anyone.
+        """
+        client = self.memory.redis_client
+        if not client or not self.enabled or conversation_history or not answer or answer.startswith(ERROR_PREFIX):
+            return False
+
+        try:
+            if self._generation is None:
+                self._refresh_index(client)
+            normalized = normalize_question(question)
+            qid = question_id(normalized)
+            vector = np.asarray(self.embed_fn(normalized), dtype=np.float32)
+            now = time.time()
+
+            pipe = client.pipeline(transaction=True)
+            pipe.hset(self._key("answers"), qid, encode_entry(
+                {"user_query": question, "bot_response": answer, "unix_timestamp": now}
+            ))
+            pipe.hset(self._key("vectors"), qid, vector.tobytes())
+            pipe.zadd(self._key("created"), {qid: now})
+            for name in ("answers", "vectors", "created"):
+                pipe.expire(self._key(name), self.ttl)
+            pipe.hincrby(f"{KEY_PREFIX}:stats", "stored", 1)
+            pipe.execute()
+
+            self._add_to_index(qid, vector)
+            return True
+        except Exception as e:
+            print(f"⚠️ Réponse non mise en cache: {e}")
+            return False
+
+    def invalidate(self) -> bool:
+        """Drop every cached answer (e.g. after the manual was re-ingested)"""
+        client = self.memory.redis_client
+        if not client:
+            return False
+
+        try:
+            old_generation = int(client.get(f"{KEY_PREFIX}:generation") or 0)
+            pipe = client.pipeline(transaction=True)
+            pipe.incr(f"{KEY_PREFIX}:generation")
+            pipe.delete(*(self._key(name, old_generation) for name in ("answers", "vectors", "created")))
+            generation = pipe.execute()[0]
+            with self._lock:
+                self._generation = generation
+                self._ids, self._matrix = [], np.zeros((0, 0), dtype=np.float32)
+                self._refreshed_at = time.monotonic()
+            print(f"🗑️ Cache sémantique invalidé (génération {generation})")
+            return True
+        except Exception as e:
+            print(f"❌ Error invalidating answer cache: {e}")
+            return False
+
+    def _count(self, client, outcome: str, started: Optional[float] = None) -> float:
+        """Record a lookup outcome (shared counters in Redis, latency in-process)"""
+        lookup_ms = 0.0
+        if started is not None:
+            lookup_ms = (time.perf_counter() - started) * 1000
+            self._lookup_ms_total += lookup_ms
+            self._lookups += 1
+        if client:
+            try:
+                client.hincrby(f"{KEY_PREFIX}:stats", outcome, 1)
+            except Exception:
+                pass
+        return lookup_ms
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rate (over cacheable lookups), counters and index size (bypassed: this process only)"""
+        client = self.memory.redis_client
+        if not client:
+            return {"status": "disconnected"}
+
+        counters = {key.decode(): int(value) for key, value in client.hgetall(f"{KEY_PREFIX}:stats").items()}
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "bypassed": self._bypassed,
+            "stored": counters.get("stored", 0),
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            "entries": len(self._ids),
+            "generation": self._generation or 0,
+            "avg_lookup_ms": round(self._lookup_ms_total / self._lookups, 2) if self._lookups else 0.0,
+            "threshold": self.threshold,
+        }
+
+
+def invalidate_answer_cache() -> bool:
+    """Invalidate the shared answer cache; call after re-ingesting the manual"""
+    from .redis_storage import get_redis_memory
+
+    return SemanticAnswerCache(get_redis_memory()).invalidate()
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from .redis_storage import get_redis_memory
+
+    parser = argparse.ArgumentParser(description="Cache sémantique des réponses")
+    parser.add_argument("--invalidate", action="store_true", help="Vider le cache (après ré-ingestion du manuel)")
+    args = parser.parse_args()
+
+    cache = SemanticAnswerCache(get_redis_memory())
+    if args.invalidate:
+        cache.invalidate()
+    elif cache.memory.redis_client:
+        cache._refresh_index(cache.memory.redis_client, force=True)
+    print(json.dumps(cache.get_stats(), indent=2, ensure_ascii=False))
@@ -0,0 +1,175 @@
+"""
+Streaming of the agent's final answer, token by token, to the console or to TTS.
+
+With LLM(stream=True), crewai emits an LLMStreamChunkEvent per token on its event
+bus. One listener is installed per process and dispatches the chunks to the
+callback registered by the thread running the crew (stream_final_answer()).
+Each LLM call is filtered so that only the text after the ReAct "Final Answer:"
+marker is forwarded; thoughts and tool-calling turns are never shown or spoken.
+
+SentenceSpeaker groups the forwarded tokens into sentences and speaks them in
+order on a background thread, so TTS starts after the first sentence instead of
+after the whole answer.
+"""
+import queue
+import re
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+FINAL_ANSWER_MARKER = "Final Answer:"
+SENTENCE_MIN_CHARS = 25     # Les fragments plus courts sont regroupés avec la phrase suivante
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+|\n+")
+
+_streams: Dict[int, "FinalAnswerFilter"] = {}
+_streams_lock = threading.Lock()
+_listener_installed = False
+
+
+class FinalAnswerFilter:
+    """Forward the text following the "Final Answer:" marker of the current LLM call"""
+
+    def __init__(self, on_token: Callable[[str], None]):
+        self.on_token = on_token
+        self.streamed = False
+        self.reset()
+
+    def reset(self) -> None:
+        """Start of a new LLM call: look for the marker again"""
+        self._buffer = ""
+        self._in_answer = False
+
+    def feed(self, chunk: str) -> None:
+        if not chunk:
+            return
+        if not self._in_answer:
+            self._buffer += chunk
+            index = self._buffer.find(FINAL_ANSWER_MARKER)
+            if index < 0:
+                return
+            chunk = self._buffer[index + len(FINAL_ANSWER_MARKER):].lstrip()
+            self._buffer = ""
+            self._in_answer = True
+            if not chunk:
+                return
+        elif not self.streamed:
+            chunk = chunk.lstrip()
+            if not chunk:
+                return
+        self.streamed = True
+        self.on_token(chunk)
+
+
+def _import_events():
+    """(event bus, LLMCallStartedEvent, LLMStreamChunkEvent) across crewai versions"""
+    try:
+        from crewai.events import LLMCallStartedEvent, LLMStreamChunkEvent, crewai_event_bus
+    except ImportError:
+        from crewai.utilities.events import crewai_event_bus
+        from crewai.utilities.events.llm_events import LLMCallStartedEvent, LLMStreamChunkEvent
+    return crewai_event_bus, LLMCallStartedEvent, LLMStreamChunkEvent
+
+
+def _install_listener() -> None:
+    global _listener_installed
+    with _streams_lock:
+        if _listener_installed:
+            return
+        event_bus, call_started_event, chunk_event = _import_events()
+
+        # Handlers run in the thread emitting the event, i.e. the one running the crew
+        @event_bus.on(call_started_event)
+        def _on_call_started(source, event):
+            stream = _streams.get(threading.get_ident())
+            if stream is not None:
+                stream.reset()
+
+        @event_bus.on(chunk_event)
+        def _on_chunk(source, event):
+            stream = _streams.get(threading.get_ident())
+            if stream is not None:
+                stream.feed(getattr(event, "chunk", ""))
+
+        _listener_installed = True
+
+
+@contextmanager
+def stream_final_answer(on_token: Optional[Callable[[str], None]]) -> Iterator[Optional[FinalAnswerFilter]]:
+    """
+    Forward final-answer tokens of the LLM calls made by this thread to `on_token`.
+
+    Yields the filter (its `streamed` flag tells whether anything was forwarded),
+    or None when on_token is None or the event bus is unavailable.
+    """
+    if on_token is None:
+        yield None
+        return
+    try:
+        _install_listener()
+    except Exception as e:
+        print(f"⚠️ Streaming indisponible, réponse complète en fin de génération: {e}")
+        yield None
+        return
+
+    stream = FinalAnswerFilter(on_token)
+    thread_id = threading.get_ident()
+    with _streams_lock:
+        _streams[thread_id] = stream
+    try:
+        yield stream
+    finally:
+        with _streams_lock:
+            _streams.pop(thread_id, None)
+
+
+class SentenceSpeaker:
+    """Group streamed tokens into sentences and speak them in order on a worker thread"""
+
+    def __init__(self, speak_fn: Callable[[str], object], clean_fn: Callable[[str], str] = str.strip):
+        """
+        Args:
+            speak_fn: Blocking TTS call for one sentence
+            clean_fn: Text cleanup applied before speaking (markdown, image paths...)
+        """
+        self.speak_fn = speak_fn
+        self.clean_fn = clean_fn
+        self.spoken = 0
+        self._buffer = ""
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._worker = threading.Thread(target=self._speak_loop, name="tts", daemon=True)
+        self._worker.start()
+
+    def _speak_loop(self) -> None:
+        while True:
+            sentence = self._queue.get()
+            if sentence is None:
+                return
+            try:
+                self.speak_fn(sentence)
+            except Exception as e:
+                print(f"❌ Erreur TTS: {e}")
+
+    def _enqueue(self, text: str) -> None:
+        sentence = self.clean_fn(text)
+        if sentence:
+            self.spoken += 1
+            self._queue.put(sentence)
+
+    def feed(self, token: str) -> None:
+        self._buffer += token
+        parts = SENTENCE_END.split(self._buffer)
+        pending = ""
+        for part in parts[:-1]:
+            pending = f"{pending} {part}".strip() if pending else part
+            if len(pending) >= SENTENCE_MIN_CHARS:
+                self._enqueue(pending)
+                pending = ""
+        self._buffer = f"{pending} {parts[-1]}" if pending else parts[-1]
+
+    def finish(self) -> None:
+        """Speak the remaining text and wait until every sentence was played"""
+        if self._buffer.strip():
+            self._enqueue(self._buffer)
+        self._buffer = ""
+        self._queue.put(None)
+        self._worker.join()
@@ -0,0 +1,197 @@
+"""
+Rolling conversation summary to cap the size of the history injected in the prompt.
+
+The last CONTEXT_RAW_TURNS pairs are kept verbatim; older pairs are folded,
+in the background after each turn, into a summary stored in Redis next to the
+raw list (conversation_summary:<channel_id>). Turns the background update has
+not folded yet, and raw turns dropped to fit the token budget, are folded
+extractively into the injected summary instead of being left out.
+"""
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken absent ou encodage indisponible hors ligne
+    _encoding = None
+
+CONTEXT_RAW_TURNS = int(os.getenv("CONTEXT_RAW_TURNS", 3))           # Derniers échanges gardés tels quels
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 1500))  # Budget total résumé + échanges
+SUMMARY_MAX_CHARS = 1200  # Longueur max du résumé (le résumé extractif est tronqué au-delà)
+
+SUMMARY_PROMPT = """Tu maintiens le résumé d'une conversation d'assistance médicale d'urgence.
+Mets à jour le résumé existant avec les nouveaux échanges. Garde uniquement les faits utiles
+pour la suite : situation de la victime (âge, état, symptômes), gestes déjà conseillés ou
+effectués, secours appelés, ressources mentionnées. Réponds en français, 5 phrases maximum.
+
+RÉSUMÉ EXISTANT :
+{summary}
+
+NOUVEAUX ÉCHANGES :
+{turns}
+
+RÉSUMÉ MIS À JOUR :"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count with tiktoken when available, ~4 characters per token otherwise"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+def turn_time(timestamp: str) -> float:
+    """Epoch seconds of an ISO timestamp (any offset, naive = local time); -inf when missing or invalid"""
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return float("-inf")
+
+
+def _pair_time(pair: Dict[str, Any]) -> float:
+    if pair.get("timestamp"):
+        return turn_time(pair["timestamp"])
+    return float(pair.get("unix_timestamp", float("-inf")))
+
+
+def _first_sentence(text: str, max_chars: int = 160) -> str:
+    """First sentence (or line) of a text, markdown stripped, shortened to max_chars"""
+    text = re.sub(r"[*#`>_]+", "", text or "").strip()
+    sentence = re.split(r"(?<=[.!?؟])\s|\n", text, maxsplit=1)[0].strip()
+    return sentence if len(sentence) <= max_chars else sentence[:max_chars - 1].rstrip() + "…"
+
+
+def format_turns(turns: List[Dict[str, Any]]) -> str:
+    return "\n".join(
+        f"Patient: {turn.get('user_query', '')}\nAssistant: {turn.get('bot_response', '')}" for turn in turns
+    )
+
+
+def extractive_summary(summary: str, turns: List[Dict[str, Any]]) -> str:
+    """Deterministic fallback: keep the question and the first sentence of each answer"""
+    lines = [summary] if summary else []
+    for turn in turns:
+        lines.append(f"- {_first_sentence(turn.get('user_query', ''))} → {_first_sentence(turn.get('bot_response', ''))}")
+    text = "\n".join(lines)
+    # Keep the most recent facts when the summary grows too long
+    return text if len(text) <= SUMMARY_MAX_CHARS else "…" + text[-(SUMMARY_MAX_CHARS - 1):]
+
+
+class ConversationSummarizer:
+    """Keeps a rolling summary per channel and builds token-budgeted prompt context."""
+
+    def __init__(
+        self,
+        memory,
+        summarize_fn: Optional[Callable[[str, List[Dict[str, Any]]], str]] = None,
+        raw_turns: int = CONTEXT_RAW_TURNS,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+    ):
+        """
+        Args:
+            memory: RedisMemory holding the pairs and the summaries
+            summarize_fn: (previous_summary, new_turns) -> updated summary, e.g. an LLM call.
+                          Falls back to extractive_summary when missing or failing.
+            raw_turns: Number of most recent pairs injected verbatim
+            token_budget: Max tokens for the whole injected context
+        """
+        self.memory = memory
+        self.summarize_fn = summarize_fn
+        self.raw_turns = raw_turns
+        self.token_budget = token_budget
+        # One worker: summaries of a channel are updated in order, off the request path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary")
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+
+    def schedule_update(self, channel_id: str) -> None:
+        """Fold turns that left the raw window into the summary, in the background"""
+        with self._pending_lock:
+            if channel_id in self._pending:
+                return
+            self._pending.add(channel_id)
+        self._executor.submit(self._update, channel_id)
+
+    def _update(self, channel_id: str) -> None:
+        try:
+            with self._pending_lock:
+                self._pending.discard(channel_id)
+            pairs = self.memory.get_conversation_pairs(channel_id)
+            older = pairs[:-self.raw_turns] if self.raw_turns else pairs
+            state = self.memory.get_conversation_summary(channel_id)
+            new_turns = self._uncovered(older, state["covered_until"])
+            if not new_turns:
+                return
+
+            summary = None
+            if self.summarize_fn is not None:
+                try:
+                    summary = self.summarize_fn(state["summary"], new_turns)
+                except Exception as e:
+                    print(f"⚠️ Résumé LLM indisponible, résumé extractif utilisé: {e}")
+            if not summary:
+                summary = extractive_summary(state["summary"], new_turns)
+
+            self.memory.store_conversation_summary(channel_id, summary.strip(), new_turns[-1].get("timestamp", ""))
+        except Exception as e:
+            print(f"❌ Error updating conversation summary: {e}")
+
+    @staticmethod
+    def _uncovered(pairs: List[Dict[str, Any]], covered_until: str) -> List[Dict[str, Any]]:
+        """Pairs newer than the last one folded into the summary (times compared parsed, not as strings)"""
+        covered = turn_time(covered_until)
+        return [pair for pair in pairs if _pair_time(pair) > covered]
+
+    def build_context(self, channel_id: str, conversation_history: List[Dict[str, Any]]) -> Tuple[str, Dict[str, int]]:
+        """
+        Build the prompt context: rolling summary + the last raw turns that fit the budget.
+
+        Returns:
+            (context, stats) where stats has tokens_full (all pairs verbatim),
+            tokens_used and tokens_saved
+        """
+        full_context = self.memory.build_conversation_context(conversation_history)
+        tokens_full = estimate_tokens(full_context)
+
+        summary = ""
+        older = conversation_history[:-self.raw_turns] if self.raw_turns else list(conversation_history)
+        if older:
+            state = self.memory.get_conversation_summary(channel_id)
+            summary = state["summary"]
+            # The background update may lag behind: fold what it has not covered yet
+            pending = self._uncovered(older, state["covered_until"])
+            if pending:
+                summary = extractive_summary(summary, pending)
+        recent = conversation_history[-self.raw_turns:] if self.raw_turns else []
+
+        # Drop the oldest raw turns until the context fits, always keeping the last one;
+        # a dropped turn is folded into the summary first so its facts are not lost
+        context = self.memory.build_conversation_context(recent, summary=summary or None)
+        while len(recent) > 1 and estimate_tokens(context) > self.token_budget:
+            summary = extractive_summary(summary, recent[:1])
+            recent = recent[1:]
+            context = self.memory.build_conversation_context(recent, summary=summary or None)
+
+        if recent and estimate_tokens(context) > self.token_budget:
+            # Still too long: shorten the last answer to what the budget leaves
+            overflow_chars = (estimate_tokens(context) - self.token_budget) * 4
+            last = dict(recent[-1])
+            last["bot_response"] = last.get("bot_response", "")[:max(200, len(last.get("bot_response", "")) - overflow_chars)] + "…"
+            context = self.memory.build_conversation_context(recent[:-1] + [last], summary=summary or None)
+
+        # Never inject more than the verbatim history would have cost
+        if tokens_full and estimate_tokens(context) >= tokens_full:
+            context = full_context
+        tokens_used = estimate_tokens(context)
+        return context, {
+            "tokens_full": tokens_full,
+            "tokens_used": tokens_used,
+            "tokens_saved": max(0, tokens_full - tokens_used),
+        }
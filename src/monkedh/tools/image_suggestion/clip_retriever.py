@@ -2,12 +2,124 @@ import torch
 import clip
 import json
 import os
+import re
+import copy
+import atexit
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
 from PIL import Image
 import numpy as np
 from pathlib import Path
 
+from .image_index import create_image_index
+
+CLIP_MODEL_NAME = "ViT-B/32"
+CLIP_QUANTIZE = os.getenv("CLIP_QUANTIZE", "0") == "1"    # Encodeur texte int8 (CPU uniquement)
+CLIP_NUM_THREADS = int(os.getenv("CLIP_NUM_THREADS", 0))  # Threads intra-op torch (0 = défaut torch)
+TEXT_CACHE_SIZE = int(os.getenv("CLIP_TEXT_CACHE_SIZE", 1024))  # Nombre max de requêtes en mémoire (LRU)
+TEXT_CACHE_BATCH_SIZE = 64  # Taille des lots pour le pré-chauffage du cache
+FAST_PATH_MIN_SCORE = 1.0  # Score mots-clés minimal pour répondre sans CLIP
+FAST_PATH_MARGIN = 2.0     # Le candidat retenu doit dépasser le suivant d'un facteur 2
+# Score minimal d'une image pertinente, propre à chaque chemin (échelles différentes)
+RELEVANCE_MIN_SCORE = {
+    'keyword': 0.5,  # Part des mots de la requête couverts par les mots-clés de l'image
+    'clip': 0.5,     # Similarité cosinus après boosts (âge, RCP, catégorie)
+}
+FAST_PATH_STOPWORDS = {    # Mots ignorés pour la couverture de la requête par les mots-clés
+    'les', 'des', 'une', 'que', 'qui', 'quoi', 'pour', 'avec', 'dans', 'sur', 'est', 'mon', 'ma', 'mes',
+    'son', 'sa', 'ses', 'faire', 'comment', 'the', 'and', 'for', 'with', 'how', 'what', 'my', 'his', 'her',
+}
+SHORTLIST_MIN = 64         # Candidats minimum extraits de l'index avant application des boosts
+SHORTLIST_FACTOR = 8       # ... ou top_k * SHORTLIST_FACTOR si plus grand
+
+# Requêtes de référence (utilisées par le test de parité de l'encodeur quantifié)
+SAMPLE_QUERIES = [
+    "pregnant woman choking emergency",
+    "baby not breathing CPR",
+    "adult cardiac arrest chest compressions",
+    "unconscious person breathing recovery position",
+    "infant choking back blows"
+]
+
+# Règles de sécurité (âge, RCP) partagées par le chemin mots-clés et le chemin CLIP
+BABY_QUERY_TERMS = ['baby', 'infant', 'newborn', 'bébé', 'nourrisson', 'nouveau-né']
+ADULT_QUERY_TERMS = ['adult', 'adulte']
+INFANT_SUBCATEGORIES = ['infant', 'nourrisson']
+INFANT_KEYWORDS = ['infant', 'baby', 'nourrisson', 'bébé']
+ADULT_SUBCATEGORIES = ['adult', 'adulte']
+CPR_QUERY_TERMS = ['cpr', 'rcp', 'cardiac arrest', 'arrêt cardiaque', 'not breathing', 'ne respire pas', 'ne respire plus', 'heart stopped', 'massage cardiaque', 'compressions', 'réanimation', 'resuscitation']
+CPR_CATEGORIES = ['cpr', 'rcp']
+
+# Noms usuels (FR + EN) -> catégorie réelle des métadonnées
+CATEGORY_ALIASES = {
+    'cpr': 'RCP',
+    'reanimation': 'RCP',
+    'massage cardiaque': 'RCP',
+    'choking': 'Étouffement',
+    'first aid for choking': 'Étouffement',
+    'heimlich': 'Étouffement',
+    'recovery': 'Position Latérale de Sécurité',
+    'recovery position': 'Position Latérale de Sécurité',
+    'pls': 'Position Latérale de Sécurité',
+    'log roll': 'Positionnement',
+    'turn casualty': 'Positionnement',
+    'how to turn a casualty face up': 'Positionnement',
+    'retournement': 'Positionnement',
+    'assessment': 'Évaluation',
+    'primary survey': 'Évaluation',
+    'unconscious': 'Évaluation',
+    'bilan': 'Évaluation',
+    'drag carry': 'Déplacement',
+    'move casualty': 'Déplacement',
+    'transport': 'Déplacement',
+}
+
+
+class AmbiguousCategory(ValueError):
+    """A category prefix that matches several categories"""
+
+    def __init__(self, category, candidates):
+        super().__init__(f"Catégorie « {category} » ambiguë : {', '.join(candidates)}")
+        self.category = category
+        self.candidates = candidates
+
+
+class QuantizedTextEncoder(torch.nn.Module):
+    """
+    CLIP text tower with int8 dynamically quantized linear layers, for CPU inference
+    
+    Shares the embeddings, final layer norm and projection with the float model;
+    only the transformer is copied and quantized, so the vision tower is not duplicated.
+    """
+    
+    def __init__(self, model):
+        super().__init__()
+        self.token_embedding = model.token_embedding
+        self.positional_embedding = model.positional_embedding
+        self.ln_final = model.ln_final
+        self.text_projection = model.text_projection
+        self.transformer = torch.quantization.quantize_dynamic(
+            copy.deepcopy(model.transformer).float(), {torch.nn.Linear}, dtype=torch.qint8
+        )
+        self.eval()
+    
+    def encode_text(self, text):
+        """Same computation as clip.model.CLIP.encode_text, in float32"""
+        x = self.token_embedding(text).float()
+        x = x + self.positional_embedding.float()
+        x = x.permute(1, 0, 2)  # NLD -> LND
+        x = self.transformer(x)
+        x = x.permute(1, 0, 2)  # LND -> NLD
+        x = self.ln_final(x).float()
+        # Features from the eot embedding (highest token id in each sequence)
+        return x[torch.arange(x.shape[0]), text.argmax(dim=-1)] @ self.text_projection.float()
+
+
 class EmergencyImageRetriever:
-    def __init__(self, metadata_path=None, embeddings_path=None):
+    def __init__(self, metadata_path=None, embeddings_path=None, text_cache_path=None,
+                 text_cache_size=TEXT_CACHE_SIZE, warm_cache=True, quantize=CLIP_QUANTIZE,
+                 num_threads=CLIP_NUM_THREADS):
         """Initialize CLIP model and load image metadata"""
         # Get the directory where this file is located
         current_dir = Path(__file__).parent
@@ -16,10 +128,22 @@ class EmergencyImageRetriever:
             metadata_path = current_dir / "image_metadata.json"
         if embeddings_path is None:
             embeddings_path = current_dir / "image_embeddings.npz"
+        if text_cache_path is None:
+            # Empty CLIP_TEXT_CACHE_PATH disables the on-disk layer
+            text_cache_path = os.getenv("CLIP_TEXT_CACHE_PATH", str(current_dir / "text_embeddings_cache.npz"))
             
         print("🔧 Chargement du modèle CLIP...")
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.model, self.preprocess = clip.load("ViT-B/32", device=self.device)
+        self.model_name = CLIP_MODEL_NAME
+        self.model, self.preprocess = clip.load(self.model_name, device=self.device)
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        
+        # Text queries go through text_model: the float model, or its int8 text tower on CPU
+        self.text_model = self.model
+        self.text_encoder_name = self.model_name
+        if quantize:
+            self.use_quantized_text_encoder(True)
         
         print("📚 Chargement des métadonnées images...")
         with open(metadata_path, 'r', encoding='utf-8') as f:
@@ -41,6 +165,29 @@ class EmergencyImageRetriever:
         else:
             print("🎨 Calcul des embeddings images (première utilisation)...")
             self._compute_embeddings()
+        
+        # ANN / exact index over the image embeddings, with category filters
+        self._build_image_index()
+        
+        # Category / subcategory lookups and prebuilt browse listings
+        self._build_category_index()
+        
+        # Inverted keyword index for the CLIP-free fast path, lower-cased metadata for boosting
+        self._build_keyword_index()
+        self.path_stats = Counter()
+        self._path_stats_lock = threading.Lock()
+        
+        # Query text -> CLIP text embedding cache (LRU in memory + optional .npz on disk)
+        self.text_cache_size = text_cache_size
+        self.text_cache_path = str(text_cache_path) if text_cache_path else None
+        self._text_cache = OrderedDict()
+        self._text_cache_lock = threading.Lock()
+        self._text_cache_dirty = False
+        if self.text_cache_path:
+            self._load_text_cache()
+            atexit.register(self.save_text_cache)
+        if warm_cache:
+            self.warm_text_cache()
     
     def _compute_embeddings(self):
         """Compute CLIP embeddings for all images in metadata"""
@@ -60,7 +207,7 @@ class EmergencyImageRetriever:
                 image_input = self.preprocess(image).unsqueeze(0).to(self.device)
                 
                 # Compute embedding
-                with torch.no_grad():
+                with torch.inference_mode():
                     embedding = self.model.encode_image(image_input)
                     embedding = embedding / embedding.norm(dim=-1, keepdim=True)  # Normalize
                 
@@ -92,27 +239,393 @@ class EmergencyImageRetriever:
         
         print(f"✅ {len(self.image_embeddings)} embeddings chargés")
     
-    def retrieve(self, query, top_k=3):
+    def _build_image_index(self):
+        """Build the vector index over valid embeddings"""
+        payloads = [self.metadata[metadata_idx] for metadata_idx in self.valid_indices]
+        index_path = os.path.splitext(self.embeddings_path)[0] + ".hnsw"
+        self.image_index = create_image_index(self.image_embeddings, payloads, index_path=index_path)
+        print(f"🗂️ Index images: {self.image_index.backend} ({len(payloads)} images)")
+    
+    @staticmethod
+    def normalize_label(label):
+        """Lower-case, accent-insensitive form of a category or subcategory name"""
+        decomposed = unicodedata.normalize("NFKD", label)
+        stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+        return " ".join(stripped.lower().split())
+    
+    def _build_category_index(self):
+        """Index images by normalized category, subcategory and language alias, once at load"""
+        self.category_index = {}
+        self.subcategory_index = {}
+        self.category_names = {}
+        for img in self.metadata:
+            category_key = self.normalize_label(img['category'])
+            self.category_index.setdefault(category_key, []).append(img)
+            self.subcategory_index.setdefault(self.normalize_label(img['subcategory']), []).append(img)
+            self.category_names.setdefault(category_key, img['category'])
+        
+        self.category_aliases = {key: key for key in self.category_index}
+        for alias, category in CATEGORY_ALIASES.items():
+            category_key = self.normalize_label(category)
+            if category_key in self.category_index:
+                self.category_aliases[self.normalize_label(alias)] = category_key
+        self._category_listings = {}
+    
+    def resolve_category(self, category):
+        """
+        Map a user-supplied category (any language, any case) to its normalized index key
+        
+        Exact names and aliases are tried first, then a prefix of names and
+        aliases, accepted only when every alias it starts belongs to one category.
+        Returns None when nothing matches and raises AmbiguousCategory when the
+        prefix fits several categories.
+        """
+        key = self.normalize_label(category)
+        if key in self.category_aliases:
+            return self.category_aliases[key]
+        if not key:
+            return None
+        matches = {category_key for alias, category_key in self.category_aliases.items() if alias.startswith(key)}
+        if len(matches) > 1:
+            raise AmbiguousCategory(category, sorted(self.category_names[match] for match in matches))
+        return matches.pop() if matches else None
+    
+    def search_by_subcategory(self, subcategory):
+        """Get all images in a specific subcategory"""
+        return list(self.subcategory_index.get(self.normalize_label(subcategory), []))
+    
+    def format_category_listing(self, category):
+        """
+        Return the browse tool output for a category
+        
+        The text only depends on the metadata, so it is built once per category and reused.
+        """
+        category_key = self.resolve_category(category)
+        if category_key is None:
+            return None
+        listing = self._category_listings.get(category_key)
+        if listing is None:
+            images = self.category_index[category_key]
+            listing = f"📁 Found {len(images)} images in '{self.category_names[category_key]}':\n\n"
+            for i, img in enumerate(images, 1):
+                listing += f"{i}. {img['filename']}\n"
+                listing += f"   Subcategory: {img['subcategory']}\n"
+                listing += f"   Description: {img['caption']}\n\n"
+            self._category_listings[category_key] = listing
+        return listing
+    
+    @staticmethod
+    def normalize_query(query):
+        """Normalize a query so that trivially different spellings share a cache entry"""
+        query = unicodedata.normalize("NFC", query)
+        return " ".join(query.lower().split())
+    
+    @classmethod
+    def _tokenize_query(cls, query):
+        """Split a normalized query into words, keeping apostrophes and hyphens (s'étouffe, nouveau-né)"""
+        return re.findall(r"[\w'-]+", cls.normalize_query(query))
+    
+    def _build_keyword_index(self):
+        """
+        Build the inverted index: normalized keyword / subcategory -> metadata indices
+        
+        Also caches the lower-cased metadata used by the fast path and CLIP boosting rules.
+        """
+        index = {}
+        for metadata_idx in self.valid_indices:
+            img_meta = self.metadata[metadata_idx]
+            for term in img_meta['keywords'] + [img_meta['subcategory']]:
+                key = " ".join(self._tokenize_query(term))
+                if key:
+                    index.setdefault(key, set()).add(metadata_idx)
+        self.keyword_index = index
+        self._max_keyword_words = max((len(k.split()) for k in index), default=0)
+        
+        self._lowered_metadata = {
+            metadata_idx: {
+                'caption': self.metadata[metadata_idx]['caption'].lower(),
+                'keywords': [k.lower() for k in self.metadata[metadata_idx]['keywords']],
+                'subcategory': self.metadata[metadata_idx]['subcategory'].lower(),
+                'category': self.metadata[metadata_idx]['category'].lower(),
+                'filename': self.metadata[metadata_idx]['filename'].lower(),
+            }
+            for metadata_idx in self.valid_indices
+        }
+    
+    def _keyword_matches(self, query):
+        """Return the query words and the indexed keyword phrases found in them"""
+        words = self._tokenize_query(query)
+        matched = set()
+        for start in range(len(words)):
+            for length in range(1, min(self._max_keyword_words, len(words) - start) + 1):
+                phrase = " ".join(words[start:start + length])
+                if phrase in self.keyword_index:
+                    matched.add(phrase)
+        return words, matched
+    
+    def _keyword_scores(self, matched):
+        """Score images by the matched keyword phrases, weighting rare keywords higher"""
+        scores = Counter()
+        for phrase in matched:
+            images = self.keyword_index[phrase]
+            for metadata_idx in images:
+                scores[metadata_idx] += 1.0 / len(images)
+        return scores
+    
+    @staticmethod
+    def _age_boost(query_lower, img_lower):
+        """Boost images of the age group named in the query, penalize the other group"""
+        subcategory_lower = img_lower['subcategory']
+        # Baby/infant queries should ONLY match infant images (FR + EN)
+        if any(term in query_lower for term in BABY_QUERY_TERMS):
+            if subcategory_lower in INFANT_SUBCATEGORIES or any(k in img_lower['keywords'] for k in INFANT_KEYWORDS):
+                return 0.5  # Strong boost for infant match
+            if subcategory_lower in ADULT_SUBCATEGORIES:
+                return -0.8  # Strong penalty for adult when query is about baby
+        # Adult queries should prioritize adult images (FR + EN)
+        elif any(term in query_lower for term in ADULT_QUERY_TERMS):
+            if subcategory_lower in ADULT_SUBCATEGORIES:
+                return 0.5
+            if subcategory_lower in INFANT_SUBCATEGORIES:
+                return -0.8
+        return 0.0
+    
+    @staticmethod
+    def _cpr_boost(query_lower, img_lower):
+        """Boost CPR images for explicit CPR / not-breathing queries, penalize them otherwise"""
+        if img_lower['category'] not in CPR_CATEGORIES:
+            return 0.0
+        if any(term in query_lower for term in CPR_QUERY_TERMS):
+            return 0.5  # Strong boost for CPR category
+        return -0.3
+    
+    def _fast_path(self, query, top_k):
+        """
+        Answer from the keyword index alone when the match is unambiguous
+        
+        Candidates go through the same safety rules as the CLIP path: CPR images
+        are dropped for non-CPR queries, and a top candidate whose age group
+        contradicts the query (adult image for a baby query, or the reverse)
+        sends the query to CLIP. The k-th remaining candidate must then reach
+        FAST_PATH_MIN_SCORE and beat the (k+1)-th by FAST_PATH_MARGIN;
+        otherwise None is returned and CLIP decides.
+        
+        The reported similarity is the share of the query's content words
+        covered by the image's keywords (match_type 'keyword'): it is not on the
+        CLIP cosine scale, so `relevant` is judged against the keyword threshold.
+        """
+        words, matched = self._keyword_matches(query)
+        if not matched:
+            return None
+        
+        query_lower = query.lower()
+        ranked = []
+        for metadata_idx, score in self._keyword_scores(matched).most_common():
+            img_lower = self._lowered_metadata[metadata_idx]
+            if self._age_boost(query_lower, img_lower) < 0:
+                if len(ranked) < top_k:
+                    return None
+                continue
+            if self._cpr_boost(query_lower, img_lower) < 0:
+                continue
+            ranked.append((metadata_idx, score))
+            if len(ranked) > top_k:
+                break
+        if len(ranked) < top_k:
+            return None
+        kth_score = ranked[top_k - 1][1]
+        next_score = ranked[top_k][1] if len(ranked) > top_k else 0.0
+        if kth_score < FAST_PATH_MIN_SCORE or kth_score < FAST_PATH_MARGIN * next_score:
+            return None
+        
+        content_words = {w for w in words if len(w) > 2 and w not in FAST_PATH_STOPWORDS} or set(words)
+        results = []
+        for metadata_idx, _ in ranked[:top_k]:
+            img_meta = self.metadata[metadata_idx]
+            covered = set()
+            for phrase in matched:
+                if metadata_idx in self.keyword_index[phrase]:
+                    covered.update(phrase.split())
+            coverage = len(covered & content_words) / len(content_words)
+            results.append({
+                'filename': img_meta['filename'],
+                'category': img_meta['category'],
+                'subcategory': img_meta['subcategory'],
+                'caption': img_meta['caption'],
+                'keywords': img_meta['keywords'],
+                'similarity': coverage,
+                'match_type': 'keyword',
+                'relevant': coverage >= RELEVANCE_MIN_SCORE['keyword'],
+            })
+        return results
+    
+    def _record_path(self, path):
+        with self._path_stats_lock:
+            self.path_stats[path] += 1
+    
+    def get_path_stats(self):
+        """Return how many requests each path served and the fast-path coverage"""
+        with self._path_stats_lock:
+            stats = dict(self.path_stats)
+        total = sum(stats.values())
+        stats['total'] = total
+        stats['fast_path_coverage'] = stats.get('keyword', 0) / total if total else 0.0
+        return stats
+    
+    def _encode_texts(self, texts):
+        """Run the CLIP text encoder on a batch of texts and return normalized embeddings"""
+        text_tokens = clip.tokenize(texts, truncate=True).to(self.device)
+        with torch.inference_mode():
+            text_embeddings = self.text_model.encode_text(text_tokens)
+            text_embeddings = text_embeddings / text_embeddings.norm(dim=-1, keepdim=True)
+        return text_embeddings.cpu().numpy().astype(np.float32)
+    
+    def use_quantized_text_encoder(self, enabled=True):
+        """
+        Switch query encoding between the float CLIP model and the int8 text encoder
+        
+        Quantization is only available on CPU. Cached text embeddings are dropped since
+        they were produced by the other encoder.
+        """
+        if enabled and self.device != "cpu":
+            print("⚠️ Quantification int8 disponible uniquement sur CPU, modèle float conservé")
+            enabled = False
+        
+        if enabled:
+            print("⚙️ Quantification dynamique int8 de l'encodeur texte CLIP...")
+            self.text_model = QuantizedTextEncoder(self.model)
+            self.text_encoder_name = f"{self.model_name}-int8"
+        else:
+            self.text_model = self.model
+            self.text_encoder_name = self.model_name
+        
+        if hasattr(self, '_text_cache'):
+            with self._text_cache_lock:
+                self._text_cache.clear()
+                self._text_cache_dirty = False
+    
+    def _cache_put(self, key, embedding):
+        """Insert an embedding in the LRU cache (caller must hold the lock)"""
+        self._text_cache[key] = embedding
+        self._text_cache.move_to_end(key)
+        while len(self._text_cache) > self.text_cache_size:
+            self._text_cache.popitem(last=False)
+        self._text_cache_dirty = True
+    
+    def encode_query(self, query):
+        """
+        Return the normalized CLIP text embedding for a query, using the cache when possible
+        
+        Args:
+            query (str): Natural language emergency description
+            
+        Returns:
+            np.ndarray: 1-D normalized embedding
+        """
+        key = self.normalize_query(query)
+        with self._text_cache_lock:
+            embedding = self._text_cache.get(key)
+            if embedding is not None:
+                self._text_cache.move_to_end(key)
+                return embedding
+        
+        embedding = self._encode_texts([key])[0]
+        with self._text_cache_lock:
+            self._cache_put(key, embedding)
+        return embedding
+    
+    def canonical_queries(self):
+        """Canonical queries derived from the metadata keywords, used to pre-warm the cache"""
+        queries = []
+        for img in self.metadata:
+            queries.extend(img['keywords'])
+            queries.append(img['subcategory'])
+            queries.append(img['category'])
+            queries.append(f"{img['category']} {img['subcategory']}")
+        # Deduplicate on the normalized form while preserving order
+        return list(dict.fromkeys(self.normalize_query(q) for q in queries if q))
+    
+    def warm_text_cache(self, queries=None):
+        """Encode the canonical queries missing from the cache, in batches"""
+        if queries is None:
+            queries = self.canonical_queries()
+        with self._text_cache_lock:
+            missing = [q for q in dict.fromkeys(self.normalize_query(q) for q in queries) if q not in self._text_cache]
+        # Never evict what we just warmed: only keep as many as the cache can hold
+        missing = missing[:self.text_cache_size]
+        if not missing:
+            return 0
+        
+        for start in range(0, len(missing), TEXT_CACHE_BATCH_SIZE):
+            batch = missing[start:start + TEXT_CACHE_BATCH_SIZE]
+            embeddings = self._encode_texts(batch)
+            with self._text_cache_lock:
+                for key, embedding in zip(batch, embeddings):
+                    self._cache_put(key, embedding)
+        print(f"🔥 Cache texte CLIP pré-chauffé ({len(missing)} requêtes)")
+        self.save_text_cache()
+        return len(missing)
+    
+    def _load_text_cache(self):
+        """Load the on-disk text embedding cache, ignoring it if it was built by another model"""
+        if not os.path.exists(self.text_cache_path):
+            return
+        try:
+            data = np.load(self.text_cache_path, allow_pickle=False)
+            if str(data['model']) != self.text_encoder_name:
+                print("⚠️ Cache texte CLIP construit avec un autre modèle, ignoré")
+                return
+            with self._text_cache_lock:
+                for key, embedding in zip(data['queries'].tolist(), data['embeddings']):
+                    self._cache_put(key, embedding.astype(np.float32))
+                self._text_cache_dirty = False
+            print(f"✅ {len(self._text_cache)} embeddings texte chargés depuis le cache")
+        except Exception as e:
+            print(f"⚠️ Cache texte CLIP illisible ({e}), reconstruction...")
+    
+    def save_text_cache(self):
+        """Persist the in-memory text embedding cache to disk (no-op if unchanged or disabled)"""
+        if not self.text_cache_path:
+            return
+        with self._text_cache_lock:
+            if not self._text_cache_dirty or not self._text_cache:
+                return
+            queries = np.array(list(self._text_cache.keys()))
+            embeddings = np.vstack(list(self._text_cache.values()))
+            self._text_cache_dirty = False
+        try:
+            tmp_path = f"{self.text_cache_path}.tmp.npz"
+            np.savez(tmp_path, queries=queries, embeddings=embeddings, model=np.array(self.text_encoder_name))
+            os.replace(tmp_path, self.text_cache_path)
+        except Exception as e:
+            print(f"⚠️ Impossible de sauvegarder le cache texte CLIP: {e}")
+    
+    def retrieve(self, query, top_k=3, use_fast_path=True, category=None, subcategory=None):
         """
         Retrieve top-k most relevant images for a query (French or English)
         
         Args:
             query (str): Natural language emergency description
             top_k (int): Number of top results to return
+            use_fast_path (bool): Answer from the keyword index when unambiguous
+            category (str): Only consider images of this category (optional)
+            subcategory (str): Only consider images of this subcategory (optional)
             
         Returns:
-            list: Top-k results with metadata and similarity scores
+            list: Top-k results with metadata, the path that served them
+                  (match_type 'keyword' or 'clip'), its score (similarity, on
+                  that path's scale) and whether it reaches that path's
+                  relevance threshold (relevant)
         """
-        # Enhance query with metadata for better matching
-        enhanced_query = f"{query}"
+        if use_fast_path and category is None and subcategory is None:
+            results = self._fast_path(query, top_k)
+            if results is not None:
+                self._record_path('keyword')
+                return results
+        self._record_path('clip')
         
-        # Encode query text
-        text_tokens = clip.tokenize([enhanced_query]).to(self.device)
-        with torch.no_grad():
-            query_embedding = self.model.encode_text(text_tokens)
-            query_embedding = query_embedding / query_embedding.norm(dim=-1, keepdim=True)
-        
-        query_embedding = query_embedding.cpu().numpy()
+        # Encode query text (cached: common emergencies are a dictionary lookup)
+        query_embedding = self.encode_query(query)
         
         # Keywords for boosting (French + English)
         keywords_to_boost = [
@@ -130,56 +643,40 @@ class EmergencyImageRetriever:
         
         query_lower = query.lower()
         
-        # Compute cosine similarities
-        similarities = (self.image_embeddings @ query_embedding.T).squeeze()
+        # Shortlist candidates by cosine similarity from the image index
+        shortlist_size = max(top_k * SHORTLIST_FACTOR, SHORTLIST_MIN)
+        candidates = self.image_index.search(query_embedding, shortlist_size, category=category, subcategory=subcategory)
         
-        # Apply keyword boosting - iterate over VALID indices only
-        boosted_similarities = similarities.copy()
-        for emb_idx, metadata_idx in enumerate(self.valid_indices):
-            img_meta = self.metadata[metadata_idx]
+        # Apply keyword boosting to the shortlisted candidates only
+        boosted_candidates = []
+        for emb_idx, similarity in candidates:
+            metadata_idx = self.valid_indices[emb_idx]
+            img_lower = self._lowered_metadata[metadata_idx]
             boost_factor = 0.0
-            caption_lower = img_meta['caption'].lower()
-            keywords_lower = [k.lower() for k in img_meta['keywords']]
-            subcategory_lower = img_meta['subcategory'].lower()
+            caption_lower = img_lower['caption']
+            keywords_lower = img_lower['keywords']
+            subcategory_lower = img_lower['subcategory']
+            category_lower = img_lower['category']
             
             # CRITICAL: Age-specific matching - prioritize exact age group
-            # Baby/infant queries should ONLY match infant images (FR + EN)
-            if any(term in query_lower for term in ['baby', 'infant', 'newborn', 'bébé', 'nourrisson', 'nouveau-né']):
-                if subcategory_lower in ['infant', 'nourrisson'] or any(k in keywords_lower for k in ['infant', 'baby', 'nourrisson', 'bébé']):
-                    boost_factor += 0.5  # Strong boost for infant match
-                elif subcategory_lower in ['adult', 'adulte']:
-                    boost_factor -= 0.8  # Strong penalty for adult when query is about baby
-            
-            # Adult queries should prioritize adult images (FR + EN)
-            elif any(term in query_lower for term in ['adult', 'adulte']):
-                if subcategory_lower in ['adult', 'adulte']:
-                    boost_factor += 0.5
-                elif subcategory_lower in ['infant', 'nourrisson']:
-                    boost_factor -= 0.8
+            boost_factor += self._age_boost(query_lower, img_lower)
             
             # Pregnant woman queries (FR + EN)
             if any(term in query_lower for term in ['pregnant', 'enceinte', 'grossesse', 'pregnancy']):
                 if any(k in keywords_lower for k in ['pregnant', 'enceinte', 'grossesse']):
                     boost_factor += 0.6
             
-            # Special boost for CPR queries (FR + EN) - ONLY if explicitly about CPR/not breathing
-            cpr_terms = ['cpr', 'rcp', 'cardiac arrest', 'arrêt cardiaque', 'not breathing', 'ne respire pas', 'ne respire plus', 'heart stopped', 'massage cardiaque', 'compressions', 'réanimation', 'resuscitation']
-            if any(term in query_lower for term in cpr_terms):
-                if img_meta['category'].lower() in ['cpr', 'rcp']:
-                    boost_factor += 0.5  # Strong boost for CPR category
-            else:
-                # If query is NOT about CPR, penalize CPR images
-                if img_meta['category'].lower() in ['cpr', 'rcp']:
-                    boost_factor -= 0.3
+            # CPR images only for queries explicitly about CPR/not breathing (FR + EN)
+            boost_factor += self._cpr_boost(query_lower, img_lower)
             
             # Special boost for choking queries (FR + EN)
             if any(term in query_lower for term in ['choking', 'étouffement', 'étouffe', "s'étouffe", 'heimlich']):
-                if 'étouffement' in img_meta['category'].lower() or 'choking' in img_meta['category'].lower():
+                if 'étouffement' in category_lower or 'choking' in category_lower:
                     boost_factor += 0.3
             
             # Special boost for PLS / Recovery position (FR + EN)
             if any(term in query_lower for term in ['pls', 'position latérale', 'recovery position', 'inconscient respire', 'unconscious breathing']):
-                if 'pls' in img_meta['category'].lower() or 'recovery' in img_meta['category'].lower() or 'latérale' in img_meta['category'].lower():
+                if 'pls' in category_lower or 'recovery' in category_lower or 'latérale' in category_lower:
                     boost_factor += 0.3
             
             # Special boost for unconscious person queries (FR + EN) - should return assessment/primary survey image
@@ -192,10 +689,10 @@ class EmergencyImageRetriever:
                 if not any(term in query_lower for term in cpr_breathing_terms):
                     if any(k in keywords_lower for k in ['unconscious', 'inconscient', 'primary survey', 'bilan primaire', 'assessment', 'airway', 'voies aériennes']):
                         boost_factor += 0.8  # Very strong boost for assessment image
-                    if 'évaluation' in img_meta['category'].lower() or 'assessment' in img_meta['category'].lower():
+                    if 'évaluation' in category_lower or 'assessment' in category_lower:
                         boost_factor += 0.5
                     # Also check if filename contains "unconsciousness"
-                    if 'unconsciousness' in img_meta['filename'].lower():
+                    if 'unconsciousness' in img_lower['filename']:
                         boost_factor += 0.6
             
             # Check for exact keyword matches
@@ -209,14 +706,14 @@ class EmergencyImageRetriever:
             if subcategory_lower in query_lower:
                 boost_factor += 0.2
                 
-            boosted_similarities[emb_idx] += boost_factor
+            boosted_candidates.append((similarity + boost_factor, emb_idx))
         
-        # Get top-k indices (these are embedding indices, need to map back to metadata)
-        top_emb_indices = np.argsort(boosted_similarities)[::-1][:top_k]
+        # Get top-k candidates (these are embedding indices, need to map back to metadata)
+        boosted_candidates.sort(key=lambda candidate: candidate[0], reverse=True)
         
         # Prepare results - map embedding indices back to metadata indices
         results = []
-        for emb_idx in top_emb_indices:
+        for boosted_similarity, emb_idx in boosted_candidates[:top_k]:
             metadata_idx = self.valid_indices[emb_idx]
             results.append({
                 'filename': self.metadata[metadata_idx]['filename'],
@@ -224,14 +721,19 @@ class EmergencyImageRetriever:
                 'subcategory': self.metadata[metadata_idx]['subcategory'],
                 'caption': self.metadata[metadata_idx]['caption'],
                 'keywords': self.metadata[metadata_idx]['keywords'],
-                'similarity': float(boosted_similarities[emb_idx])
+                'similarity': float(boosted_similarity),
+                'match_type': 'clip',
+                'relevant': float(boosted_similarity) >= RELEVANCE_MIN_SCORE['clip'],
             })
         
         return results
     
     def search_by_category(self, category):
-        """Get all images in a specific category"""
-        return [img for img in self.metadata if img['category'].lower() == category.lower()]
+        """Get all images in a specific category (names, FR/EN aliases or an unambiguous prefix)"""
+        category_key = self.resolve_category(category)
+        if category_key is None:
+            return []
+        return list(self.category_index[category_key])
 
 
 if __name__ == "__main__":
@@ -239,13 +741,7 @@ if __name__ == "__main__":
     retriever = EmergencyImageRetriever()
     
     # Test queries
-    test_queries = [
-        "pregnant woman choking emergency",
-        "baby not breathing CPR",
-        "adult cardiac arrest chest compressions",
-        "unconscious person breathing recovery position",
-        "infant choking back blows"
-    ]
+    test_queries = SAMPLE_QUERIES
     
     print("\n" + "="*60)
     print("🔍 Testing Emergency Image Retrieval")
@@ -259,4 +755,6 @@ if __name__ == "__main__":
             print(f"\n  {i}. {result['filename']}")
             print(f"     Category: {result['category']} - {result['subcategory']}")
             print(f"     Caption: {result['caption']}")
-            print(f"     Similarity: {result['similarity']:.3f}")
+            print(f"     Similarity: {result['similarity']:.3f} ({result['match_type']})")
+    
+    print(f"\n📊 Paths: {retriever.get_path_stats()}")
@@ -1,6 +1,6 @@
 from crewai import Agent, Task, Crew
 from crewai.tools import tool
-from .clip_retriever import EmergencyImageRetriever
+from .clip_retriever import AmbiguousCategory, EmergencyImageRetriever
 import os
 from dotenv import load_dotenv
 
@@ -36,7 +36,7 @@ def search_emergency_image(query: str) -> str:
     IMPORTANT: When using this image in your response, you MUST:
     1. Include the EXACT image path
     2. DESCRIBE what the image shows using the "Description" field
-    3. Only use the image if it matches the situation (relevance > 50%)
+    3. Only use the image if it matches the situation (no low relevance warning)
     """
     retriever = get_retriever()
     results = retriever.retrieve(query, top_k=1)
@@ -44,10 +44,11 @@ def search_emergency_image(query: str) -> str:
     if results:
         best_match = results[0]
         relevance_pct = best_match['similarity'] * 100
+        match_label = "mots-clés" if best_match['match_type'] == 'keyword' else "CLIP"
         
-        # Warn if relevance is low
+        # Warn if relevance is low (each search path has its own threshold)
         relevance_warning = ""
-        if relevance_pct < 50:
+        if not best_match['relevant']:
             relevance_warning = """
 ⚠️ LOW RELEVANCE WARNING: This image may not match the situation well.
    Consider NOT including this image in your response, or search with different keywords.
@@ -68,7 +69,7 @@ def search_emergency_image(query: str) -> str:
 
 🏷️ MOTS-CLÉS : {', '.join(best_match['keywords'][:8])}
 
-📊 PERTINENCE : {relevance_pct:.0f}%
+📊 PERTINENCE : {relevance_pct:.0f}% ({match_label})
 
 ═══════════════════════════════════════════════════════════════════
 ⚠️ INSTRUCTIONS OBLIGATOIRES :
@@ -76,7 +77,7 @@ def search_emergency_image(query: str) -> str:
 Quand tu utilises cette image dans ta réponse :
 1. COPIE le chemin EXACT ci-dessus
 2. DÉCRIS ce que montre l'image en utilisant la description ci-dessus
-3. Si pertinence < 50%, NE PAS utiliser l'image
+3. Si l'avertissement de faible pertinence est affiché, NE PAS utiliser l'image
 
 EXEMPLE DE FORMAT À UTILISER :
 📷 GUIDE VISUEL : [chemin image]
@@ -105,32 +106,13 @@ def browse_emergency_categories(category: str) -> str:
     """
     retriever = get_retriever()
     
-    # Map user-friendly names to actual category names
-    category_map = {
-        'cpr': 'CPR',
-        'choking': 'First aid for choking',
-        'recovery': 'Recovery Position',
-        'recovery position': 'Recovery Position',
-        'log roll': 'How to turn a casualty face up',
-        'turn casualty': 'How to turn a casualty face up'
-    }
-    
-    mapped_category = category_map.get(category.lower(), category)
-    images = retriever.search_by_category(mapped_category)
-    
-    if not images:
-        # Try partial match
-        for img in retriever.metadata:
-            if category.lower() in img['category'].lower():
-                images.append(img)
-    
-    if images:
-        result = f"📁 Found {len(images)} images in '{mapped_category}':\n\n"
-        for i, img in enumerate(images, 1):
-            result += f"{i}. {img['filename']}\n"
-            result += f"   Subcategory: {img['subcategory']}\n"
-            result += f"   Description: {img['caption']}\n\n"
-        return result
+    # User-friendly names (CPR, Choking, ...) are resolved through the retriever's alias index
+    try:
+        listing = retriever.format_category_listing(category)
+    except AmbiguousCategory as e:
+        return f"Category '{category}' is ambiguous, it matches: {', '.join(e.candidates)}. Use one of these names."
+    if listing:
+        return listing
     
     return f"No images found in category '{category}'. Available categories: CPR, Choking, Recovery Position, Log Roll"
 
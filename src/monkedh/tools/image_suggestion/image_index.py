@@ -0,0 +1,268 @@
+"""
+Index vectoriel des embeddings images pour EmergencyImageRetriever.
+
+Trois implémentations partagent la même interface `search` :
+- NumpyImageIndex  : recherche exacte, idéale pour quelques centaines d'images
+- HnswImageIndex   : HNSW local (hnswlib), quelques ms à 100k images
+- QdrantImageIndex : collection Qdrant avec index de payload category/subcategory
+"""
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:  # hnswlib est optionnel : repli sur la recherche exacte
+    hnswlib = None
+
+IMAGE_INDEX_BACKEND = os.getenv("IMAGE_INDEX_BACKEND", "auto")  # auto | numpy | hnsw | qdrant
+ANN_MIN_IMAGES = 1000       # En dessous, la recherche exacte est plus rapide qu'un index ANN
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 128
+IMAGE_COLLECTION_NAME = "emergency_images"
+
+
+def _normalize_label(label: Optional[str]) -> Optional[str]:
+    return label.strip().lower() if label else None
+
+
+def index_fingerprint(embeddings: np.ndarray, payloads: List[Dict[str, str]]) -> str:
+    """Hash of the vectors and filter labels: a persisted index is reused only if it matches"""
+    digest = hashlib.sha256(np.ascontiguousarray(embeddings, dtype=np.float32).tobytes())
+    labels = [(_normalize_label(p["category"]), _normalize_label(p["subcategory"])) for p in payloads]
+    digest.update(json.dumps(labels, ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _exact_search(embeddings: np.ndarray, rows: np.ndarray, query_embedding: np.ndarray, k: int) -> List[Tuple[int, float]]:
+    """Top k (row, cosine similarity) among the given rows, best first"""
+    if not len(rows):
+        return []
+    scores = embeddings[rows] @ query_embedding.astype(np.float32)
+    k = min(k, len(rows))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return [(int(rows[i]), float(scores[i])) for i in top]
+
+
+class NumpyImageIndex:
+    """Brute-force cosine search over normalized embeddings."""
+
+    backend = "numpy"
+
+    def __init__(self, embeddings: np.ndarray, payloads: List[Dict[str, str]]):
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self.categories = np.array([_normalize_label(p["category"]) for p in payloads], dtype=object)
+        self.subcategories = np.array([_normalize_label(p["subcategory"]) for p in payloads], dtype=object)
+
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        k: int,
+        category: Optional[str] = None,
+        subcategory: Optional[str] = None,
+    ) -> List[Tuple[int, float]]:
+        """Return up to k (row, cosine similarity) pairs, best first."""
+        rows = np.arange(len(self.embeddings))
+        mask = np.ones(len(rows), dtype=bool)
+        if category:
+            mask &= self.categories == _normalize_label(category)
+        if subcategory:
+            mask &= self.subcategories == _normalize_label(subcategory)
+        return _exact_search(self.embeddings, rows[mask], query_embedding, k)
+
+
+class HnswImageIndex:
+    """
+    Local HNSW graph (inner product on normalized vectors), persisted next to the embeddings.
+
+    The graph file is reused only when its sidecar fingerprint matches the current
+    embeddings and labels. Filtered searches that the graph cannot serve fall back
+    to an exact search over the matching rows.
+    """
+
+    backend = "hnsw"
+
+    def __init__(self, embeddings: np.ndarray, payloads: List[Dict[str, str]], index_path: Optional[str] = None):
+        if hnswlib is None:
+            raise ImportError("hnswlib n'est pas installé (pip install hnswlib)")
+
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self.categories = np.array([_normalize_label(p["category"]) for p in payloads], dtype=object)
+        self.subcategories = np.array([_normalize_label(p["subcategory"]) for p in payloads], dtype=object)
+        self.index = hnswlib.Index(space="ip", dim=self.embeddings.shape[1])
+
+        fingerprint = index_fingerprint(self.embeddings, payloads)
+        fingerprint_path = f"{index_path}.sha256" if index_path else None
+        loaded = False
+        if fingerprint_path and os.path.exists(index_path) and os.path.exists(fingerprint_path):
+            with open(fingerprint_path, "r", encoding="utf-8") as f:
+                if f.read().strip() == fingerprint:
+                    self.index.load_index(index_path, max_elements=len(self.embeddings))
+                    loaded = self.index.get_current_count() == len(self.embeddings)
+        if not loaded:
+            # get_current_count() must not be called on an index that was never initialized
+            self.index = hnswlib.Index(space="ip", dim=self.embeddings.shape[1])
+            self.index.init_index(max_elements=len(self.embeddings), M=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION)
+            self.index.add_items(self.embeddings, np.arange(len(self.embeddings)))
+            if index_path:
+                self.index.save_index(index_path)
+                with open(fingerprint_path, "w", encoding="utf-8") as f:
+                    f.write(fingerprint)
+        self.index.set_ef(HNSW_EF_SEARCH)
+
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        k: int,
+        category: Optional[str] = None,
+        subcategory: Optional[str] = None,
+    ) -> List[Tuple[int, float]]:
+        """Return up to k (row, cosine similarity) pairs, best first."""
+        category = _normalize_label(category)
+        subcategory = _normalize_label(subcategory)
+        rows = np.arange(len(self.embeddings))
+        payload_filter = None
+        if category or subcategory:
+            mask = np.ones(len(self.embeddings), dtype=bool)
+            if category:
+                mask &= self.categories == category
+            if subcategory:
+                mask &= self.subcategories == subcategory
+            rows = np.flatnonzero(mask)
+            if len(rows) <= k:
+                return _exact_search(self.embeddings, rows, query_embedding, k)
+
+            def payload_filter(row):
+                return bool(mask[row])
+
+        k = min(k, self.index.get_current_count())
+        self.index.set_ef(max(HNSW_EF_SEARCH, k))
+        try:
+            labels, distances = self.index.knn_query(query_embedding.astype(np.float32), k=k, filter=payload_filter)
+        except RuntimeError:
+            # The graph walk could not collect k neighbours passing the filter
+            return _exact_search(self.embeddings, rows, query_embedding, k)
+        # hnswlib "ip" distance is 1 - <a, b>
+        return [(int(row), float(1.0 - dist)) for row, dist in zip(labels[0], distances[0])]
+
+
+class QdrantImageIndex:
+    """
+    Qdrant collection with keyword payload indexes on category and subcategory.
+
+    Every point carries the index fingerprint; the collection is rebuilt unless all
+    its points carry the fingerprint of the current embeddings and labels.
+    """
+
+    backend = "qdrant"
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        payloads: List[Dict[str, str]],
+        collection_name: str = IMAGE_COLLECTION_NAME,
+        qdrant_url: Optional[str] = None,
+        qdrant_api_key: Optional[str] = None,
+    ):
+        from qdrant_client import QdrantClient, models
+        from monkedh.tools.rag.config import QDRANT_URL, QDRANT_API_KEY
+
+        self.models = models
+        self.collection_name = collection_name
+        self.client = QdrantClient(url=qdrant_url or QDRANT_URL, api_key=qdrant_api_key or QDRANT_API_KEY)
+
+        fingerprint = index_fingerprint(embeddings, payloads)
+        if self.client.collection_exists(collection_name):
+            count = self.client.count(collection_name=collection_name, exact=True).count
+            current = self.client.count(
+                collection_name=collection_name,
+                count_filter=models.Filter(must=[
+                    models.FieldCondition(key="fingerprint", match=models.MatchValue(value=fingerprint)),
+                ]),
+                exact=True,
+            ).count
+            if count == current == len(embeddings):
+                return
+            self.client.delete_collection(collection_name)
+
+        self.client.create_collection(
+            collection_name=collection_name,
+            vectors_config=models.VectorParams(size=embeddings.shape[1], distance=models.Distance.COSINE),
+            hnsw_config=models.HnswConfigDiff(m=HNSW_M, ef_construct=HNSW_EF_CONSTRUCTION),
+        )
+        for field in ("category", "subcategory"):
+            self.client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field,
+                field_schema=models.PayloadSchemaType.KEYWORD,
+            )
+        points = [
+            models.PointStruct(
+                id=row,
+                vector=embeddings[row].astype(np.float32).tolist(),
+                payload={
+                    "category": _normalize_label(payload["category"]),
+                    "subcategory": _normalize_label(payload["subcategory"]),
+                    "fingerprint": fingerprint,
+                },
+            )
+            for row, payload in enumerate(payloads)
+        ]
+        for start in range(0, len(points), 256):
+            self.client.upsert(collection_name=collection_name, points=points[start:start + 256], wait=True)
+
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        k: int,
+        category: Optional[str] = None,
+        subcategory: Optional[str] = None,
+    ) -> List[Tuple[int, float]]:
+        """Return up to k (row, cosine similarity) pairs, best first."""
+        models = self.models
+        conditions = [
+            models.FieldCondition(key=field, match=models.MatchValue(value=_normalize_label(value)))
+            for field, value in (("category", category), ("subcategory", subcategory))
+            if value
+        ]
+        results = self.client.search(
+            collection_name=self.collection_name,
+            query_vector=query_embedding.astype(np.float32).tolist(),
+            query_filter=models.Filter(must=conditions) if conditions else None,
+            limit=k,
+            search_params=models.SearchParams(hnsw_ef=max(HNSW_EF_SEARCH, k)),
+        )
+        return [(int(point.id), float(point.score)) for point in results]
+
+
+def create_image_index(
+    embeddings: np.ndarray,
+    payloads: List[Dict[str, str]],
+    backend: str = IMAGE_INDEX_BACKEND,
+    index_path: Optional[str] = None,
+):
+    """
+    Build the image index for the requested backend.
+
+    Args:
+        embeddings: (n, d) normalized image embeddings, one row per valid image
+        payloads: One dict per row with 'category' and 'subcategory'
+        backend: 'auto', 'numpy', 'hnsw' or 'qdrant'
+        index_path: Where the HNSW graph is persisted (hnsw backend only)
+
+    Returns:
+        An index exposing search(query_embedding, k, category=None, subcategory=None)
+    """
+    if backend == "auto":
+        backend = "hnsw" if hnswlib is not None and len(embeddings) >= ANN_MIN_IMAGES else "numpy"
+
+    if backend == "hnsw":
+        return HnswImageIndex(embeddings, payloads, index_path=index_path)
+    if backend == "qdrant":
+        return QdrantImageIndex(embeddings, payloads)
+    return NumpyImageIndex(embeddings, payloads)
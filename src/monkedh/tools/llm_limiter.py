@@ -0,0 +1,373 @@
+"""
+Distributed LLM quota and concurrency limiter shared by every process through Redis.
+
+Each crew run takes one token from a global bucket and one from its channel's
+bucket, and holds a lease in the global and per-channel concurrency sets until
+it finishes. Both checks happen in one Lua script, so concurrent callers on
+several hosts can never overshoot the Azure deployment's budget.
+
+Callers over budget wait in a shared priority queue: life-threatening questions
+("ne respire plus", "inconscient"...) are ranked ahead of every other waiter,
+and background work (conversation summaries) behind every user turn, FIFO
+within a class. A waiter only proceeds when its rank fits in the free
+global slots, so later callers cannot overtake it. Waiters whose channel is
+at its concurrency cap or out of tokens are skipped when computing that rank,
+so one busy channel does not hold back the others. Refused callers get a retry
+delay estimated from the average run time, not a fixed poll.
+
+Redis layout (the {llm_limiter} hash tag keeps every key in one cluster slot):
+    {llm_limiter}:bucket:global / :bucket:channel:<id>    hash   tokens, ts (ms)
+    {llm_limiter}:leases:global / :leases:channel:<id>    zset   ticket -> lease expiry (ms)
+    {llm_limiter}:queue                                   zset   ticket -> class * 1e13 + enqueue time
+    {llm_limiter}:waiters                                 zset   ticket -> heartbeat expiry (ms)
+    {llm_limiter}:queue:channels                          hash   ticket -> channel id
+    {llm_limiter}:hold                                    string average run time (ms)
+
+The acquire script reads the lease set and bucket of the channels of queued
+tickets by name; they share the hash tag, hence the slot, of the declared keys.
+
+Expired leases (crashed workers) and waiters that stopped polling are purged by
+the script itself. When Redis is unreachable the limiter fails open.
+"""
+import os
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from .answer_cache import normalize_question
+
+LLM_LIMITER_ENABLED = os.getenv("LLM_LIMITER", "on").lower() not in ("off", "0", "false")
+LLM_RATE_PER_MINUTE = float(os.getenv("LLM_RATE_PER_MINUTE", 60))                   # Exécutions crew / minute, tous canaux
+LLM_BURST = float(os.getenv("LLM_BURST", 10))                                       # Rafale globale autorisée
+LLM_CHANNEL_RATE_PER_MINUTE = float(os.getenv("LLM_CHANNEL_RATE_PER_MINUTE", 10))   # Exécutions crew / minute par canal
+LLM_CHANNEL_BURST = float(os.getenv("LLM_CHANNEL_BURST", 3))                        # Rafale autorisée par canal
+LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", 8))                        # Exécutions simultanées, tous canaux
+LLM_CHANNEL_MAX_CONCURRENT = int(os.getenv("LLM_CHANNEL_MAX_CONCURRENT", 1))        # Exécutions simultanées par canal
+LLM_MAX_WAIT = float(os.getenv("LLM_MAX_WAIT", 60))                                 # Attente maximale en file (s)
+LLM_URGENT_MAX_WAIT = float(os.getenv("LLM_URGENT_MAX_WAIT", 120))                  # Attente maximale, urgence vitale (s)
+LLM_LEASE_TTL = 300        # Un bail non libéré (processus tué) expire après 5 minutes
+LLM_WAITER_TTL = 10        # Un appelant qui ne réinterroge plus la file en est retiré après 10 s
+LLM_POLL_INTERVAL = 0.25   # Intervalle maximal entre deux tentatives (s)
+LLM_HOLD_ESTIMATE = 10     # Durée supposée d'une exécution crew tant qu'aucune n'a été mesurée (s)
+KEY_PREFIX = "{llm_limiter}"
+
+PRIORITY_URGENT = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BACKGROUND = 2   # Travail hors requête (résumés): servi après toutes les questions
+
+# Life-threatening situations, matched on the normalized question (accented and plain spellings)
+URGENT_KEYWORDS = (
+    "ne respire pas", "ne respire plus", "respire plus", "respire mal", "inconscient", "inconsciente",
+    "ne répond pas", "ne repond pas", "ne réagit pas", "ne reagit pas", "évanoui", "evanoui",
+    "arrêt cardiaque", "arret cardiaque", "crise cardiaque", "infarctus", "massage cardiaque",
+    "étouffe", "etouffe", "s'étouffe", "s'etouffe", "convulsion", "convulse", "avc",
+    "hémorragie", "hemorragie", "saigne beaucoup", "noyade", "noyé", "noye", "overdose",
+    "empoisonn", "intoxication", "choc anaphylactique", "anaphylax",
+    "not breathing", "unconscious", "cardiac arrest", "heart attack", "choking", "seizure",
+    "stroke", "severe bleeding", "drowning",
+)
+
+ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local ticket = ARGV[1]
+local cost = tonumber(ARGV[11])
+local waiter_ttl = tonumber(ARGV[10])
+local lease_ttl = tonumber(ARGV[9])
+local max_concurrent, channel_max = tonumber(ARGV[7]), tonumber(ARGV[8])
+local global_rate, global_burst = tonumber(ARGV[3]), tonumber(ARGV[4])
+local channel_rate, channel_burst = tonumber(ARGV[5]), tonumber(ARGV[6])
+local hold = tonumber(redis.call('GET', KEYS[8])) or tonumber(ARGV[13])
+
+-- Leases of crashed workers and waiters that stopped polling
+redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', now)
+redis.call('ZREMRANGEBYSCORE', KEYS[4], '-inf', now)
+local gone = redis.call('ZRANGEBYSCORE', KEYS[6], '-inf', now)
+if #gone > 0 then
+    redis.call('ZREM', KEYS[5], unpack(gone))
+    redis.call('HDEL', KEYS[7], unpack(gone))
+    redis.call('ZREMRANGEBYSCORE', KEYS[6], '-inf', now)
+end
+
+-- Join the queue on the first attempt, refresh the heartbeat on every attempt
+if not redis.call('ZSCORE', KEYS[5], ticket) then
+    redis.call('ZADD', KEYS[5], tonumber(ARGV[2]) * 1e13 + now, ticket)
+    redis.call('HSET', KEYS[7], ticket, ARGV[12])
+end
+redis.call('ZADD', KEYS[6], now + waiter_ttl, ticket)
+redis.call('PEXPIRE', KEYS[5], waiter_ttl)
+redis.call('PEXPIRE', KEYS[6], waiter_ttl)
+redis.call('PEXPIRE', KEYS[7], waiter_ttl)
+
+local function refill(key, rate, burst)
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    return math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+end
+
+-- Own channel at its concurrency cap: wait for its oldest run to end
+local channel_leases = redis.call('ZRANGE', KEYS[4], 0, 0, 'WITHSCORES')
+if redis.call('ZCARD', KEYS[4]) >= channel_max then
+    local expiry = tonumber(channel_leases[2])
+    local wait = math.min(expiry - now, expiry - lease_ttl + hold - now)
+    return {0, math.max(50, math.ceil(wait)), redis.call('ZRANK', KEYS[5], ticket)}
+end
+
+-- Only waiters ahead that could run now count against the free slots:
+-- a ticket whose channel is at its concurrency cap or out of tokens cannot take one
+local blocked = {}
+local function channel_blocked(channel)
+    if blocked[channel] == nil then
+        local leases = ARGV[14] .. ':leases:channel:' .. channel
+        local bucket = ARGV[14] .. ':bucket:channel:' .. channel
+        blocked[channel] = redis.call('ZCOUNT', leases, now, '+inf') >= channel_max
+            or refill(bucket, channel_rate, channel_burst) < cost
+    end
+    return blocked[channel]
+end
+local rank = 0
+local position = redis.call('ZRANK', KEYS[5], ticket)
+if position > 0 then
+    local ahead = redis.call('ZRANGE', KEYS[5], 0, position - 1)
+    local channels = redis.call('HMGET', KEYS[7], unpack(ahead))
+    for i = 1, #ahead do
+        if not (channels[i] and channel_blocked(channels[i])) then
+            rank = rank + 1
+        end
+    end
+end
+
+-- Global slots: wait until enough runs ahead of us have ended
+local free = max_concurrent - redis.call('ZCARD', KEYS[3])
+if rank >= free then
+    local wait = (rank - free + 1) * hold / max_concurrent
+    local oldest = redis.call('ZRANGE', KEYS[3], 0, 0, 'WITHSCORES')
+    if oldest[2] then
+        wait = math.max(wait, tonumber(oldest[2]) - lease_ttl + hold - now)
+    end
+    return {0, math.max(50, math.ceil(wait)), rank}
+end
+
+local global_tokens = refill(KEYS[1], global_rate, global_burst)
+local channel_tokens = refill(KEYS[2], channel_rate, channel_burst)
+if global_tokens < cost or channel_tokens < cost then
+    local wait = math.max(
+        (cost - global_tokens) * 1000 / global_rate,
+        (cost - channel_tokens) * 1000 / channel_rate
+    )
+    return {0, math.ceil(wait), rank}
+end
+
+redis.call('HSET', KEYS[1], 'tokens', global_tokens - cost, 'ts', now)
+redis.call('HSET', KEYS[2], 'tokens', channel_tokens - cost, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(global_burst * 1000 / global_rate) + 1000)
+redis.call('PEXPIRE', KEYS[2], math.ceil(channel_burst * 1000 / channel_rate) + 1000)
+
+redis.call('ZADD', KEYS[3], now + lease_ttl, ticket)
+redis.call('ZADD', KEYS[4], now + lease_ttl, ticket)
+redis.call('PEXPIRE', KEYS[3], lease_ttl)
+redis.call('PEXPIRE', KEYS[4], lease_ttl)
+redis.call('ZREM', KEYS[5], ticket)
+redis.call('ZREM', KEYS[6], ticket)
+redis.call('HDEL', KEYS[7], ticket)
+return {1, 0, rank}
+"""
+
+# Frees a ticket and folds its run time into the hold-time average used for retry estimates
+RELEASE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local expiry = redis.call('ZSCORE', KEYS[3], ARGV[1])
+if expiry then
+    local held = now - (tonumber(expiry) - tonumber(ARGV[2]))
+    local average = tonumber(redis.call('GET', KEYS[8]))
+    if average then
+        held = average * 0.8 + held * 0.2
+    end
+    redis.call('SET', KEYS[8], math.floor(held), 'PX', tonumber(ARGV[2]) * 12)
+end
+redis.call('ZREM', KEYS[3], ARGV[1])
+redis.call('ZREM', KEYS[4], ARGV[1])
+redis.call('ZREM', KEYS[5], ARGV[1])
+redis.call('ZREM', KEYS[6], ARGV[1])
+redis.call('HDEL', KEYS[7], ARGV[1])
+return expiry and 1 or 0
+"""
+
+
+class RateLimitExceeded(Exception):
+    """The caller waited LLM_MAX_WAIT (or LLM_URGENT_MAX_WAIT) seconds without getting a slot."""
+
+    def __init__(self, channel_id: str, priority: int, waited: float):
+        super().__init__(f"LLM quota exhausted for channel {channel_id} after {waited:.1f}s in queue")
+        self.channel_id = channel_id
+        self.priority = priority
+        self.waited = waited
+
+
+def question_priority(question: str) -> int:
+    """PRIORITY_URGENT for life-threatening situations, PRIORITY_NORMAL otherwise"""
+    text = normalize_question(question)
+    return PRIORITY_URGENT if any(keyword in text for keyword in URGENT_KEYWORDS) else PRIORITY_NORMAL
+
+
+class LLMRateLimiter:
+    """Token-bucket + concurrency limiter around crew runs, keyed per channel and globally."""
+
+    def __init__(
+        self,
+        memory,
+        rate_per_minute: float = LLM_RATE_PER_MINUTE,
+        burst: float = LLM_BURST,
+        channel_rate_per_minute: float = LLM_CHANNEL_RATE_PER_MINUTE,
+        channel_burst: float = LLM_CHANNEL_BURST,
+        max_concurrent: int = LLM_MAX_CONCURRENT,
+        channel_max_concurrent: int = LLM_CHANNEL_MAX_CONCURRENT,
+        enabled: bool = LLM_LIMITER_ENABLED,
+    ):
+        """
+        Args:
+            memory: RedisMemory whose client holds the buckets and queue
+            rate_per_minute / burst: Global token bucket (crew runs)
+            channel_rate_per_minute / channel_burst: Token bucket of each channel
+            max_concurrent / channel_max_concurrent: Simultaneous runs, globally and per channel
+            enabled: False lets every call through
+        """
+        self.memory = memory
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.channel_rate = channel_rate_per_minute / 60
+        self.channel_burst = channel_burst
+        self.max_concurrent = max_concurrent
+        self.channel_max_concurrent = channel_max_concurrent
+        self.enabled = enabled
+        self._acquire_script = None
+        self._release_script = None
+
+    # ------------------------------------------------------------------ keys
+
+    @staticmethod
+    def _keys(channel_id: str):
+        return [
+            f"{KEY_PREFIX}:bucket:global",
+            f"{KEY_PREFIX}:bucket:channel:{channel_id}",
+            f"{KEY_PREFIX}:leases:global",
+            f"{KEY_PREFIX}:leases:channel:{channel_id}",
+            f"{KEY_PREFIX}:queue",
+            f"{KEY_PREFIX}:waiters",
+            f"{KEY_PREFIX}:queue:channels",
+            f"{KEY_PREFIX}:hold",
+        ]
+
+    # ------------------------------------------------------------------ public API
+
+    def try_acquire(self, client, channel_id: str, ticket: str, priority: int, cost: float = 1):
+        """
+        One atomic attempt: (granted, retry_after_seconds, queue_rank).
+
+        queue_rank counts the waiters ahead that could run now (their channel is not blocked).
+
+        Queues the ticket when it is not granted; call again with the same ticket to keep its place.
+        """
+        if self._acquire_script is None:
+            self._acquire_script = client.register_script(ACQUIRE_SCRIPT)
+        granted, retry_ms, rank = self._acquire_script(keys=self._keys(channel_id), args=[
+            ticket, priority, self.rate, self.burst, self.channel_rate, self.channel_burst,
+            self.max_concurrent, self.channel_max_concurrent,
+            LLM_LEASE_TTL * 1000, LLM_WAITER_TTL * 1000, cost,
+            channel_id, LLM_HOLD_ESTIMATE * 1000, KEY_PREFIX,
+        ])
+        return bool(granted), retry_ms / 1000, rank
+
+    def release(self, client, channel_id: str, ticket: str) -> None:
+        """Free the concurrency slots of a ticket (or drop it from the queue)"""
+        if self._release_script is None:
+            self._release_script = client.register_script(RELEASE_SCRIPT)
+        self._release_script(keys=self._keys(channel_id), args=[ticket, LLM_LEASE_TTL * 1000])
+
+    def _wait_for_slot(self, client, channel_id: str, priority: int, info: Dict[str, Any]) -> str:
+        """Poll the acquire script until granted; returns the ticket holding the slot"""
+        ticket = uuid.uuid4().hex
+        max_wait = LLM_URGENT_MAX_WAIT if priority == PRIORITY_URGENT else LLM_MAX_WAIT
+        started = time.monotonic()
+        while True:
+            granted, retry_after, rank = self.try_acquire(client, channel_id, ticket, priority)
+            if granted:
+                return ticket
+            waited = time.monotonic() - started
+            if not info["waited"]:
+                info["rank"] = rank
+                label = {PRIORITY_URGENT: "urgence vitale", PRIORITY_BACKGROUND: "tâche de fond"}.get(priority, "normale")
+                print(f"⏳ Quota LLM atteint, mise en file (priorité {label}, position {rank + 1})")
+            if waited >= max_wait:
+                self.release(client, channel_id, ticket)
+                raise RateLimitExceeded(channel_id, priority, waited)
+            # Jitter spreads the retries of waiters released at the same time
+            time.sleep(min(max(retry_after, 0.02), LLM_POLL_INTERVAL) * random.uniform(0.8, 1.2))
+            info["waited"] = time.monotonic() - started
+
+    @contextmanager
+    def slot(self, channel_id: str, question: str = "", priority: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Wait for a slot, run the block, release the slot.
+
+        Yields {"priority", "waited", "rank"} (rank = position when first queued).
+        Raises RateLimitExceeded when the maximum wait for the priority class elapsed.
+        """
+        if priority is None:
+            priority = question_priority(question)
+        info = {"priority": priority, "waited": 0.0, "rank": 0}
+        client = self.memory.redis_client if self.enabled else None
+        ticket = None
+        if client:
+            try:
+                ticket = self._wait_for_slot(client, channel_id, priority, info)
+            except RateLimitExceeded:
+                raise
+            except Exception as e:
+                print(f"⚠️ Limiteur LLM indisponible, appel non limité: {e}")
+
+        try:
+            yield info
+        finally:
+            if ticket:
+                try:
+                    self.release(client, channel_id, ticket)
+                except Exception as e:
+                    print(f"⚠️ Bail LLM non libéré (expirera après {LLM_LEASE_TTL} s): {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Active runs, queued callers by priority class and remaining global tokens"""
+        client = self.memory.redis_client
+        if not client:
+            return {"status": "disconnected"}
+
+        now_ms = time.time() * 1000
+        keys = self._keys("")
+        pipe = client.pipeline(transaction=False)
+        pipe.zcount(keys[2], now_ms, "+inf")
+        pipe.zcount(keys[4], "-inf", f"({1e13:.0f}")
+        pipe.zcard(keys[4])
+        pipe.zcount(keys[4], f"{PRIORITY_BACKGROUND * 1e13:.0f}", "+inf")
+        pipe.hmget(keys[0], "tokens", "ts")
+        pipe.get(keys[7])
+        active, urgent, queued, background, (tokens, ts), hold_ms = pipe.execute()
+        if tokens is None:
+            tokens = self.burst
+        else:
+            tokens = min(self.burst, float(tokens) + max(0.0, now_ms - float(ts)) * self.rate / 1000)
+        return {
+            "enabled": self.enabled,
+            "active": active,
+            "queued": queued,
+            "queued_urgent": urgent,
+            "queued_background": background,
+            "global_tokens": round(tokens, 2),
+            "avg_run_s": round(float(hold_ms) / 1000, 2) if hold_ms else None,
+            "rate_per_minute": self.rate * 60,
+            "max_concurrent": self.max_concurrent,
+            "channel_max_concurrent": self.channel_max_concurrent,
+        }
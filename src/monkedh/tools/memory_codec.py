@@ -0,0 +1,174 @@
+"""
+Compact, versioned encoding of the conversation memory entries stored in Redis.
+
+Layout of an encoded entry:
+    MAGIC (1 byte) | VERSION (1 byte) | FLAGS (1 byte) | payload
+
+The payload is msgpack (or compact JSON when msgpack is not installed) with
+short field names, compressed with zstd when it exceeds ZSTD_MIN_BYTES.
+MAGIC is 0xC1, a byte that is neither valid UTF-8 lead byte nor used by
+msgpack, so legacy JSON entries ("{...}") are told apart unambiguously and
+stay readable through decode_entry.
+"""
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Union
+
+try:
+    import msgpack
+except ImportError:  # msgpack est optionnel : repli sur du JSON compact
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard est optionnel : pas de compression
+    zstandard = None
+
+MAGIC = 0xC1
+CODEC_VERSION = 1
+FLAG_ZSTD = 0x01
+FLAG_JSON = 0x02
+ZSTD_MIN_BYTES = 512   # En dessous, la compression ne rapporte rien
+ZSTD_LEVEL = 3
+
+# Long field names -> one-letter keys written on the wire
+FIELD_ALIASES = {
+    "user_id": "u",
+    "username": "n",
+    "user_query": "q",
+    "bot_response": "r",
+    "value": "v",
+    "metadata": "m",
+    "unix_timestamp": "t",
+}
+FIELD_NAMES = {alias: name for name, alias in FIELD_ALIASES.items()}
+
+_compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL) if zstandard else None
+_decompressor = zstandard.ZstdDecompressor() if zstandard else None
+
+
+def encode_entry(entry: Dict[str, Any]) -> bytes:
+    """
+    Encode a memory entry (conversation pair or crew memory item).
+
+    The ISO `timestamp` field is not stored: `unix_timestamp` (seconds, float
+    accepted) is kept with millisecond precision and `timestamp` is rebuilt on
+    decode. Missing `unix_timestamp` defaults to now.
+    """
+    compact = {
+        FIELD_ALIASES.get(key, key): value
+        for key, value in entry.items()
+        if key not in ("timestamp", "unix_timestamp")
+    }
+    compact["t"] = int(float(entry.get("unix_timestamp", time.time())) * 1000)
+
+    flags = 0
+    if msgpack is not None:
+        payload = msgpack.packb(compact, use_bin_type=True)
+    else:
+        payload = json.dumps(compact, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        flags |= FLAG_JSON
+
+    if _compressor is not None and len(payload) >= ZSTD_MIN_BYTES:
+        payload = _compressor.compress(payload)
+        flags |= FLAG_ZSTD
+
+    return bytes((MAGIC, CODEC_VERSION, flags)) + payload
+
+
+def decode_entry(raw: Union[bytes, str]) -> Optional[Dict[str, Any]]:
+    """
+    Decode an entry written by encode_entry or a legacy JSON entry.
+
+    Returns None when the entry cannot be decoded (corrupted, unknown version,
+    or compressed while zstandard is not installed).
+    """
+    if isinstance(raw, str):
+        raw = raw.encode("utf-8")
+    if not raw:
+        return None
+
+    if raw[0] != MAGIC:
+        # Legacy format: plain JSON with timestamp + unix_timestamp
+        try:
+            return json.loads(raw)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return None
+
+    if len(raw) < 3 or raw[1] != CODEC_VERSION:
+        return None
+    flags, payload = raw[2], raw[3:]
+    try:
+        if flags & FLAG_ZSTD:
+            if _decompressor is None:
+                return None
+            payload = _decompressor.decompress(payload)
+        if flags & FLAG_JSON:
+            compact = json.loads(payload)
+        elif msgpack is not None:
+            compact = msgpack.unpackb(payload, raw=False)
+        else:
+            return None
+    except Exception:
+        return None
+
+    entry = {FIELD_NAMES.get(key, key): value for key, value in compact.items()}
+    timestamp_ms = entry.pop("unix_timestamp", 0)
+    entry["timestamp"] = datetime.fromtimestamp(timestamp_ms / 1000).isoformat()
+    entry["unix_timestamp"] = timestamp_ms // 1000
+    return entry
+
+
+if __name__ == "__main__":
+    # Benchmark: legacy JSON vs compact encoding on a realistic bot answer
+    from pathlib import Path
+
+    answer_path = Path(__file__).resolve().parents[3] / "protocols_urgences.json"
+    bot_response = answer_path.read_text(encoding="utf-8") if answer_path.exists() else "Appelez le 190. " * 200
+
+    now = datetime.now()
+    legacy_pair = {
+        "user_id": "3f0c2b7e-8d1a-4c55-9a77-2d6b1c0e9f41",
+        "username": "Temoin",
+        "user_query": "Mon voisin ne respire plus, que faire ?",
+        "bot_response": bot_response,
+        "timestamp": now.isoformat(),
+        "unix_timestamp": int(now.timestamp()),
+    }
+    short_pair = dict(legacy_pair, bot_response="D'accord, restez près de lui et rappelez-moi.")
+
+    print("=" * 60)
+    print("BENCHMARK ENCODAGE MÉMOIRE CONVERSATIONNELLE")
+    print("=" * 60)
+    print(f"msgpack: {'oui' if msgpack else 'non'} | zstandard: {'oui' if zstandard else 'non'}\n")
+
+    iterations = 5000
+    for label, pair in (("Réponse longue", legacy_pair), ("Réponse courte", short_pair)):
+        legacy = json.dumps(pair)
+        compact = encode_entry(pair)
+        assert decode_entry(compact)["bot_response"] == pair["bot_response"]
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            json.dumps(pair)
+        legacy_encode_us = (time.perf_counter() - start) * 1e6 / iterations
+        start = time.perf_counter()
+        for _ in range(iterations):
+            json.loads(legacy)
+        legacy_decode_us = (time.perf_counter() - start) * 1e6 / iterations
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            encode_entry(pair)
+        compact_encode_us = (time.perf_counter() - start) * 1e6 / iterations
+        start = time.perf_counter()
+        for _ in range(iterations):
+            decode_entry(compact)
+        compact_decode_us = (time.perf_counter() - start) * 1e6 / iterations
+
+        legacy_bytes = len(legacy.encode("utf-8"))
+        print(f"📝 {label}")
+        print(f"   JSON legacy : {legacy_bytes:6d} octets/paire | encode {legacy_encode_us:6.1f} µs | decode {legacy_decode_us:6.1f} µs")
+        print(f"   Compact v{CODEC_VERSION}  : {len(compact):6d} octets/paire | encode {compact_encode_us:6.1f} µs | decode {compact_decode_us:6.1f} µs")
+        print(f"   Gain        : {100 * (1 - len(compact) / legacy_bytes):.0f}%\n")
@@ -0,0 +1,207 @@
+"""
+Streaming export / import of the conversation memory as JSONL.
+
+One line per Redis key, in constant memory: keys are walked with SCAN and read
+in pipelined batches (LRANGE / HGETALL + PTTL); import writes them back in
+pipelined batches and restores the remaining TTL.
+
+    export_memory conversations.jsonl            # "-" for stdout
+    import_memory conversations.jsonl [--replace]
+
+Line format:
+    {"key": "conversation_pairs:abc", "ttl_ms": 81234000, "type": "entries", "values": [{...}, ...]}
+type is "entries" for decoded memory entries (re-encoded with the current codec
+on import), "strings" / "base64" for the parallel terms / vector lists, "hash"
+for summaries and "dump" (DUMP/RESTORE, base64) for any other key.
+"""
+import argparse
+import base64
+import json
+import sys
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from typing import IO, Any, Dict, Iterator, List, Optional
+
+from .memory_codec import decode_entry, encode_entry
+from .redis_storage import get_redis_memory
+
+EXPORT_MATCH = "conversation*"   # Listes de conversation, mémoire crew (namespace:user:short_term), résumés
+TRANSFER_BATCH_SIZE = 500        # Clés par SCAN et par pipeline
+
+ENTRY_KINDS = ("conversation", "conversation_pairs")
+STRING_KINDS = ("conversation_terms",)
+BINARY_KINDS = ("conversation_vectors", "conversation_pair_vectors")
+HASH_KINDS = ("conversation_summary",)
+
+
+def _key_kind(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
+def _batches(keys: Iterator[bytes], size: int) -> Iterator[List[bytes]]:
+    batch = []
+    for key in keys:
+        batch.append(key)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _export_record(key: str, value: Any, ttl_ms: int) -> Optional[Dict[str, Any]]:
+    """JSON-serializable record of one key, None when it vanished between SCAN and read"""
+    if value is None or value == [] or value == {}:
+        return None
+    kind = _key_kind(key)
+    record: Dict[str, Any] = {"key": key, "ttl_ms": ttl_ms if ttl_ms > 0 else None}
+    if kind in ENTRY_KINDS:
+        record["type"] = "entries"
+        record["values"] = [decode_entry(raw) for raw in value]
+    elif kind in STRING_KINDS:
+        record["type"] = "strings"
+        record["values"] = [raw.decode("utf-8") for raw in value]
+    elif kind in BINARY_KINDS:
+        record["type"] = "base64"
+        record["values"] = [base64.b64encode(raw).decode("ascii") for raw in value]
+    elif kind in HASH_KINDS:
+        record["type"] = "hash"
+        record["values"] = {field.decode("utf-8"): raw.decode("utf-8") for field, raw in value.items()}
+    else:
+        record["type"] = "dump"
+        record["values"] = base64.b64encode(value).decode("ascii")
+    return record
+
+
+def _queue_read(pipe, key: str) -> None:
+    kind = _key_kind(key)
+    if kind in ENTRY_KINDS + STRING_KINDS + BINARY_KINDS:
+        pipe.lrange(key, 0, -1)
+    elif kind in HASH_KINDS:
+        pipe.hgetall(key)
+    else:
+        pipe.dump(key)
+    pipe.pttl(key)
+
+
+def export_memory(out: IO[str], match: str = EXPORT_MATCH, batch_size: int = TRANSFER_BATCH_SIZE) -> int:
+    """Stream every key matching `match` to `out` as JSONL; returns the number of keys written"""
+    client = get_redis_memory().redis_client
+    if not client:
+        raise RuntimeError("Redis not available")
+
+    written = 0
+    for raw_keys in _batches(client.scan_iter(match=match, count=batch_size), batch_size):
+        keys = [raw_key.decode("utf-8") for raw_key in raw_keys]
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            _queue_read(pipe, key)
+        replies = pipe.execute()
+        for i, key in enumerate(keys):
+            record = _export_record(key, replies[2 * i], replies[2 * i + 1])
+            if record is not None:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                written += 1
+    return written
+
+
+def _precise_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Entry whose unix_timestamp regains the milliseconds decode_entry drops (kept in the ISO timestamp)"""
+    try:
+        precise = datetime.fromisoformat(entry["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return entry
+    if int(precise) != int(float(entry.get("unix_timestamp", precise))):
+        return entry  # Ambiguous local time (DST change): keep the seconds
+    return dict(entry, unix_timestamp=precise)
+
+
+def _queue_write(pipe, record: Dict[str, Any], replace: bool) -> None:
+    key, kind, values, ttl_ms = record["key"], record["type"], record["values"], record.get("ttl_ms")
+    if kind == "dump":
+        pipe.restore(key, ttl_ms or 0, base64.b64decode(values), replace=True)
+        return
+
+    if replace:
+        pipe.delete(key)
+    if kind == "entries":
+        encoded = [encode_entry(_precise_entry(entry)) for entry in values if entry is not None]
+        if encoded:
+            pipe.rpush(key, *encoded)  # Export order is newest first, as stored
+    elif kind == "strings":
+        pipe.rpush(key, *values)
+    elif kind == "base64":
+        pipe.rpush(key, *(base64.b64decode(value) for value in values))
+    elif kind == "hash":
+        pipe.hset(key, mapping=values)
+    if ttl_ms:
+        pipe.pexpire(key, ttl_ms)
+
+
+def import_memory(lines: IO[str], replace: bool = False, batch_size: int = TRANSFER_BATCH_SIZE) -> int:
+    """
+    Write JSONL records back to Redis in pipelined batches; returns the number of keys imported.
+
+    With replace=False, list records are appended to existing keys (merge: use it
+    on an empty target, or the parallel terms/vector lists may lose alignment);
+    with replace=True existing keys are overwritten. "dump" keys are always replaced.
+    """
+    client = get_redis_memory().redis_client
+    if not client:
+        raise RuntimeError("Redis not available")
+
+    imported = 0
+    pending = 0
+    pipe = client.pipeline(transaction=False)
+    for line in lines:
+        if not line.strip():
+            continue
+        _queue_write(pipe, json.loads(line), replace)
+        pending += 1
+        if pending >= batch_size:
+            pipe.execute()
+            imported += pending
+            pending = 0
+            pipe = client.pipeline(transaction=False)
+    if pending:
+        pipe.execute()
+        imported += pending
+    return imported
+
+
+def export_entry():
+    """Command line entry point: export_memory OUTPUT.jsonl [--match PATTERN]"""
+    parser = argparse.ArgumentParser(description="Exporter la mémoire conversationnelle Redis en JSONL")
+    parser.add_argument("output", help="Fichier JSONL de sortie ('-' pour la sortie standard)")
+    parser.add_argument("--match", default=EXPORT_MATCH, help=f"Motif SCAN des clés (défaut: {EXPORT_MATCH})")
+    parser.add_argument("--batch-size", type=int, default=TRANSFER_BATCH_SIZE)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.output == "-":
+        # Connection messages are printed: keep them out of the JSONL stream
+        out = sys.stdout
+        with redirect_stdout(sys.stderr):
+            count = export_memory(out, args.match, args.batch_size)
+    else:
+        with open(args.output, "w", encoding="utf-8") as out:
+            count = export_memory(out, args.match, args.batch_size)
+    print(f"✅ {count} clés exportées en {time.perf_counter() - started:.1f} s", file=sys.stderr)
+
+
+def import_entry():
+    """Command line entry point: import_memory INPUT.jsonl [--replace]"""
+    parser = argparse.ArgumentParser(description="Importer une mémoire conversationnelle JSONL dans Redis")
+    parser.add_argument("input", help="Fichier JSONL à importer ('-' pour l'entrée standard)")
+    parser.add_argument("--replace", action="store_true", help="Écraser les clés existantes au lieu de fusionner")
+    parser.add_argument("--batch-size", type=int, default=TRANSFER_BATCH_SIZE)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.input == "-":
+        count = import_memory(sys.stdin, args.replace, args.batch_size)
+    else:
+        with open(args.input, encoding="utf-8") as lines:
+            count = import_memory(lines, args.replace, args.batch_size)
+    print(f"✅ {count} clés importées en {time.perf_counter() - started:.1f} s", file=sys.stderr)
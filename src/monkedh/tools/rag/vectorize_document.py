@@ -18,6 +18,7 @@ load_dotenv()
 
 from monkedh.tools.rag.vectorize import QdrantVectorizer
 from monkedh.tools.rag.chunker import DocumentChunker
+from monkedh.tools.answer_cache import invalidate_answer_cache
 
 
 def main():
@@ -108,6 +109,9 @@ def main():
         metadata=metadata
     )
     
+    # Cached answers were built on the previous version of the manual
+    invalidate_answer_cache()
+    
     # Test search
     print(f"\n{'=' * 60}")
     print("Testing Search...")
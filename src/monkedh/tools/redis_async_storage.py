@@ -0,0 +1,426 @@
+"""
+redis.asyncio variant of RedisMemory for servers handling many concurrent sessions.
+Same surface and key layout as RedisMemory, so both can be used on the same data.
+"""
+import asyncio
+import threading
+import time
+import weakref
+from typing import Any, Awaitable, Dict, List, Optional, Sequence, Set, Tuple
+
+import redis
+import redis.asyncio as aioredis
+from redis.asyncio.cluster import ClusterNode, RedisCluster
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+
+from .redis_storage import (
+    CONVERSATION_MEMORY_LIMIT,
+    REDIS_CLUSTER,
+    REDIS_HEALTH_CHECK_INTERVAL,
+    REDIS_MAX_CONNECTIONS,
+    REDIS_POOL_TIMEOUT,
+    REDIS_RECONNECT_COOLDOWN,
+    REDIS_SOCKET_TIMEOUT,
+    STATS_CACHE_SECONDS,
+    STATS_SCAN_COUNT,
+    USERS_HLL_KEY,
+    FILL_VECTOR_SCRIPT,
+    SEARCH_SCRIPT,
+    RedisMemory,
+    _HistoryCache,
+    _connection_settings,
+    channel_key,
+    cluster_startup_nodes,
+    embed_for_memory,
+    embed_query,
+    encode_entry,
+    memory_embeddings_enabled,
+    pair_text,
+    terms_value,
+    _decode_pairs,
+    _decode_search_reply,
+    _rank_by_vectors,
+    _filter_memory_items,
+    _MemoryStatsCollector,
+    _pool_key,
+    _queue_push,
+    _search_args,
+)
+
+# Pools are bound to the event loop their connections were created on, and forgotten with it
+_async_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, int, int], aioredis.BlockingConnectionPool]]" = weakref.WeakKeyDictionary()
+_async_clusters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, int, int], RedisCluster]]" = weakref.WeakKeyDictionary()
+
+
+def _running_loop_cache(caches: weakref.WeakKeyDictionary) -> Dict[Tuple[str, int, int], Any]:
+    """Per-loop cache of the running loop; caches of closed loops are dropped"""
+    for loop in [loop for loop in caches.keys() if loop.is_closed()]:
+        # Connections reference their loop, so the weak key alone would keep it alive
+        caches.pop(loop, None)
+    return caches.setdefault(asyncio.get_running_loop(), {})
+
+
+def get_async_connection_pool(
+    host: str = None, port: int = None, db: int = None, password: str = None
+) -> aioredis.BlockingConnectionPool:
+    """Return the shared asyncio pool for these settings and the running event loop"""
+    settings = _connection_settings(host, port, db, password)
+    pools = _running_loop_cache(_async_pools)
+    key = _pool_key(settings)
+    pool = pools.get(key)
+    if pool is None:
+        pool = aioredis.BlockingConnectionPool(
+            max_connections=REDIS_MAX_CONNECTIONS,
+            timeout=REDIS_POOL_TIMEOUT,
+            socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_keepalive=True,
+            health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+            retry=Retry(ExponentialBackoff(cap=1.0, base=0.05), retries=3),
+            retry_on_error=[redis.ConnectionError, redis.TimeoutError],
+            decode_responses=False,
+            **settings,
+        )
+        pools[key] = pool
+    return pool
+
+
+def get_async_cluster_client(
+    host: str = None, port: int = None, db: int = None, password: str = None
+) -> RedisCluster:
+    """Return the shared asyncio RedisCluster client for these settings and the running event loop"""
+    settings = _connection_settings(host, port, db, password)
+    clients = _running_loop_cache(_async_clusters)
+    key = _pool_key(settings)
+    client = clients.get(key)
+    if client is None:
+        client = RedisCluster(
+            startup_nodes=[ClusterNode(node_host, node_port) for node_host, node_port in cluster_startup_nodes(settings)],
+            password=settings["password"],
+            max_connections=REDIS_MAX_CONNECTIONS,
+            socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_keepalive=True,
+            health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+            retry=Retry(ExponentialBackoff(cap=1.0, base=0.05), retries=3),
+            decode_responses=False,
+        )
+        clients[key] = client
+    return client
+
+
+class AsyncRedisMemory:
+    """Non-blocking conversation memory: one event loop serves every channel."""
+
+    # Pure formatting / metadata helpers are shared with the blocking implementation
+    build_conversation_context = RedisMemory.build_conversation_context
+    _get_conversation_key = RedisMemory._get_conversation_key
+    _stats_metadata = RedisMemory._stats_metadata
+
+    def __init__(self, host: str = None, port: int = None, db: int = None, password: str = None):
+        """Configure the Redis connection; nothing is opened until the first command"""
+        self._settings = {"host": host, "port": port, "db": db, "password": password}
+        self._client: Optional[aioredis.Redis] = None
+        self._client_lock: Optional[asyncio.Lock] = None
+        self._retry_after = 0.0
+        # History read back by the last store of each channel (bounded LRU, entries expire)
+        self._prefetched_pairs = _HistoryCache()
+        self._stats_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+        self._fill_tasks: Set[asyncio.Task] = set()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def get_client(self) -> Optional[aioredis.Redis]:
+        """Client on the shared asyncio pool, or None while Redis is unreachable"""
+        if self._client is not None:
+            return self._client
+        if time.monotonic() < self._retry_after:
+            return None
+
+        if self._client_lock is None:
+            self._client_lock = asyncio.Lock()
+        async with self._client_lock:
+            if self._client is not None or time.monotonic() < self._retry_after:
+                return self._client
+            settings = _connection_settings(**self._settings)
+            try:
+                if REDIS_CLUSTER:
+                    client = get_async_cluster_client(**self._settings)
+                    await client.initialize()
+                else:
+                    client = aioredis.Redis(connection_pool=get_async_connection_pool(**self._settings))
+                await client.ping()
+                self._client = client
+                self.loop = asyncio.get_running_loop()
+                print(f"✅ Redis (asyncio) connected successfully at {settings['host']}:{settings['port']}")
+            except redis.ConnectionError:
+                print(f"❌ Failed to connect to Redis at {settings['host']}:{settings['port']}")
+                self._retry_after = time.monotonic() + REDIS_RECONNECT_COOLDOWN
+            except Exception as e:
+                print(f"❌ Redis connection error: {e}")
+                self._retry_after = time.monotonic() + REDIS_RECONNECT_COOLDOWN
+        return self._client
+
+    def run_sync(self, coro: Awaitable[Any]) -> Any:
+        """
+        Run one of this object's coroutines from blocking code (e.g. a CrewAI storage call).
+
+        The coroutine is scheduled on the loop that owns the connections. When no
+        loop owns them yet, a private background loop is started and adopted.
+        """
+        if self.loop is None or not self.loop.is_running():
+            self.loop = asyncio.new_event_loop()
+            threading.Thread(target=self.loop.run_forever, name="redis-asyncio", daemon=True).start()
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            raise RuntimeError("run_sync would deadlock on its own event loop; await the coroutine instead")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def _push_entry(
+        self, key: str, entry: Dict[str, Any], fetch_count: int = 0, user_id: Optional[str] = None,
+        parallel: Sequence[Tuple[str, Any]] = (), encoded: Optional[bytes] = None,
+    ) -> Optional[List[bytes]]:
+        """Push + trim + TTL (+ read-back) in a single MULTI/EXEC round trip"""
+        client = await self.get_client()
+        async with client.pipeline(transaction=True) as pipe:
+            _queue_push(pipe, key, entry, fetch_count=fetch_count, user_id=user_id, parallel=parallel, encoded=encoded)
+            replies = await pipe.execute()
+        if user_id and REDIS_CLUSTER:
+            await client.pfadd(USERS_HLL_KEY, user_id)
+        return replies[0] if fetch_count else None
+
+    def _fill_vector_later(self, key: str, vectors_key: str, encoded: bytes, text: str) -> None:
+        """Compute an entry's embedding after the write returned and store it in its empty slot"""
+        if not memory_embeddings_enabled() or not text:
+            return
+        task = asyncio.get_running_loop().create_task(self._fill_vector(key, vectors_key, encoded, text))
+        self._fill_tasks.add(task)  # Keep a reference until done
+        task.add_done_callback(self._fill_tasks.discard)
+
+    async def _fill_vector(self, key: str, vectors_key: str, encoded: bytes, text: str) -> None:
+        # Embedding runs off the event loop (CPU-bound model call)
+        vector = await asyncio.to_thread(embed_for_memory, text)
+        client = await self.get_client() if vector else None
+        if not client:
+            return
+        try:
+            await client.eval(FILL_VECTOR_SCRIPT, 2, key, vectors_key, encoded, vector)
+        except Exception as e:
+            print(f"⚠️ Memory embedding not stored: {e}")
+
+    async def store_conversation_pair(
+        self, channel_id: str, user_id: str, user_query: str, bot_response: str, username: str = None
+    ) -> bool:
+        """Store a structured user/bot conversation pair (see RedisMemory.store_conversation_pair)"""
+        if not await self.get_client():
+            print("⚠️ Redis not available, skipping conversation storage")
+            return False
+
+        try:
+            conversation_pair = {
+                "user_id": user_id,
+                "username": username or "Unknown",
+                "user_query": user_query,
+                "bot_response": bot_response,
+                "unix_timestamp": time.time(),
+            }
+            key, vectors_key = channel_key("conversation_pairs", channel_id), channel_key("conversation_pair_vectors", channel_id)
+            encoded = encode_entry(conversation_pair)
+            pairs_raw = await self._push_entry(
+                key,
+                conversation_pair,
+                fetch_count=CONVERSATION_MEMORY_LIMIT,
+                user_id=user_id,
+                parallel=[(vectors_key, b"")],
+                encoded=encoded,
+            )
+            self._fill_vector_later(key, vectors_key, encoded, pair_text(conversation_pair))
+            self._prefetched_pairs.put(channel_id, _decode_pairs(pairs_raw))
+            return True
+        except Exception as e:
+            print(f"❌ Error storing conversation pair: {e}")
+            return False
+
+    async def store_memory_item(self, channel_id: str, value: str, metadata: Dict[str, Any]) -> bool:
+        """Store a generic memory item used by Crew short term memory."""
+        if not await self.get_client():
+            print("⚠️ Redis not available, skipping memory storage")
+            return False
+
+        try:
+            entry = {"value": value, "metadata": metadata or {}, "unix_timestamp": time.time()}
+            key, vectors_key = self._get_conversation_key(channel_id), channel_key("conversation_vectors", channel_id)
+            encoded = encode_entry(entry)
+            await self._push_entry(key, entry, encoded=encoded, parallel=[
+                (channel_key("conversation_terms", channel_id), terms_value(value)),
+                (vectors_key, b""),
+            ])
+            self._fill_vector_later(key, vectors_key, encoded, value)
+            return True
+        except Exception as exc:
+            print(f"❌ Error storing memory item: {exc}")
+            return False
+
+    async def get_memory_items(
+        self, channel_id: str, limit: int, query: Optional[str] = None, score_threshold: float = 0.0
+    ) -> List[Dict]:
+        """Retrieve stored memory items, scored server-side when a query is given (see RedisMemory)"""
+        client = await self.get_client()
+        if not client:
+            return []
+
+        try:
+            key = self._get_conversation_key(channel_id)
+            search_args = _search_args(limit, query, score_threshold) if query else None
+            if search_args is None:
+                return _filter_memory_items(await client.lrange(key, 0, limit - 1), limit)
+
+            results, indexed, total = _decode_search_reply(await client.eval(
+                SEARCH_SCRIPT, 2, key, channel_key("conversation_terms", channel_id), *search_args
+            ))
+            if total > indexed and len(results) < limit:
+                legacy_raw = await client.lrange(key, indexed, total - 1)
+                results.extend(_filter_memory_items(legacy_raw, limit - len(results), query))
+            return results
+        except Exception as exc:
+            print(f"❌ Error retrieving memory items: {exc}")
+            return []
+
+    async def search_memory(
+        self, channel_id: str, query: str, limit: int, score_threshold: float = 0.0, pairs: bool = False
+    ) -> Optional[List[Dict]]:
+        """Rank memory items (or pairs) by embedding similarity (see RedisMemory.search_memory)"""
+        query_vector = await asyncio.to_thread(embed_query, query) if query else None
+        client = await self.get_client()
+        if query_vector is None or not client:
+            return None
+
+        try:
+            if pairs:
+                key, vectors_key = channel_key("conversation_pairs", channel_id), channel_key("conversation_pair_vectors", channel_id)
+            else:
+                key, vectors_key = self._get_conversation_key(channel_id), channel_key("conversation_vectors", channel_id)
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.lrange(vectors_key, 0, -1)
+                pipe.lrange(key, 0, -1)
+                vectors_raw, entries_raw = await pipe.execute()
+            return _rank_by_vectors(query_vector, vectors_raw, entries_raw, limit, score_threshold)
+        except Exception as exc:
+            print(f"❌ Error searching memory: {exc}")
+            return None
+
+    async def get_conversation_history(
+        self, channel_id: str, user_id: str = None, limit: Optional[int] = None
+    ) -> List[Dict]:
+        """Retrieve conversation history for a channel, oldest first."""
+        client = await self.get_client()
+        if not client:
+            return []
+
+        try:
+            if limit is None:
+                limit = CONVERSATION_MEMORY_LIMIT
+            conversations_raw = await client.lrange(self._get_conversation_key(channel_id), 0, limit - 1)
+            return _decode_pairs(conversations_raw)
+        except Exception as e:
+            print(f"❌ Error retrieving conversation history: {e}")
+            return []
+
+    async def get_conversation_pairs(
+        self, channel_id: str, limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Retrieve stored user/bot conversation pairs in chronological order."""
+        if limit is None:
+            limit = CONVERSATION_MEMORY_LIMIT
+
+        prefetched = self._prefetched_pairs.get(channel_id)
+        if prefetched is not None:
+            self._prefetched_pairs.invalidate(channel_id)
+            return prefetched[-limit:] if limit > 0 else []
+
+        client = await self.get_client()
+        if not client:
+            return []
+
+        try:
+            pairs_raw = await client.lrange(channel_key("conversation_pairs", channel_id), 0, limit - 1)
+            return _decode_pairs(pairs_raw)
+        except Exception as e:
+            print(f"❌ Error retrieving conversation pairs: {e}")
+            return []
+
+    async def get_conversation_count(self, channel_id: str, user_id: str = None) -> int:
+        """Get the number of stored conversations for a channel"""
+        client = await self.get_client()
+        if not client:
+            return 0
+
+        try:
+            return await client.llen(self._get_conversation_key(channel_id))
+        except Exception as e:
+            print(f"❌ Error getting conversation count: {e}")
+            return 0
+
+    async def clear_conversation_history(self, channel_id: str, user_id: str = None) -> bool:
+        """Clear conversation history for a channel"""
+        client = await self.get_client()
+        if not client:
+            return False
+
+        try:
+            await client.delete(
+                self._get_conversation_key(channel_id),
+                channel_key("conversation_terms", channel_id),
+                channel_key("conversation_vectors", channel_id),
+            )
+            return True
+        except Exception as e:
+            print(f"❌ Error clearing conversation history: {e}")
+            return False
+
+    async def get_memory_stats(self, max_age: Optional[float] = None) -> Dict:
+        """SCAN-based memory statistics, cached like RedisMemory.get_memory_stats"""
+        if max_age is None:
+            max_age = STATS_CACHE_SECONDS
+        cached = self._stats_cache
+        if cached and time.monotonic() - cached[0] < max_age:
+            return cached[1]
+
+        client = await self.get_client()
+        if not client:
+            return {"status": "disconnected"}
+
+        try:
+            started = time.perf_counter()
+            collector = _MemoryStatsCollector()
+            batch: List[bytes] = []
+            async for raw_key in client.scan_iter(match="conversation*", count=STATS_SCAN_COUNT):
+                batch.append(raw_key)
+                if len(batch) >= STATS_SCAN_COUNT:
+                    await self._measure_stats_batch(client, collector, batch)
+                    batch = []
+            await self._measure_stats_batch(client, collector, batch)
+            stats = collector.result(await client.pfcount(USERS_HLL_KEY))
+            stats.update(self._stats_metadata(started))
+            self._stats_cache = (time.monotonic(), stats)
+            return stats
+        except Exception as e:
+            print(f"❌ Error getting memory stats: {e}")
+            return {"status": "error", "error": str(e)}
+
+    @staticmethod
+    async def _measure_stats_batch(client, collector: _MemoryStatsCollector, raw_keys: List[bytes]) -> None:
+        keys = collector.select_keys(raw_keys)
+        if keys:
+            async with client.pipeline(transaction=False) as pipe:
+                collector.queue_batch(pipe, keys)
+                collector.add_replies(keys, await pipe.execute())
+            sample = collector.memory_sample(keys)
+            if sample:
+                async with client.pipeline(transaction=False) as pipe:
+                    collector.queue_memory(pipe, sample)
+                    collector.add_memory_replies(await pipe.execute(raise_on_error=False))
@@ -2,49 +2,1007 @@
 Redis-based conversation memory implementation for medical chatbot
 Stores the last N queries per client/conversation with automatic cleanup
 """
-import json
+import inspect
 import os
+import queue
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, deque
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
 
+import numpy as np
 import redis
+from redis.backoff import ExponentialBackoff
+from redis.cluster import ClusterNode, RedisCluster
+from redis.retry import Retry
 
 from crewai.memory.storage.interface import Storage
 
+from .memory_codec import decode_entry, encode_entry
+
 # Configuration constants
 CONVERSATION_MEMORY_LIMIT = 10  # Nombre max de conversations par channel
-CONVERSATION_TTL = 86400 * 1    # TTL en secondes (7 jours)
+CONVERSATION_TTL = 86400 * 1    # TTL en secondes (1 jour), renouvelé à chaque écriture
+CONVERSATION_MAX_BYTES = int(os.getenv("CONVERSATION_MAX_BYTES", 64 * 1024))  # Budget d'octets encodés par liste
+CONVERSATION_MAX_AGE = int(os.getenv("CONVERSATION_MAX_AGE", CONVERSATION_TTL))  # Âge max (s) d'une entrée à la lecture
 MEMORY_KEY_SUFFIX = "short_term"
+USERS_HLL_KEY = "conversation_users"  # HyperLogLog des user_id ayant écrit une conversation
+MEMORY_TERMS_MAX = 128          # Termes indexés max par élément de mémoire (liste parallèle conversation_terms)
+MEMORY_TERM_MIN_LENGTH = 3      # Les mots plus courts (le, de, un...) ne sont pas indexés
+# Embeddings float16 stockés dans des listes parallèles (conversation_vectors / conversation_pair_vectors),
+# calculés en arrière-plan après l'écriture
+MEMORY_EMBEDDINGS = os.getenv("MEMORY_EMBEDDINGS", "on").lower() not in ("off", "0", "false")
+MEMORY_EMBED_QUEUE_MAX = 1000   # Embeddings en attente de calcul en arrière-plan (au-delà, l'entrée reste sans vecteur)
+MEMORY_EMBED_RETRY_SECONDS = 60  # Après un échec de l'encodeur, nouvel essai au bout de N secondes
 
-class RedisMemory:
-    def __init__(self):
-        """Initialize Redis connection"""
-        try:
-            self.redis_client = redis.Redis(
-                host=os.getenv(
-                    "REDIS_HOST",
-                    "redis-13350.c339.eu-west-3-1.ec2.redns.redis-cloud.com",
-                ),
-                port=int(os.getenv("REDIS_PORT", 13350)),
-                db=int(os.getenv("REDIS_DB", 0)),
-                password=os.getenv(
-                    "REDIS_PASSWORD", "YoLErdUztvwgDQvhAr1Fgbp0NUdekrRm"
-                ),
-                decode_responses=True,
+# In-process conversation history cache (write-through, invalidated by keyspace notifications)
+HISTORY_CACHE_MODE = os.getenv("REDIS_HISTORY_CACHE", "notify")  # notify | local (un seul nœud) | off
+HISTORY_CACHE_MAX_CHANNELS = 1024  # Canaux gardés en cache (LRU)
+HISTORY_CACHE_TTL = 300            # Âge max (s) d'une entrée, filet de sécurité si une notification est perdue
+# Autorise CONFIG SET notify-keyspace-events sur le serveur (sinon les flags doivent déjà être actifs)
+REDIS_CONFIGURE_NOTIFICATIONS = os.getenv("REDIS_CONFIGURE_NOTIFICATIONS", "0") == "1"
+KEYSPACE_EVENT_FLAGS = "Klgx"      # K = canal keyspace, l = listes, g = génériques (del, expire), x = expirations
+
+# Degraded mode: in-process memory and queued writes while Redis is unreachable
+DEGRADED_MAX_CHANNELS = 1024           # Canaux gardés en mémoire locale (LRU)
+DEGRADED_QUEUE_MAX = 10000             # Écritures en attente de rejeu (les plus anciennes perdues au-delà)
+DEGRADED_HEALTH_CHECK_INTERVAL = 1.0   # Fréquence (s) du contrôle de santé (reconnexion limitée par REDIS_RECONNECT_COOLDOWN)
+
+# Statistics (SCAN-based, cached to spare the server)
+STATS_CACHE_SECONDS = int(os.getenv("REDIS_STATS_CACHE_SECONDS", 60))
+STATS_SCAN_COUNT = 500            # Clés demandées par itération SCAN
+STATS_MEMORY_SAMPLE_SIZE = 50     # Clés échantillonnées pour MEMORY USAGE
+STATS_TOP_CHANNELS = 20           # Canaux les plus longs détaillés dans les stats
+STATS_TTL_BUCKETS = [(3600, "<1h"), (6 * 3600, "1h-6h"), (86400, "6h-24h")]
+
+# Connection pool settings (shared by every RedisMemory / RedisStorage of the process)
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 20))
+REDIS_POOL_TIMEOUT = 5             # Attente max (s) d'une connexion libre dans le pool
+REDIS_SOCKET_TIMEOUT = 5           # Timeout (s) connexion et lecture/écriture
+REDIS_HEALTH_CHECK_INTERVAL = 30   # PING avant réutilisation d'une connexion inactive depuis N secondes
+REDIS_RECONNECT_COOLDOWN = 5       # Délai (s) avant une nouvelle tentative après un échec de connexion
+
+# Redis Cluster: per-channel keys carry a {channel_id} hash tag so a channel's keys share one slot
+REDIS_CLUSTER = os.getenv("REDIS_CLUSTER", "").lower() in ("1", "true", "yes", "on")
+REDIS_CLUSTER_NODES = os.getenv("REDIS_CLUSTER_NODES", "")  # "host:port,host:port" (défaut: REDIS_HOST:REDIS_PORT)
+
+# Failures that mean "Redis is unreachable" (as opposed to a bad command or payload)
+REDIS_CONNECTION_ERRORS = (redis.ConnectionError, redis.TimeoutError, redis.exceptions.ClusterDownError)
+
+_pools: Dict[Tuple[str, int, int], redis.ConnectionPool] = {}
+_clusters: Dict[Tuple[str, int, int], RedisCluster] = {}
+_memories: Dict[Tuple[str, int, int], "RedisMemory"] = {}
+_pools_lock = threading.Lock()
+
+
+def _connection_settings(
+    host: str = None, port: int = None, db: int = None, password: str = None
+) -> Dict[str, Any]:
+    """Resolve connection settings, falling back to the REDIS_* environment variables"""
+    return {
+        "host": host or os.getenv(
+            "REDIS_HOST",
+            "redis-13350.c339.eu-west-3-1.ec2.redns.redis-cloud.com",
+        ),
+        "port": int(port or os.getenv("REDIS_PORT", 13350)),
+        "db": int(db if db is not None else os.getenv("REDIS_DB", 0)),
+        "password": password or os.getenv(
+            "REDIS_PASSWORD", "YoLErdUztvwgDQvhAr1Fgbp0NUdekrRm"
+        ),
+    }
+
+
+def _pool_key(settings: Dict[str, Any]) -> Tuple[str, int, int]:
+    return settings["host"], settings["port"], settings["db"]
+
+
+def get_connection_pool(
+    host: str = None, port: int = None, db: int = None, password: str = None
+) -> redis.ConnectionPool:
+    """
+    Return the process-wide connection pool for these settings.
+    
+    The pool is created on first call without any network I/O; connections are
+    opened on demand, health-checked when idle and retried with backoff on failure.
+    """
+    settings = _connection_settings(host, port, db, password)
+    key = _pool_key(settings)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = redis.BlockingConnectionPool(
+                max_connections=REDIS_MAX_CONNECTIONS,
+                timeout=REDIS_POOL_TIMEOUT,
+                socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+                socket_timeout=REDIS_SOCKET_TIMEOUT,
+                socket_keepalive=True,
+                health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+                retry=Retry(ExponentialBackoff(cap=1.0, base=0.05), retries=3),
+                retry_on_error=[redis.ConnectionError, redis.TimeoutError],
+                # Entries are binary (see memory_codec); keys are decoded where needed
+                decode_responses=False,
+                **settings,
             )
-            # Test connection
-            self.redis_client.ping()
-            print(f"✅ Redis connected successfully at {os.getenv('REDIS_HOST')}:{os.getenv('REDIS_PORT')}")
-        except redis.ConnectionError:
-            print(f"❌ Failed to connect to Redis at {os.getenv('REDIS_HOST')}:{os.getenv('REDIS_PORT')}")
-            self.redis_client = None
-        except Exception as e:
-            print(f"❌ Redis connection error: {e}")
-            self.redis_client = None
+            _pools[key] = pool
+        return pool
+
+
+def cluster_startup_nodes(settings: Dict[str, Any]) -> List[Tuple[str, int]]:
+    """Seed nodes of the cluster: REDIS_CLUSTER_NODES, or the configured host/port"""
+    nodes = []
+    for node in filter(None, (part.strip() for part in REDIS_CLUSTER_NODES.split(","))):
+        host, _, port = node.rpartition(":")
+        nodes.append((host, int(port)))
+    return nodes or [(settings["host"], settings["port"])]
+
+
+def get_cluster_client(host: str = None, port: int = None, db: int = None, password: str = None) -> RedisCluster:
+    """
+    Return the process-wide RedisCluster client for these settings.
+    
+    Unlike get_connection_pool this discovers the slot map, so it talks to the
+    cluster; each node gets its own pool of up to REDIS_MAX_CONNECTIONS.
+    """
+    settings = _connection_settings(host, port, db, password)
+    key = _pool_key(settings)
+    with _pools_lock:
+        client = _clusters.get(key)
+        if client is None:
+            client = RedisCluster(
+                startup_nodes=[ClusterNode(node_host, node_port) for node_host, node_port in cluster_startup_nodes(settings)],
+                password=settings["password"],
+                max_connections=REDIS_MAX_CONNECTIONS,
+                socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+                socket_timeout=REDIS_SOCKET_TIMEOUT,
+                socket_keepalive=True,
+                health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+                retry=Retry(ExponentialBackoff(cap=1.0, base=0.05), retries=3),
+                decode_responses=False,
+            )
+            _clusters[key] = client
+        return client
+
+
+def channel_key(kind: str, channel_id: str) -> str:
+    """
+    Key of a per-channel structure (conversation, conversation_pairs, conversation_summary...).
+    
+    On a cluster the channel id is wrapped in a {hash tag} so every key of a
+    channel lives in the same slot and multi-key transactions stay valid.
+    Single-node deployments keep the historical key names.
+    """
+    if REDIS_CLUSTER:
+        return f"{kind}:{{{channel_id}}}"
+    return f"{kind}:{channel_id}"
+
+
+def channel_from_key_suffix(suffix: str) -> str:
+    """Channel id from the part of a key after "<kind>:" (inverse of channel_key)"""
+    if REDIS_CLUSTER and suffix.startswith("{") and suffix.endswith("}"):
+        return suffix[1:-1]
+    return suffix
+
+
+def get_redis_memory(
+    host: str = None, port: int = None, db: int = None, password: str = None
+) -> "RedisMemory":
+    """Return the shared RedisMemory for these settings (one per Redis instance and db)"""
+    key = _pool_key(_connection_settings(host, port, db, password))
+    with _pools_lock:
+        memory = _memories.get(key)
+        if memory is None:
+            memory = RedisMemory(host=host, port=port, db=db, password=password)
+            _memories[key] = memory
+        return memory
+
+
+# Push + trim by count AND encoded size + TTL, atomically on the server.
+# The newest entry is always kept, even when it alone exceeds the byte budget.
+# KEYS[1] list, KEYS[2..n] parallel lists | ARGV: entry, max count, max bytes, ttl, fetch count, parallel values...
+# Returns the newest <fetch count> kept entries, or the kept count when fetch count is 0.
+PUSH_TRIM_SCRIPT = """
+redis.call('LPUSH', KEYS[1], ARGV[1])
+local entries = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[2]) - 1)
+local budget = tonumber(ARGV[3])
+local kept, total = 0, 0
+for i, entry in ipairs(entries) do
+    total = total + #entry
+    if i > 1 and total > budget then break end
+    kept = i
+end
+redis.call('LTRIM', KEYS[1], 0, kept - 1)
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+for k = 2, #KEYS do
+    redis.call('LPUSH', KEYS[k], ARGV[4 + k])
+    redis.call('LTRIM', KEYS[k], 0, kept - 1)
+    redis.call('EXPIRE', KEYS[k], tonumber(ARGV[4]))
+end
+local fetch = tonumber(ARGV[5])
+if fetch == 0 then return kept end
+local result = {}
+for i = 1, math.min(kept, fetch) do result[i] = entries[i] end
+return result
+"""
+
+
+# Term-overlap search over the parallel terms list, most relevant (then newest) first.
+# KEYS[1] entries, KEYS[2] terms | ARGV: limit, min score, query terms...
+# Returns {entry, score, entry, score...}, indexed count, list length.
+SEARCH_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local min_score = tonumber(ARGV[2])
+local query_count = #ARGV - 2
+local indexed = redis.call('LRANGE', KEYS[2], 0, -1)
+local matches = {}
+for i, terms in ipairs(indexed) do
+    local matched = 0
+    for j = 3, #ARGV do
+        if string.find(terms, ' ' .. ARGV[j] .. ' ', 1, true) then matched = matched + 1 end
+    end
+    local score = matched / query_count
+    if matched > 0 and score >= min_score then matches[#matches + 1] = {score, i} end
+end
+table.sort(matches, function(a, b) return a[1] > b[1] or (a[1] == b[1] and a[2] < b[2]) end)
+local result = {}
+for k = 1, math.min(limit, #matches) do
+    result[#result + 1] = redis.call('LINDEX', KEYS[1], matches[k][2] - 1)
+    result[#result + 1] = tostring(matches[k][1])
+end
+return {result, #indexed, redis.call('LLEN', KEYS[1])}
+"""
+
+
+# Fill the empty vector slot of an entry once its embedding is computed.
+# KEYS[1] entries, KEYS[2] vectors | ARGV: encoded entry, vector.
+# The entry is located by value: pushes and trims since the write shift its index.
+FILL_VECTOR_SCRIPT = """
+local position = redis.call('LPOS', KEYS[1], ARGV[1])
+if not position or redis.call('LINDEX', KEYS[2], position) ~= '' then
+    return 0
+end
+redis.call('LSET', KEYS[2], position, ARGV[2])
+return 1
+"""
+
+
+def memory_terms(text: str) -> List[str]:
+    """Normalized distinct terms of a text: lowercase, accents stripped, short words dropped"""
+    # Drop combining marks only: Arabic and other non-Latin scripts keep their letters
+    text = "".join(char for char in unicodedata.normalize("NFKD", text or "") if not unicodedata.combining(char)).lower()
+    terms = dict.fromkeys(word for word in re.findall(r"\w+", text) if len(word) >= MEMORY_TERM_MIN_LENGTH)
+    return list(terms)[:MEMORY_TERMS_MAX]
+
+
+def terms_value(text: str) -> str:
+    """Value pushed on the terms list: space-delimited so a term matches only as a whole word"""
+    return f" {' '.join(memory_terms(text))} "
+
+
+_embeddings_retry_at = 0.0  # time.monotonic() before which the failed embedder is not retried
+
+
+def embed_for_memory(text: str) -> bytes:
+    """float16 embedding of a memory text, b"" when embeddings are off or unavailable"""
+    global _embeddings_retry_at
+    if not memory_embeddings_enabled() or not text:
+        return b""
+    try:
+        from .text_embedding import embed_text  # charge sentence-transformers au premier usage
+
+        return embed_text(text).astype(np.float16).tobytes()
+    except Exception as e:
+        print(f"⚠️ Memory embeddings unavailable for {MEMORY_EMBED_RETRY_SECONDS} s: {e}")
+        _embeddings_retry_at = time.monotonic() + MEMORY_EMBED_RETRY_SECONDS
+        return b""
+
+
+def memory_embeddings_enabled() -> bool:
+    """Whether memory embeddings are on and the embedder is not cooling down after a failure"""
+    return MEMORY_EMBEDDINGS and time.monotonic() >= _embeddings_retry_at
+
+
+class _EmbeddingUnavailable(Exception):
+    pass
+
+
+@lru_cache(maxsize=256)
+def _cached_query_embedding(text: str) -> np.ndarray:
+    raw = embed_for_memory(text)
+    if not raw:
+        raise _EmbeddingUnavailable  # lru_cache does not keep exceptions: a failure is retried
+    return np.frombuffer(raw, dtype=np.float16).astype(np.float32)
+
+
+def embed_query(text: str) -> Optional[np.ndarray]:
+    """float32 query embedding (cached: a search ranks pairs then items), None when unavailable"""
+    try:
+        return _cached_query_embedding(text)
+    except _EmbeddingUnavailable:
+        return None
+
+
+def pair_text(pair: Dict[str, Any]) -> str:
+    """Text embedded for a conversation pair"""
+    return f"{pair.get('user_query', '')}\n{pair.get('bot_response', '')}"
+
+
+def _queue_push(
+    pipe, key: str, entry: Dict[str, Any], fetch_count: int = 0, user_id: Optional[str] = None,
+    parallel: Sequence[Tuple[str, Any]] = (), encoded: Optional[bytes] = None,
+) -> None:
+    """
+    Queue the push/trim script (+ distinct user) on a sync or asyncio pipeline.
+    
+    The script reply comes first: the newest fetch_count kept entries when
+    fetch_count > 0. EVAL (not EVALSHA) keeps it usable on cluster pipelines;
+    Redis caches the compiled script by its SHA either way.
+    `parallel` lists (key, value) pairs pushed and trimmed in lockstep with the
+    entry (terms for SEARCH_SCRIPT, embeddings), so index i matches on every list.
+    `encoded` is encode_entry(entry) when the caller already has it.
+    """
+    args = [encoded if encoded is not None else encode_entry(entry), CONVERSATION_MEMORY_LIMIT, CONVERSATION_MAX_BYTES, CONVERSATION_TTL, fetch_count]
+    parallel_keys = [parallel_key for parallel_key, _ in parallel]
+    parallel_values = [value for _, value in parallel]
+    pipe.eval(PUSH_TRIM_SCRIPT, 1 + len(parallel), key, *parallel_keys, *args, *parallel_values)
+    if user_id and not REDIS_CLUSTER:
+        # On a cluster the global HyperLogLog lives in another slot: the caller updates it separately
+        pipe.pfadd(USERS_HLL_KEY, user_id)
+
+
+def _is_fresh(entry: Dict[str, Any], now: float) -> bool:
+    """Whether an entry is younger than CONVERSATION_MAX_AGE (entries without timestamp are kept)"""
+    timestamp = entry.get("unix_timestamp")
+    return timestamp is None or now - float(timestamp) <= CONVERSATION_MAX_AGE
+
+
+def _decode_pairs(pairs_raw: List[bytes]) -> List[Dict[str, Any]]:
+    """Decode a newest-first Redis list (compact or legacy JSON) into chronological pairs"""
+    pairs = []
+    now = time.time()
+    for pair_raw in reversed(pairs_raw):
+        pair = decode_entry(pair_raw)
+        if pair is not None and _is_fresh(pair, now):
+            pairs.append(pair)
+    return pairs
+
+
+def _search_args(limit: int, query: str, score_threshold: float) -> Optional[List[Any]]:
+    """SEARCH_SCRIPT arguments, or None when the query has no indexable term"""
+    terms = memory_terms(query)
+    return [limit, score_threshold, *terms] if terms else None
+
+
+def _decode_search_reply(reply: List[Any]) -> Tuple[List[Dict[str, Any]], int, int]:
+    """Decode SEARCH_SCRIPT's reply into (scored entries, indexed count, list length)"""
+    flat, indexed, total = reply
+    results = []
+    now = time.time()
+    for raw, score in zip(flat[::2], flat[1::2]):
+        entry = decode_entry(raw)
+        if entry is not None and _is_fresh(entry, now):
+            entry["score"] = float(score)
+            results.append(entry)
+    return results, int(indexed), int(total)
+
+
+def _rank_by_vectors(
+    query_vector: np.ndarray, vectors_raw: List[bytes], entries_raw: List[bytes], limit: int, score_threshold: float
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Rank newest-first entries by cosine similarity with the query in one matrix product.
+    
+    Only the selected entries are decoded. Returns None when no entry has a
+    usable vector (legacy entries, embeddings disabled at write time).
+    """
+    dim = query_vector.shape[0]
+    rows = [
+        i for i, raw in enumerate(vectors_raw[:len(entries_raw)])
+        if len(raw) == dim * 2  # float16
+    ]
+    if not rows:
+        return None
+
+    matrix = np.frombuffer(b"".join(vectors_raw[i] for i in rows), dtype=np.float16).reshape(len(rows), dim)
+    scores = matrix.astype(np.float32) @ query_vector
+    results = []
+    now = time.time()
+    for position in np.argsort(-scores, kind="stable"):
+        score = float(scores[position])
+        if score < score_threshold or len(results) >= limit:
+            break
+        entry = decode_entry(entries_raw[rows[position]])
+        if entry is not None and _is_fresh(entry, now):
+            entry["score"] = score
+            results.append(entry)
+    return results
+
+
+def _filter_memory_items(items_raw: List[bytes], limit: int, query: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Decode newest-first memory items, keeping those whose value contains the query"""
+    results: List[Dict[str, Any]] = []
+    lowered_query = query.lower() if query else None
+    now = time.time()
+
+    for item_raw in items_raw:
+        entry = decode_entry(item_raw)
+        if entry is None or not _is_fresh(entry, now):
+            continue
+
+        if lowered_query and lowered_query not in entry.get("value", "").lower():
+            continue
+
+        results.append(entry)
+        if len(results) >= limit:
+            break
+
+    return results
+
+
+class _HistoryCache:
+    """
+    LRU of channel -> chronological conversation pairs.
+    
+    Own writes are counted so that the keyspace notification they trigger does
+    not evict the entry that was just written through. Pending counts older than
+    the cache TTL are dropped, so lost notifications cannot accumulate.
+    """
+
+    def __init__(self, max_channels: int = HISTORY_CACHE_MAX_CHANNELS, ttl: float = HISTORY_CACHE_TTL):
+        self.max_channels = max_channels
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._own_writes: "OrderedDict[str, Deque[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, channel_id: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            cached = self._entries.get(channel_id)
+            if cached is None:
+                return None
+            if time.monotonic() - cached[0] > self.ttl:
+                del self._entries[channel_id]
+                return None
+            self._entries.move_to_end(channel_id)
+            return cached[1]
+
+    def put(self, channel_id: str, pairs: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._entries[channel_id] = (time.monotonic(), pairs)
+            self._entries.move_to_end(channel_id)
+            while len(self._entries) > self.max_channels:
+                self._entries.popitem(last=False)
+
+    def _pending_own_writes(self, channel_id: str) -> Optional[Deque[float]]:
+        """Own writes of a channel still awaiting their notification (caller must hold the lock)"""
+        pending = self._own_writes.get(channel_id)
+        if pending is None:
+            return None
+        expired_before = time.monotonic() - self.ttl
+        while pending and pending[0] < expired_before:
+            pending.popleft()
+        if not pending:
+            del self._own_writes[channel_id]
+            return None
+        return pending
+
+    def expect_own_write(self, channel_id: str) -> None:
+        with self._lock:
+            pending = self._pending_own_writes(channel_id) or self._own_writes.setdefault(channel_id, deque())
+            pending.append(time.monotonic())
+            self._own_writes.move_to_end(channel_id)
+            while len(self._own_writes) > self.max_channels:
+                self._own_writes.popitem(last=False)
+
+    def invalidate(self, channel_id: Optional[str] = None) -> None:
+        with self._lock:
+            if channel_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(channel_id, None)
+
+    def on_keyspace_event(self, channel_id: str, event: str) -> None:
+        """Apply a keyspace notification for conversation_pairs:<channel_id>"""
+        with self._lock:
+            if event == "lpush":
+                pending = self._pending_own_writes(channel_id)
+                if pending:
+                    pending.popleft()
+                    if not pending:
+                        del self._own_writes[channel_id]
+                    return
+            if event in ("ltrim", "expire"):
+                # Always follow an lpush in the write transaction
+                return
+            self._entries.pop(channel_id, None)
+
+
+class _VectorFiller:
+    """
+    Background thread computing memory embeddings after the entry was written.
+    
+    Stores push an empty vector slot so the parallel lists stay aligned; the
+    sentence-transformers call then runs here instead of in the request path,
+    and FILL_VECTOR_SCRIPT writes the vector into the entry's slot.
+    """
+
+    def __init__(self, client_fn, max_pending: int = MEMORY_EMBED_QUEUE_MAX):
+        """
+        Args:
+            client_fn: Returns the Redis client to write with, or None while unavailable
+            max_pending: Jobs kept waiting; further entries stay without vector
+        """
+        self.client_fn = client_fn
+        self._jobs: "queue.Queue[Tuple[str, str, bytes, str]]" = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, key: str, vectors_key: str, encoded: bytes, text: str) -> None:
+        if not memory_embeddings_enabled() or not text:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="memory-embeddings", daemon=True)
+                self._thread.start()
+        try:
+            self._jobs.put_nowait((key, vectors_key, encoded, text))
+        except queue.Full:
+            pass  # Search falls back to the terms index for this entry
+
+    def _run(self) -> None:
+        while True:
+            key, vectors_key, encoded, text = self._jobs.get()
+            vector = embed_for_memory(text)
+            client = self.client_fn() if vector else None
+            if not client:
+                continue
+            try:
+                client.eval(FILL_VECTOR_SCRIPT, 2, key, vectors_key, encoded, vector)
+            except Exception as e:
+                print(f"⚠️ Memory embedding not stored: {e}")
+
+
+class _LocalMemory:
+    """
+    Bounded in-process mirror of recent channel memory, served while Redis is down.
+    
+    Every successful Redis write or read refreshes it, and writes made in
+    degraded mode are applied to it, so context survives a Redis outage for the
+    channels this process has seen.
+    """
+
+    def __init__(self, max_channels: int = DEGRADED_MAX_CHANNELS):
+        self.max_channels = max_channels
+        self._channels: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _channel(self, channel_id: str) -> Dict[str, Any]:
+        channel = self._channels.get(channel_id)
+        if channel is None:
+            channel = self._channels[channel_id] = {"pairs": [], "items": [], "summary": None}
+            while len(self._channels) > self.max_channels:
+                self._channels.popitem(last=False)
+        self._channels.move_to_end(channel_id)
+        return channel
+
+    @staticmethod
+    def _with_timestamp(entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Entry as decode_entry would return it (ISO timestamp + integer unix_timestamp)"""
+        unix_timestamp = float(entry.get("unix_timestamp", time.time()))
+        return dict(entry, timestamp=datetime.fromtimestamp(unix_timestamp).isoformat(), unix_timestamp=int(unix_timestamp))
+
+    def put_pairs(self, channel_id: str, pairs: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._channel(channel_id)["pairs"] = list(pairs[-CONVERSATION_MEMORY_LIMIT:])
+
+    def push_pair(self, channel_id: str, pair: Dict[str, Any]) -> None:
+        with self._lock:
+            channel = self._channel(channel_id)
+            channel["pairs"] = (channel["pairs"] + [self._with_timestamp(pair)])[-CONVERSATION_MEMORY_LIMIT:]
+
+    def push_item(self, channel_id: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            channel = self._channel(channel_id)
+            channel["items"] = ([self._with_timestamp(entry)] + channel["items"])[:CONVERSATION_MEMORY_LIMIT]
+
+    def put_summary(self, channel_id: str, summary: Dict[str, str]) -> None:
+        with self._lock:
+            self._channel(channel_id)["summary"] = dict(summary)
+
+    def pairs(self, channel_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Chronological pairs (oldest first)"""
+        with self._lock:
+            channel = self._channels.get(channel_id)
+            return list(channel["pairs"][-limit:]) if channel and limit > 0 else []
+
+    def items(self, channel_id: str) -> List[Dict[str, Any]]:
+        """Memory items, newest first"""
+        with self._lock:
+            channel = self._channels.get(channel_id)
+            return list(channel["items"]) if channel else []
+
+    def summary(self, channel_id: str) -> Dict[str, str]:
+        """Last known rolling summary ({"summary": "", "covered_until": ""} if none)"""
+        with self._lock:
+            channel = self._channels.get(channel_id)
+            summary = channel["summary"] if channel else None
+            return dict(summary) if summary else {"summary": "", "covered_until": ""}
+
+    def search_items(self, channel_id: str, limit: int, query: Optional[str], score_threshold: float) -> List[Dict[str, Any]]:
+        """Same term-overlap scoring as SEARCH_SCRIPT, in process"""
+        items = self.items(channel_id)
+        query_terms = memory_terms(query) if query else []
+        if not query_terms:
+            return items[:limit]
+        scored = []
+        for entry in items:
+            item_terms = set(memory_terms(entry.get("value", "")))
+            score = sum(term in item_terms for term in query_terms) / len(query_terms)
+            if score > 0 and score >= score_threshold:
+                scored.append(dict(entry, score=score))
+        scored.sort(key=lambda entry: entry["score"], reverse=True)
+        return scored[:limit]
+
+    def clear_items(self, channel_id: str) -> None:
+        with self._lock:
+            channel = self._channels.get(channel_id)
+            if channel:
+                channel["items"] = []
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+
+class _MemoryStatsCollector:
+    """Accumulates per-key measurements from SCAN batches into the stats report"""
+
+    def __init__(self):
+        self.list_lengths: Dict[str, int] = {}
+        self.ttl_distribution = {label: 0 for _, label in STATS_TTL_BUCKETS}
+        self.ttl_distribution.update({">24h": 0, "persistent": 0})
+        self.memory_samples: List[int] = []
+        self.memory_available = True  # False once the server refuses MEMORY USAGE (managed Redis)
+        self.counts = {"conversation": 0, "conversation_pairs": 0}
+
+    @staticmethod
+    def select_keys(raw_keys: List[bytes]) -> List[str]:
+        # "conversation*" covers both conversation:* and conversation_pairs:*
+        keys = [key.decode() for key in raw_keys]
+        return [key for key in keys if key.startswith(("conversation:", "conversation_pairs:"))]
+
+    def queue_batch(self, pipe, keys: List[str]) -> None:
+        """Queue LLEN + TTL for every key"""
+        for key in keys:
+            pipe.llen(key)
+            pipe.ttl(key)
+
+    def memory_sample(self, keys: List[str]) -> List[str]:
+        """Keys of the batch to measure with MEMORY USAGE while the sample is not full"""
+        if not self.memory_available:
+            return []
+        return keys[:max(0, STATS_MEMORY_SAMPLE_SIZE - len(self.memory_samples))]
+
+    @staticmethod
+    def queue_memory(pipe, keys: List[str]) -> None:
+        """
+        Queue MEMORY USAGE in its own pipeline, executed with raise_on_error=False.
+        
+        Servers without the command must not fail the LLEN/TTL measurements.
+        """
+        for key in keys:
+            pipe.memory_usage(key)
+
+    def add_memory_replies(self, replies: List[Any]) -> None:
+        for usage in replies:
+            if isinstance(usage, Exception):
+                self.memory_available = False
+                return
+            if usage:
+                self.memory_samples.append(usage)
+
+    def add_replies(self, keys: List[str], replies: List[Any]) -> None:
+        for i, key in enumerate(keys):
+            length, ttl = replies[2 * i], replies[2 * i + 1]
+            self.counts["conversation" if key.startswith("conversation:") else "conversation_pairs"] += 1
+            self.list_lengths[key] = length
+            if ttl == -1:
+                self.ttl_distribution["persistent"] += 1
+            elif ttl >= 0:
+                # Bounds are inclusive: a fresh key with the default 24 h TTL is "6h-24h"
+                label = next((label for limit, label in STATS_TTL_BUCKETS if ttl <= limit), ">24h")
+                self.ttl_distribution[label] += 1
+
+    def result(self, distinct_users: int) -> Dict[str, Any]:
+        lengths = self.list_lengths
+        total_keys = len(lengths)
+        samples = self.memory_samples
+        avg_memory = sum(samples) / len(samples) if samples else 0
+        longest = sorted(lengths.items(), key=lambda item: item[1], reverse=True)[:STATS_TOP_CHANNELS]
+
+        return {
+            "status": "connected",
+            "total_channels": self.counts["conversation"],
+            "total_pair_channels": self.counts["conversation_pairs"],
+            "list_lengths": {
+                "total_entries": sum(lengths.values()),
+                "max": max(lengths.values(), default=0),
+                "avg": round(sum(lengths.values()) / total_keys, 2) if total_keys else 0,
+                "longest_channels": dict(longest),
+            },
+            "memory_usage": {
+                "status": "sampled" if self.memory_available else "unavailable",
+                "sampled_keys": len(samples),
+                "avg_bytes": round(avg_memory),
+                "max_bytes": max(samples, default=0),
+                "estimated_total_bytes": round(avg_memory * total_keys),
+            },
+            "ttl_distribution": self.ttl_distribution,
+            "distinct_users_approx": distinct_users,
+        }
+
+
+class RedisMemory:
+    def __init__(self, host: str = None, port: int = None, db: int = None, password: str = None):
+        """Configure the Redis connection; nothing is opened until the first command"""
+        self._settings = {"host": host, "port": port, "db": db, "password": password}
+        self._client: Optional[redis.Redis] = None
+        self._client_lock = threading.Lock()
+        self._retry_after = 0.0
+        # Per-channel history, written through on store and read without touching Redis
+        self._history_cache = _HistoryCache()
+        self._invalidation_threads = None
+        # Memory embeddings are computed after the write, off the request path
+        self._vector_filler = _VectorFiller(self._available_client)
+        self._stats_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+        # Degraded mode: local mirror + writes queued for replay once Redis is back
+        self._local = _LocalMemory()
+        self._pending_writes: deque = deque(maxlen=DEGRADED_QUEUE_MAX)
+        self._degraded = False
+        self._degraded_lock = threading.Lock()
+        self._health_thread: Optional[threading.Thread] = None
+
+    @property
+    def redis_client(self) -> Optional[redis.Redis]:
+        """
+        Client bound to the shared pool, connected lazily on first access.
+        
+        Returns None while Redis is unreachable; a new attempt is made once
+        REDIS_RECONNECT_COOLDOWN has elapsed so callers never block on every call.
+        """
+        if self._client is not None:
+            return self._client
+        if time.monotonic() < self._retry_after:
+            return None
+
+        with self._client_lock:
+            if self._client is not None or time.monotonic() < self._retry_after:
+                return self._client
+            settings = _connection_settings(**self._settings)
+            try:
+                if REDIS_CLUSTER:
+                    client = get_cluster_client(**self._settings)
+                else:
+                    client = redis.Redis(connection_pool=get_connection_pool(**self._settings))
+                # Test connection
+                client.ping()
+                self._client = client
+                print(f"✅ Redis connected successfully at {settings['host']}:{settings['port']}")
+            except redis.ConnectionError:
+                print(f"❌ Failed to connect to Redis at {settings['host']}:{settings['port']}")
+                self._retry_after = time.monotonic() + REDIS_RECONNECT_COOLDOWN
+            except Exception as e:
+                print(f"❌ Redis connection error: {e}")
+                self._retry_after = time.monotonic() + REDIS_RECONNECT_COOLDOWN
+        return self._client
+
+    @property
+    def degraded(self) -> bool:
+        """True while writes are only applied locally and queued for replay"""
+        return self._degraded
+
+    def _available_client(self) -> Optional[redis.Redis]:
+        """Redis client, or None in degraded mode (entered here when Redis is unreachable)"""
+        if self._degraded:
+            return None
+        client = self.redis_client
+        if client is None:
+            self._enter_degraded_mode("connection failed")
+        return client
+
+    def _connected_client(self) -> redis.Redis:
+        """Redis client for a write that must not be silently skipped (raises when unreachable)"""
+        client = self.redis_client
+        if client is None:
+            raise redis.ConnectionError("Redis unavailable")
+        return client
+
+    def _enter_degraded_mode(self, reason: Any) -> None:
+        """Serve from the local mirror, queue writes and start the health checker"""
+        with self._degraded_lock:
+            self._client = None
+            self._retry_after = max(self._retry_after, time.monotonic() + REDIS_RECONNECT_COOLDOWN)
+            if self._degraded:
+                return
+            self._degraded = True
+            if self._health_thread is None or not self._health_thread.is_alive():
+                self._health_thread = threading.Thread(
+                    target=self._health_check_loop, name="redis-health", daemon=True
+                )
+                self._health_thread.start()
+        print(f"⚠️ Redis unavailable ({reason}): degraded mode, in-process memory and queued writes")
+
+    def _queue_write(self, kind: str, channel_id: str, entry: Optional[Dict[str, Any]] = None, user_id: str = None) -> None:
+        """Apply a write locally and queue it for replay (kind: pair | item | summary | clear)"""
+        with self._degraded_lock:
+            if len(self._pending_writes) == self._pending_writes.maxlen:
+                print("⚠️ Degraded-mode write queue full, oldest queued write dropped")
+            self._pending_writes.append((kind, channel_id, entry, user_id))
+        if kind == "pair":
+            self._local.push_pair(channel_id, entry)
+            # Cached history predates this write and notifications are not flowing
+            self._history_cache.invalidate(channel_id)
+        elif kind == "item":
+            self._local.push_item(channel_id, entry)
+        elif kind == "summary":
+            self._local.put_summary(channel_id, entry)
+        else:
+            self._local.clear_items(channel_id)
+
+    def _health_check_loop(self) -> None:
+        """Poll Redis while degraded; once it answers, replay queued writes in order"""
+        while self._degraded:
+            time.sleep(DEGRADED_HEALTH_CHECK_INTERVAL)
+            if self.redis_client is not None:
+                self._replay_pending_writes()
+
+    def _replay_pending_writes(self) -> None:
+        replayed = 0
+        while True:
+            with self._degraded_lock:
+                if not self._pending_writes:
+                    # Keyspace notifications were missed during the outage
+                    self._history_cache.invalidate()
+                    if self._invalidation_threads and not all(thread.is_alive() for thread in self._invalidation_threads):
+                        self._invalidation_threads = None
+                    self._degraded = False
+                    break
+                kind, channel_id, entry, user_id = self._pending_writes[0]
+            try:
+                if kind == "pair":
+                    self._write_pair(channel_id, entry, user_id)
+                elif kind == "item":
+                    self._write_item(channel_id, entry)
+                elif kind == "summary":
+                    self._write_summary(channel_id, entry)
+                else:
+                    self._delete_items(channel_id)
+            except REDIS_CONNECTION_ERRORS as e:
+                print(f"⚠️ Replay interrupted, Redis unavailable again: {e}")
+                with self._degraded_lock:
+                    self._client = None
+                    self._retry_after = time.monotonic() + REDIS_RECONNECT_COOLDOWN
+                return
+            except Exception as e:
+                print(f"❌ Queued {kind} write for channel {channel_id} dropped: {e}")
+            with self._degraded_lock:
+                self._pending_writes.popleft()
+            replayed += 1
+        print(f"✅ Redis is back: {replayed} queued write(s) replayed, leaving degraded mode")
 
     def _get_conversation_key(self, channel_id: str, user_id: str = None) -> str:
         """Generate Redis key for conversation history - now channel-based only"""
-        return f"conversation:{channel_id}"
+        return channel_key("conversation", channel_id)
+
+    def _history_cache_enabled(self) -> bool:
+        """
+        Whether cached history can be trusted.
+        
+        "local" trusts this process to be the only writer; "notify" requires the
+        keyspace notification listener to be running (started on first use) on
+        nodes whose notify-keyspace-events flags were confirmed by CONFIG GET.
+        Otherwise the cache stays off.
+        """
+        if HISTORY_CACHE_MODE == "local":
+            return True
+        if HISTORY_CACHE_MODE != "notify":
+            return False
+        if self._invalidation_threads is None:
+            self._start_invalidation_listener()
+        return bool(self._invalidation_threads) and all(thread.is_alive() for thread in self._invalidation_threads)
+
+    def _start_invalidation_listener(self) -> None:
+        """
+        Subscribe to keyspace events on conversation_pairs:* to drop entries written by other nodes.
+        
+        Keyspace events are emitted by the node owning the key, so on a cluster
+        every primary is subscribed (after a failover, HISTORY_CACHE_TTL bounds staleness).
+        """
+        client = self.redis_client
+        if not client:
+            return
+        self._invalidation_threads = False  # Attempted: do not retry on every call
+        node_clients = (
+            [client.get_redis_connection(node) for node in client.get_primaries()]
+            if REDIS_CLUSTER else [client]
+        )
+        threads = []
+        for node_client in node_clients:
+            thread = self._subscribe_keyspace_events(node_client)
+            if thread is None:
+                # A node we cannot hear from would leave stale entries: no cache at all
+                for started in threads:
+                    started.stop()
+                return
+            threads.append(thread)
+        self._invalidation_threads = threads
+        print(f"✅ Conversation history cache enabled (keyspace notifications, {len(threads)} node(s))")
+
+    @staticmethod
+    def _missing_keyspace_flags(client: redis.Redis) -> Tuple[str, str]:
+        """(flags of KEYSPACE_EVENT_FLAGS not enabled on a node, current flags), read with CONFIG GET"""
+        config = client.config_get("notify-keyspace-events")
+        flags = config.get(b"notify-keyspace-events", config.get("notify-keyspace-events", b""))
+        if isinstance(flags, bytes):
+            flags = flags.decode()
+        # "A" is an alias for every event class but does not include "K"
+        return "".join(
+            flag for flag in KEYSPACE_EVENT_FLAGS if flag not in flags and (flag == "K" or "A" not in flags)
+        ), flags
+
+    def _subscribe_keyspace_events(self, client: redis.Redis):
+        """Check keyspace notifications on one node and listen to them in a daemon thread"""
+        db = _connection_settings(**self._settings)["db"]
+        prefix = f"__keyspace@{db}__:conversation_pairs:"
+
+        try:
+            missing, flags = self._missing_keyspace_flags(client)
+            if missing and REDIS_CONFIGURE_NOTIFICATIONS:
+                client.config_set("notify-keyspace-events", flags + missing)
+                missing, _ = self._missing_keyspace_flags(client)
+        except Exception as e:
+            print(f"⚠️ History cache disabled, cannot read notify-keyspace-events ({e}); "
+                  f"use REDIS_HISTORY_CACHE=local on a single node")
+            return None
+        if missing:
+            print(f"⚠️ History cache disabled, keyspace notifications lack flags '{missing}' "
+                  f"(enable them server-side or set REDIS_CONFIGURE_NOTIFICATIONS=1)")
+            return None
+
+        def handle(message):
+            channel_id = channel_from_key_suffix(message["channel"].decode()[len(prefix):])
+            self._history_cache.on_keyspace_event(channel_id, message["data"].decode())
+
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.psubscribe(**{f"{prefix}*": handle})
+            return pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+        except Exception as e:
+            print(f"⚠️ History cache disabled, cannot subscribe to keyspace notifications: {e}")
+            return None
+
+    def _push_entry(
+        self, key: str, entry: Dict[str, Any], fetch_count: int = 0, user_id: Optional[str] = None,
+        parallel: Sequence[Tuple[str, Any]] = (), encoded: Optional[bytes] = None,
+    ) -> Optional[List[str]]:
+        """
+        Push an entry, trim the list and refresh its TTL in a single MULTI/EXEC round trip.
+        
+        The list is trimmed to CONVERSATION_MEMORY_LIMIT entries and to
+        CONVERSATION_MAX_BYTES encoded bytes, whichever is hit first. When
+        fetch_count > 0 the newest fetch_count kept entries are returned by the
+        same script, so the caller gets the up-to-date list for free.
+        When user_id is given it is counted in the distinct-users HyperLogLog.
+        """
+        client = self._connected_client()
+        pipe = client.pipeline(transaction=True)
+        _queue_push(pipe, key, entry, fetch_count=fetch_count, user_id=user_id, parallel=parallel, encoded=encoded)
+        replies = pipe.execute()
+        if user_id and REDIS_CLUSTER:
+            client.pfadd(USERS_HLL_KEY, user_id)
+        return replies[0] if fetch_count else None
 
     def store_conversation_pair(self, channel_id: str, user_id: str, user_query: str, bot_response: str, username: str = None) -> bool:
         """
@@ -58,120 +1016,163 @@ class RedisMemory:
             username: Display name of the user (optional)
             
         Returns:
-            bool: Success status
+            bool: Success status. In degraded mode True means the pair was applied
+            to the in-process mirror and queued for replay, not yet persisted:
+            check `degraded` (a restart before Redis is back loses it)
         """
-        if not self.redis_client:
-            print("⚠️ Redis not available, skipping conversation storage")
-            return False
+        conversation_pair = {
+            "user_id": user_id,
+            "username": username or "Unknown",
+            "user_query": user_query,
+            "bot_response": bot_response,
+            "unix_timestamp": time.time(),
+        }
 
-        try:
-            # Use a dedicated key for conversation pairs to separate from crew memory items
-            key = f"conversation_pairs:{channel_id}"
-
-            conversation_pair = {
-                "user_id": user_id,
-                "username": username or "Unknown",
-                "user_query": user_query,
-                "bot_response": bot_response,
-                "timestamp": datetime.now().isoformat(),
-                "unix_timestamp": int(datetime.now().timestamp()),
-            }
-
-            self.redis_client.lpush(key, json.dumps(conversation_pair))
-            self.redis_client.ltrim(key, 0, CONVERSATION_MEMORY_LIMIT - 1)
-            self.redis_client.expire(key, CONVERSATION_TTL)
+        if not self._available_client():
+            self._queue_write("pair", channel_id, conversation_pair, user_id)
+            print(f"⚠️ Redis not available, conversation pair kept in memory for channel {channel_id}")
+            return True
 
+        try:
+            self._write_pair(channel_id, conversation_pair, user_id)
             print(f"✅ Stored user/bot conversation pair for channel {channel_id}")
             return True
+        except REDIS_CONNECTION_ERRORS as e:
+            self._enter_degraded_mode(e)
+            self._queue_write("pair", channel_id, conversation_pair, user_id)
+            return True
         except Exception as e:
             print(f"❌ Error storing conversation pair: {e}")
             return False
 
+    def _write_pair(self, channel_id: str, conversation_pair: Dict[str, Any], user_id: str) -> None:
+        # Use a dedicated key for conversation pairs to separate from crew memory items
+        key = channel_key("conversation_pairs", channel_id)
+
+        # Write and read back the channel history in one round trip, then write it
+        # through to the cache: the next question on this channel skips Redis entirely
+        cache_enabled = self._history_cache_enabled()
+        if cache_enabled and HISTORY_CACHE_MODE == "notify":
+            # Only a notification listener ever consumes these counts
+            self._history_cache.expect_own_write(channel_id)
+        vectors_key = channel_key("conversation_pair_vectors", channel_id)
+        encoded = encode_entry(conversation_pair)
+        pairs_raw = self._push_entry(
+            key, conversation_pair, fetch_count=CONVERSATION_MEMORY_LIMIT, user_id=user_id,
+            parallel=[(vectors_key, b"")], encoded=encoded,
+        )
+        self._vector_filler.submit(key, vectors_key, encoded, pair_text(conversation_pair))
+        pairs = _decode_pairs(pairs_raw)
+        if cache_enabled:
+            self._history_cache.put(channel_id, pairs)
+        self._local.put_pairs(channel_id, pairs)
+
     def store_memory_item(self, channel_id: str, value: str, metadata: Dict[str, Any]) -> bool:
-        """Store a generic memory item used by Crew short term memory."""
-        if not self.redis_client:
-            print("⚠️ Redis not available, skipping memory storage")
-            return False
+        """Store a generic memory item used by Crew short term memory (queued while degraded, see store_conversation_pair)."""
+        entry = {
+            "value": value,
+            "metadata": metadata or {},
+            "unix_timestamp": time.time(),
+        }
+
+        if not self._available_client():
+            self._queue_write("item", channel_id, entry)
+            return True
 
         try:
-            key = self._get_conversation_key(channel_id)
-            entry = {
-                "value": value,
-                "metadata": metadata or {},
-                "timestamp": datetime.now().isoformat(),
-                "unix_timestamp": int(datetime.now().timestamp()),
-            }
-            self.redis_client.lpush(key, json.dumps(entry))
-            self.redis_client.ltrim(key, 0, CONVERSATION_MEMORY_LIMIT - 1)
-            self.redis_client.expire(key, CONVERSATION_TTL)
+            self._write_item(channel_id, entry)
             print(f"✅ Stored crew memory item for channel {channel_id}")
             return True
+        except REDIS_CONNECTION_ERRORS as exc:
+            self._enter_degraded_mode(exc)
+            self._queue_write("item", channel_id, entry)
+            return True
         except Exception as exc:
             print(f"❌ Error storing memory item: {exc}")
             return False
 
-    def get_memory_items(self, channel_id: str, limit: int, query: Optional[str] = None) -> List[Dict]:
-        """Retrieve stored memory items, optionally filtered by a query substring."""
-        if not self.redis_client:
-            return []
+    def _write_item(self, channel_id: str, entry: Dict[str, Any]) -> None:
+        value = entry["value"]
+        key, vectors_key = self._get_conversation_key(channel_id), channel_key("conversation_vectors", channel_id)
+        encoded = encode_entry(entry)
+        self._push_entry(key, entry, encoded=encoded, parallel=[
+            (channel_key("conversation_terms", channel_id), terms_value(value)),
+            (vectors_key, b""),
+        ])
+        self._vector_filler.submit(key, vectors_key, encoded, value)
+        self._local.push_item(channel_id, entry)
+
+    def get_memory_items(
+        self, channel_id: str, limit: int, query: Optional[str] = None, score_threshold: float = 0.0
+    ) -> List[Dict]:
+        """
+        Retrieve stored memory items, newest first, or the items matching a query.
+        
+        With a query, items are scored server-side (share of the query terms found
+        in the item, 0..1) and only those scoring >= score_threshold come back,
+        best first, with their "score". Items written before the terms index
+        existed are substring-filtered in Python.
+        """
+        client = self._available_client()
+        if not client:
+            return self._local.search_items(channel_id, limit, query, score_threshold)
 
         try:
             key = self._get_conversation_key(channel_id)
-            # Fetch more items than requested to allow simple filtering
-            fetch_count = max(limit, CONVERSATION_MEMORY_LIMIT)
-            items_json = self.redis_client.lrange(key, 0, fetch_count - 1)
-            if not items_json:
-                return []
-
-            results: List[Dict[str, Any]] = []
-            lowered_query = query.lower() if query else None
-
-            for item_json in items_json:
-                try:
-                    entry = json.loads(item_json)
-                except json.JSONDecodeError:
-                    continue
-
-                if lowered_query and lowered_query not in entry.get("value", "").lower():
-                    continue
-
-                results.append(entry)
-                if len(results) >= limit:
-                    break
+            search_args = _search_args(limit, query, score_threshold) if query else None
+            if search_args is None:
+                return _filter_memory_items(client.lrange(key, 0, limit - 1), limit)
 
+            results, indexed, total = _decode_search_reply(client.eval(
+                SEARCH_SCRIPT, 2, key, channel_key("conversation_terms", channel_id), *search_args
+            ))
+            if total > indexed and len(results) < limit:
+                legacy_raw = client.lrange(key, indexed, total - 1)
+                results.extend(_filter_memory_items(legacy_raw, limit - len(results), query))
             return results
+        except REDIS_CONNECTION_ERRORS as exc:
+            self._enter_degraded_mode(exc)
+            return self._local.search_items(channel_id, limit, query, score_threshold)
         except Exception as exc:
             print(f"❌ Error retrieving memory items: {exc}")
             return []
+
+    def search_memory(
+        self, channel_id: str, query: str, limit: int, score_threshold: float = 0.0, pairs: bool = False
+    ) -> Optional[List[Dict]]:
+        """
+        Rank a channel's memory items (or conversation pairs) by embedding similarity.
         
+        Entries and their float16 vectors are read in one MULTI/EXEC and scored
+        in a single matrix product; entries scoring >= score_threshold come back
+        best first with their cosine "score". Entries whose vector is still being
+        computed in the background are not ranked yet.
+        
+        Returns:
+            Ranked entries, or None when vector search is unavailable (Redis down,
+            embeddings disabled, or no vector stored yet) so callers can fall back
+        """
+        query_vector = embed_query(query) if query else None
+        client = self._available_client() if query_vector is not None else None
+        if not client:
+            return None
+
         try:
-            key = self._get_conversation_key(channel_id)
-            
-            # Create conversation pair with timestamp and user info
-            conversation_pair = {
-                'user_id': user_id,        # UUID
-                'username': username or "Unknown",  # Display name
-                'user_query': user_query,
-                'bot_response': bot_response,
-                'timestamp': datetime.now().isoformat(),
-                'unix_timestamp': int(datetime.now().timestamp())
-            }
-            
-            # Add to list (newest first)
-            self.redis_client.lpush(key, json.dumps(conversation_pair))
-            
-            # Maintain the limit - keep only last N conversations FOR THE ENTIRE CHANNEL
-            self.redis_client.ltrim(key, 0, CONVERSATION_MEMORY_LIMIT - 1)
-            
-            # Set expiration
-            self.redis_client.expire(key, CONVERSATION_TTL)
-            
-            print(f"✅ Stored conversation pair for channel {channel_id} (channel-wide limit)")
-            return True
-            
-        except Exception as e:
-            print(f"❌ Error storing conversation: {e}")
-            return False
+            if pairs:
+                key, vectors_key = channel_key("conversation_pairs", channel_id), channel_key("conversation_pair_vectors", channel_id)
+            else:
+                key, vectors_key = self._get_conversation_key(channel_id), channel_key("conversation_vectors", channel_id)
+            pipe = client.pipeline(transaction=True)
+            pipe.lrange(vectors_key, 0, -1)
+            pipe.lrange(key, 0, -1)
+            vectors_raw, entries_raw = pipe.execute()
+            return _rank_by_vectors(query_vector, vectors_raw, entries_raw, limit, score_threshold)
+        except REDIS_CONNECTION_ERRORS as exc:
+            self._enter_degraded_mode(exc)
+            return None
+        except Exception as exc:
+            print(f"❌ Error searching memory: {exc}")
+            return None
 
     def get_conversation_history(self, channel_id: str, user_id: str = None, limit: Optional[int] = None) -> List[Dict]:
         """
@@ -185,57 +1186,71 @@ class RedisMemory:
         Returns:
             List of conversation pairs in chronological order (oldest first)
         """
-        if not self.redis_client:
-            print("⚠️ Redis not available, returning empty history")
-            return []
+        # Determine how many to fetch
+        if limit is None:
+            limit = CONVERSATION_MEMORY_LIMIT
+
+        client = self._available_client()
+        if not client:
+            print("⚠️ Redis not available, returning in-memory history")
+            return list(reversed(self._local.items(channel_id)[:limit]))
         
         try:
             key = self._get_conversation_key(channel_id)
             
-            # Determine how many to fetch
-            if limit is None:
-                limit = CONVERSATION_MEMORY_LIMIT
-            
             # Get conversations (newest first from Redis)
-            conversations_json = self.redis_client.lrange(key, 0, limit - 1)
+            conversations_raw = client.lrange(key, 0, limit - 1)
             
-            if not conversations_json:
+            if not conversations_raw:
                 print(f"📝 No conversation history found for channel {channel_id}")
                 return []
             
             # Parse and reverse to get chronological order (oldest first)
             conversations = []
-            for conv_json in reversed(conversations_json):  # Reverse to get oldest first
-                try:
-                    conversations.append(json.loads(conv_json))
-                except json.JSONDecodeError as e:
-                    print(f"⚠️ Error parsing conversation data: {e}")
+            now = time.time()
+            for conv_raw in reversed(conversations_raw):  # Reverse to get oldest first
+                conversation = decode_entry(conv_raw)
+                if conversation is None:
+                    print("⚠️ Error parsing conversation data, entry skipped")
                     continue
+                if _is_fresh(conversation, now):
+                    conversations.append(conversation)
             
             print(f"📚 Retrieved {len(conversations)} conversation pairs for channel {channel_id}")
             return conversations
             
+        except REDIS_CONNECTION_ERRORS as e:
+            self._enter_degraded_mode(e)
+            return list(reversed(self._local.items(channel_id)[:limit]))
         except Exception as e:
             print(f"❌ Error retrieving conversation history: {e}")
             return []
 
-    def build_conversation_context(self, conversation_history: List[Dict]) -> str:
+    def build_conversation_context(self, conversation_history: List[Dict], summary: Optional[str] = None) -> str:
         """
         Build conversation context string from history for system prompt augmentation
         
         Args:
             conversation_history: List of conversation pairs
+            summary: Rolling summary of the turns older than conversation_history (optional)
             
         Returns:
             Formatted conversation context string
         """
-        if not conversation_history:
+        if not conversation_history and not summary:
             return ""
         
-        context_lines = [
+        context_lines = []
+        if summary:
+            context_lines.extend([
+                "➤ RÉSUMÉ DES ÉCHANGES PLUS ANCIENS:",
+                summary,
+                ""
+            ])
+        context_lines.extend([
             "➤ HISTORIQUE DE CONVERSATION RÉCENTE (interactions récentes, de la plus ancienne à la plus récente):",
             ""
-        ]
+        ])
         
         # Show conversations in chronological order (oldest to newest)
         for i, pair in enumerate(conversation_history, 1):
@@ -268,92 +1283,230 @@ class RedisMemory:
         Returns:
             List of conversation pairs (oldest first)
         """
-        if not self.redis_client:
+        if limit is None:
+            limit = CONVERSATION_MEMORY_LIMIT
+
+        if limit <= 0:
             return []
 
-        try:
-            key = f"conversation_pairs:{channel_id}"
-            if limit is None:
-                limit = CONVERSATION_MEMORY_LIMIT
+        if self._degraded:
+            return self._local.pairs(channel_id, limit)
 
-            pairs_json = self.redis_client.lrange(key, 0, limit - 1)
-            if not pairs_json:
-                return []
+        cache_enabled = self._history_cache_enabled()
+        if cache_enabled:
+            cached = self._history_cache.get(channel_id)
+            if cached is not None:
+                return cached[-limit:]
 
-            pairs = []
-            for pair_json in reversed(pairs_json):
-                try:
-                    pairs.append(json.loads(pair_json))
-                except json.JSONDecodeError:
-                    continue
+        client = self._available_client()
+        if not client:
+            return self._local.pairs(channel_id, limit)
 
-            return pairs
+        try:
+            key = channel_key("conversation_pairs", channel_id)
+            # Read the whole retention window so any later limit can be served from memory
+            pairs = _decode_pairs(client.lrange(key, 0, max(limit, CONVERSATION_MEMORY_LIMIT) - 1))
+            if cache_enabled:
+                self._history_cache.put(channel_id, pairs)
+            self._local.put_pairs(channel_id, pairs)
+            return pairs[-limit:]
+        except REDIS_CONNECTION_ERRORS as e:
+            self._enter_degraded_mode(e)
+            return self._local.pairs(channel_id, limit)
         except Exception as e:
             print(f"❌ Error retrieving conversation pairs: {e}")
             return []
 
+    def get_conversation_summary(self, channel_id: str) -> Dict[str, Any]:
+        """
+        Retrieve the rolling summary stored next to the conversation pairs.
+        
+        Returns:
+            {"summary": str, "covered_until": str} - covered_until is the ISO
+            timestamp of the newest pair folded into the summary ("" if none)
+        """
+        client = self._available_client()
+        if not client:
+            return self._local.summary(channel_id)
+
+        try:
+            fields = client.hgetall(channel_key("conversation_summary", channel_id))
+            summary = {
+                "summary": fields.get(b"summary", b"").decode("utf-8"),
+                "covered_until": fields.get(b"covered_until", b"").decode("utf-8"),
+            }
+            self._local.put_summary(channel_id, summary)
+            return summary
+        except REDIS_CONNECTION_ERRORS as e:
+            self._enter_degraded_mode(e)
+            return self._local.summary(channel_id)
+        except Exception as e:
+            print(f"❌ Error retrieving conversation summary: {e}")
+            return {"summary": "", "covered_until": ""}
+
+    def store_conversation_summary(self, channel_id: str, summary: str, covered_until: str) -> bool:
+        """
+        Store the rolling summary with the same TTL as the conversation pairs (one round trip).
+        
+        Returns:
+            bool: Success status - see store_conversation_pair for degraded mode
+        """
+        entry = {"summary": summary, "covered_until": covered_until}
+
+        if not self._available_client():
+            self._queue_write("summary", channel_id, entry)
+            return True
+
+        try:
+            self._write_summary(channel_id, entry)
+            return True
+        except REDIS_CONNECTION_ERRORS as e:
+            self._enter_degraded_mode(e)
+            self._queue_write("summary", channel_id, entry)
+            return True
+        except Exception as e:
+            print(f"❌ Error storing conversation summary: {e}")
+            return False
+
+    def _write_summary(self, channel_id: str, entry: Dict[str, str]) -> None:
+        key = channel_key("conversation_summary", channel_id)
+        pipe = self._connected_client().pipeline(transaction=True)
+        pipe.hset(key, mapping=entry)
+        pipe.expire(key, CONVERSATION_TTL)
+        pipe.execute()
+        self._local.put_summary(channel_id, entry)
+
     def get_conversation_count(self, channel_id: str, user_id: str = None) -> int:
         """Get the number of stored conversations for a channel"""
-        if not self.redis_client:
-            return 0
+        client = self._available_client()
+        if not client:
+            return len(self._local.items(channel_id))
         
         try:
             key = self._get_conversation_key(channel_id)
-            return self.redis_client.llen(key)
+            return client.llen(key)
+        except REDIS_CONNECTION_ERRORS as e:
+            self._enter_degraded_mode(e)
+            return len(self._local.items(channel_id))
         except Exception as e:
             print(f"❌ Error getting conversation count: {e}")
             return 0
 
     def clear_conversation_history(self, channel_id: str, user_id: str = None) -> bool:
-        """Clear conversation history for a channel"""
-        if not self.redis_client:
-            return False
+        """Clear conversation history for a channel (queued while degraded, see store_conversation_pair)"""
+        if not self._available_client():
+            self._queue_write("clear", channel_id)
+            return True
         
         try:
-            key = self._get_conversation_key(channel_id)
-            self.redis_client.delete(key)
+            self._delete_items(channel_id)
             print(f"🗑️ Cleared conversation history for channel {channel_id}")
             return True
+        except REDIS_CONNECTION_ERRORS as e:
+            self._enter_degraded_mode(e)
+            self._queue_write("clear", channel_id)
+            return True
         except Exception as e:
             print(f"❌ Error clearing conversation history: {e}")
             return False
 
-    def get_memory_stats(self) -> Dict:
-        """Get memory usage statistics"""
-        if not self.redis_client:
-            return {"status": "disconnected"}
+    def _delete_items(self, channel_id: str) -> None:
+        self._connected_client().delete(
+            self._get_conversation_key(channel_id),
+            channel_key("conversation_terms", channel_id),
+            channel_key("conversation_vectors", channel_id),
+        )
+        self._local.clear_items(channel_id)
+
+    def get_memory_stats(self, max_age: Optional[float] = None) -> Dict:
+        """
+        Get memory usage statistics.
         
-        try:
-            # Get all conversation keys
-            conversation_keys = self.redis_client.keys("conversation:*")
-            
-            stats = {
-                "status": "connected",
-                "total_channels": len(conversation_keys),
-                "memory_limit_per_channel": CONVERSATION_MEMORY_LIMIT,
-                "ttl_days": CONVERSATION_TTL // 86400,
-                "redis_info": {
-                    "host": os.getenv("REDIS_HOST"),
-                    "port": os.getenv("REDIS_PORT"),
-                    "db": os.getenv("REDIS_DB")
-                }
+        Keys are walked incrementally with SCAN (never KEYS) and each batch is
+        measured with one pipeline. Results are cached for max_age seconds
+        (REDIS_STATS_CACHE_SECONDS by default) so dashboards don't hammer Redis.
+        
+        Args:
+            max_age: Maximum age in seconds of a cached result (0 forces a fresh scan)
+        """
+        if max_age is None:
+            max_age = STATS_CACHE_SECONDS
+        cached = self._stats_cache
+        if cached and time.monotonic() - cached[0] < max_age:
+            return cached[1]
+
+        if not self._available_client():
+            return {
+                "status": "degraded",
+                "queued_writes": len(self._pending_writes),
+                "local_channels": len(self._local),
             }
-            
+        
+        try:
+            started = time.perf_counter()
+            stats = self._collect_memory_stats()
+            stats.update(self._stats_metadata(started))
+            self._stats_cache = (time.monotonic(), stats)
             return stats
             
         except Exception as e:
             print(f"❌ Error getting memory stats: {e}")
             return {"status": "error", "error": str(e)}
 
+    def _stats_metadata(self, started: float) -> Dict[str, Any]:
+        """Static part of the stats report (limits, connection info, timing)"""
+        return {
+            "memory_limit_per_channel": CONVERSATION_MEMORY_LIMIT,
+            "byte_budget_per_list": CONVERSATION_MAX_BYTES,
+            "max_entry_age_seconds": CONVERSATION_MAX_AGE,
+            "ttl_days": CONVERSATION_TTL // 86400,
+            "redis_info": {
+                key: value
+                for key, value in _connection_settings(**self._settings).items()
+                if key != "password"
+            },
+            "collected_at": datetime.now().isoformat(),
+            "scan_duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    def _collect_memory_stats(self) -> Dict[str, Any]:
+        """Walk conversation keys with SCAN, one LLEN/TTL pipeline (+ MEMORY USAGE pipeline) per batch"""
+        collector = _MemoryStatsCollector()
+        # scan_iter walks every primary on a cluster; keys are measured in batches
+        batch: List[bytes] = []
+        for raw_key in self.redis_client.scan_iter(match="conversation*", count=STATS_SCAN_COUNT):
+            batch.append(raw_key)
+            if len(batch) >= STATS_SCAN_COUNT:
+                self._measure_stats_batch(collector, batch)
+                batch = []
+        self._measure_stats_batch(collector, batch)
+        return collector.result(self.redis_client.pfcount(USERS_HLL_KEY))
 
-# Global instance
-redis_memory = RedisMemory()
+
+    def _measure_stats_batch(self, collector: "_MemoryStatsCollector", raw_keys: List[bytes]) -> None:
+        keys = collector.select_keys(raw_keys)
+        if keys:
+            pipe = self.redis_client.pipeline(transaction=False)
+            collector.queue_batch(pipe, keys)
+            collector.add_replies(keys, pipe.execute())
+            sample = collector.memory_sample(keys)
+            if sample:
+                pipe = self.redis_client.pipeline(transaction=False)
+                collector.queue_memory(pipe, sample)
+                collector.add_memory_replies(pipe.execute(raise_on_error=False))
+
+
+# Global instance (lazy: importing this module does not touch the network)
+redis_memory = get_redis_memory()
 
 
 # CrewAI Storage compatibility wrapper
 class RedisStorage(Storage):
     """
     CrewAI Storage interface wrapper for Redis conversation memory
+
+    Wraps either a blocking RedisMemory (default) or an AsyncRedisMemory passed
+    as `memory`; coroutines of the latter are run on the loop owning its pool.
     """
     
     def __init__(
@@ -364,13 +1517,27 @@ class RedisStorage(Storage):
         password: str = None,
         namespace: str = "medical_crew",
         user: str = None,
+        memory=None,
         **kwargs
     ):
         """Initialize with user/channel ID for conversation isolation"""
         self.user = user or "default_channel"
         self.namespace = namespace
         self._memory_channel = f"{self.namespace}:{self.user}:{MEMORY_KEY_SUFFIX}"
-        # The actual Redis connection is handled by the global redis_memory instance
+        # Shared lazily-connected memory: storages pointing at the same Redis reuse one pool
+        self.memory = memory or get_redis_memory(host=host, port=port, db=db, password=password)
+
+    def bind_channel(self, user: str) -> None:
+        """Switch to another user/channel (pooled crews are rebound before each run)"""
+        self.user = user or "default_channel"
+        self._memory_channel = f"{self.namespace}:{self.user}:{MEMORY_KEY_SUFFIX}"
+
+    def _call(self, method: str, *args, **kwargs):
+        """Call a memory method, blocking on the result when the memory is asynchronous"""
+        result = getattr(self.memory, method)(*args, **kwargs)
+        if inspect.isawaitable(result):
+            return self.memory.run_sync(result)
+        return result
         
     def save(self, value: str, metadata: Dict[str, Any] = None) -> None:
         """Save method for CrewAI compatibility - stores as conversation"""
@@ -379,15 +1546,19 @@ class RedisStorage(Storage):
             return
 
         metadata = metadata or {}
-        redis_memory.store_memory_item(self._memory_channel, value, metadata)
+        self._call("store_memory_item", self._memory_channel, value, metadata)
 
     def search(self, query: str, limit: int, score_threshold: float) -> List[Dict]:
         """
         Search short-term memory: first check conversation pairs, then fallback to memory items.
-        Formats results for CrewAI consumption.
+        Entries are ranked by cosine similarity with the query (vectors stored at write time)
+        and filtered by score_threshold. Formats results for CrewAI consumption.
         """
-        # Try conversation pairs first (cleaner format for interactive memory)
-        conv_pairs = redis_memory.get_conversation_pairs(self._memory_channel, limit=limit)
+        # Conversation pairs first (cleaner format for interactive memory), ranked by
+        # embedding similarity; most recent pairs when no vector is available
+        conv_pairs = self._call("search_memory", self._memory_channel, query, limit, score_threshold, pairs=True)
+        if conv_pairs is None:
+            conv_pairs = self._call("get_conversation_pairs", self._memory_channel, limit=limit)
         
         if conv_pairs:
             crewai_format: List[Dict[str, Any]] = []
@@ -402,18 +1573,24 @@ class RedisStorage(Storage):
                             "username": pair.get("username", "Unknown"),
                             "timestamp": pair.get("timestamp", ""),
                         },
+                        "score": pair.get("score", 1.0),
                     }
                 )
             return crewai_format
         
-        # Fallback to generic memory items if no conversation pairs found
-        items = redis_memory.get_memory_items(self._memory_channel, limit=limit, query=query)
+        # Fallback to generic memory items: embedding ranking, else term scoring server-side
+        items = self._call("search_memory", self._memory_channel, query, limit, score_threshold)
+        if items is None:
+            items = self._call(
+                "get_memory_items", self._memory_channel, limit=limit, query=query, score_threshold=score_threshold
+            )
         crewai_format = []
         for entry in items:
             crewai_format.append(
                 {
                     "content": entry.get("value", ""),
                     "metadata": entry.get("metadata", {}),
+                    "score": entry.get("score", 1.0),
                 }
             )
 
@@ -422,7 +1599,7 @@ class RedisStorage(Storage):
     def reset(self) -> None:
         """Reset/clear stored conversations for this user/channel"""
         if self.user:
-            redis_memory.clear_conversation_history(self._memory_channel)
+            self._call("clear_conversation_history", self._memory_channel)
 
 
 # Module-level wrapper functions for backward compatibility
@@ -0,0 +1,39 @@
+"""
+Shared local sentence embedder (sentence-transformers) for short user questions.
+Loaded once per process on first use; runs on CPU in a few milliseconds per question.
+"""
+import os
+import threading
+from typing import List
+
+import numpy as np
+
+TEXT_EMBEDDING_MODEL = os.getenv("TEXT_EMBEDDING_MODEL", "paraphrase-multilingual-MiniLM-L12-v2")
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_text_embedder():
+    """Return the process-wide SentenceTransformer, loading it on first call"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer  # import lourd, différé
+
+                print(f"🔧 Chargement du modèle d'embeddings texte: {TEXT_EMBEDDING_MODEL}")
+                _model = SentenceTransformer(TEXT_EMBEDDING_MODEL, device="cpu")
+    return _model
+
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """L2-normalized float32 embeddings, one row per text (dot product = cosine)"""
+    embeddings = get_text_embedder().encode(
+        texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False
+    )
+    return embeddings.astype(np.float32)
+
+
+def embed_text(text: str) -> np.ndarray:
+    return embed_texts([text])[0]
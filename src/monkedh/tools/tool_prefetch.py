@@ -0,0 +1,87 @@
+"""
+Concurrent tool prefetch before the crew kickoff.
+
+The task prompt makes the agent call the image tool and the RAG tool before
+answering, and each call costs a full LLM turn just to decide to invoke it. The
+prefetcher runs both tools in a thread pool while the conversation context is
+built, and their results are collected before an LLM slot is requested, so a
+slow tool never holds a slot or a crew. Follow-ups ("et pour un bébé ?") are
+searched together with the previous question. The outputs go into the task
+inputs ({image_context}, {protocol_context}), so the agent can answer in one
+iteration. It still calls the tools itself when a result is missing or off-topic.
+"""
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional
+
+TOOL_PREFETCH_ENABLED = os.getenv("TOOL_PREFETCH", "on").lower() not in ("off", "0", "false")
+TOOL_PREFETCH_TIMEOUT = float(os.getenv("TOOL_PREFETCH_TIMEOUT", 8))   # Attente maximale des résultats (s)
+TOOL_PREFETCH_WORKERS = int(os.getenv("TOOL_PREFETCH_WORKERS", 4))     # 2 outils par question en vol
+TOOL_PREFETCH_QUERY_CHARS = 300                                        # Longueur maximale de la requête envoyée aux outils
+
+MISSING_IMAGE_CONTEXT = "Aucune image préchargée : appelle l'outil image si la situation le nécessite."
+MISSING_PROTOCOL_CONTEXT = "Aucun protocole préchargé : appelle l'outil RAG si la situation le nécessite."
+
+
+def prefetch_query(question: str, conversation_history: Optional[List[Dict[str, Any]]] = None) -> str:
+    """Tool query for a question: a follow-up is prefixed with the previous user question"""
+    previous = (conversation_history[-1].get("user_query") or "").strip() if conversation_history else ""
+    query = f"{previous} {question}" if previous else question
+    return query[-TOOL_PREFETCH_QUERY_CHARS:]
+
+
+class ToolPrefetcher:
+    """Run the image and RAG tools concurrently on the question and its previous turn."""
+
+    def __init__(self, image_tool, rag_tool, timeout: float = TOOL_PREFETCH_TIMEOUT, enabled: bool = TOOL_PREFETCH_ENABLED):
+        """
+        Args:
+            image_tool: "Search Emergency Image Database" tool
+            rag_tool: FirstAidSearchTool instance
+            timeout: Seconds collect() waits for both results together
+            enabled: False makes collect() return the "call the tool yourself" placeholders
+        """
+        self.image_tool = image_tool
+        self.rag_tool = rag_tool
+        self.timeout = timeout
+        self.enabled = enabled
+        self._executor = ThreadPoolExecutor(max_workers=TOOL_PREFETCH_WORKERS, thread_name_prefix="prefetch")
+
+    @staticmethod
+    def _timed(tool, **kwargs) -> Dict[str, Any]:
+        started = time.perf_counter()
+        output = tool.run(**kwargs)
+        return {"output": output, "ms": (time.perf_counter() - started) * 1000}
+
+    def submit(self, question: str, conversation_history: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Future]:
+        """Start both tool calls; returns their futures for collect()"""
+        if not self.enabled or not question:
+            return {}
+        question = prefetch_query(question, conversation_history)
+        return {
+            "image_context": self._executor.submit(self._timed, self.image_tool, query=question),
+            "protocol_context": self._executor.submit(self._timed, self.rag_tool, query=question),
+        }
+
+    def collect(self, futures: Dict[str, Future]) -> Dict[str, str]:
+        """Task inputs from the prefetched results, with placeholders for failed or late calls"""
+        inputs = {"image_context": MISSING_IMAGE_CONTEXT, "protocol_context": MISSING_PROTOCOL_CONTEXT}
+        deadline = time.monotonic() + self.timeout
+        timings = []
+        for name, future in futures.items():
+            try:
+                result = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                print(f"⚠️ Préchargement {name} trop lent (> {self.timeout:g} s), l'agent appellera l'outil")
+                continue
+            except Exception as e:
+                print(f"⚠️ Préchargement {name} en échec: {e}")
+                continue
+            output = str(result["output"] or "")
+            if output and not output.lstrip().startswith("❌ Error"):  # Erreurs RAG renvoyées comme texte
+                inputs[name] = output
+                timings.append(f"{name} {result['ms']:.0f} ms")
+        if timings:
+            print(f"🔧 Outils préchargés en parallèle: {', '.join(timings)}")
+        return inputs
@@ -0,0 +1,296 @@
+"""
+Fast-path triage in front of the crew.
+
+Greetings, thanks, goodbyes and a few fixed questions (emergency numbers, what the
+assistant does) get a templated answer without any LLM call. Each input is routed
+in three steps:
+    1. urgent guard: anything with a life-threatening keyword goes to the crew
+    2. keyword rules on the normalized text (exact phrases, short messages only)
+    3. nearest prototype phrase with the shared sentence embedder (cosine >= TRIAGE_THRESHOLD)
+Everything else, i.e. every open question, is routed to "crew" (semantic answer
+cache, then agents).
+
+Templates are only used outside of an ongoing exchange: when the last answer of
+the recent history gave instructions or asked something, "ok", "compris" or
+"merci" acknowledge a step (e.g. during a CPR walkthrough) and go to the crew.
+
+When TRIAGE_AUDIT_LOG is set, each decision is appended to that JSONL file by a
+background thread, with size-based rotation.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from .answer_cache import normalize_question
+from .llm_limiter import PRIORITY_URGENT, question_priority
+
+TRIAGE_ENABLED = os.getenv("TRIAGE_ROUTER", "on").lower() not in ("off", "0", "false")
+TRIAGE_THRESHOLD = float(os.getenv("TRIAGE_THRESHOLD", 0.82))      # Similarité cosinus minimale avec un prototype
+TRIAGE_MAX_WORDS = 8                                                # Au-delà, le message est une vraie question
+TRIAGE_HISTORY_WINDOW = float(os.getenv("TRIAGE_HISTORY_WINDOW", 900))   # Un échange plus ancien (s) n'est plus en cours
+TRIAGE_AUDIT_LOG = os.getenv("TRIAGE_AUDIT_LOG", "")                # Journal JSONL des décisions (vide = désactivé)
+TRIAGE_AUDIT_MAX_BYTES = int(os.getenv("TRIAGE_AUDIT_MAX_BYTES", 5_000_000))  # Rotation du journal au-delà de cette taille
+TRIAGE_AUDIT_BACKUPS = 3                                            # Fichiers de journal archivés conservés
+TRIAGE_AUDIT_QUESTION_CHARS = 200                                   # Longueur maximale de la question journalisée
+
+ROUTE_CREW = "crew"
+
+TEMPLATES = {
+    "greeting": (
+        "Bonjour, je suis l'assistant d'urgence. Décrivez-moi la situation : que s'est-il passé, "
+        "la victime est-elle consciente et respire-t-elle normalement ?"
+    ),
+    "thanks": (
+        "Je vous en prie. Je reste disponible si la situation évolue. "
+        "En cas d'urgence vitale, appelez le 190 (SAMU)."
+    ),
+    "exit": "Au revoir. Prenez soin de vous et n'hésitez pas à rappeler.",
+    "emergency_numbers": (
+        "Numéros d'urgence en Tunisie : SAMU 190 | Protection Civile 198 | Police 197. "
+        "En cas d'urgence vitale, appelez immédiatement le 190."
+    ),
+    "capabilities": (
+        "Je suis un assistant de premiers secours : je vous guide pas à pas face à une urgence "
+        "(arrêt cardiaque, étouffement, hémorragie, brûlure, malaise...), avec des illustrations, "
+        "et je vous indique qui appeler. Décrivez-moi la situation."
+    ),
+}
+
+# Whole-message keyword rules (normalized text)
+KEYWORD_RULES = {
+    "exit": {
+        "q", "quit", "exit", "quitter", "au revoir", "bye", "goodbye", "stop", "arrêter", "arreter",
+        "fin", "c'est fini", "à bientôt", "a bientot", "bonne journée", "bonne journee", "bonne soirée",
+        "bonne soiree",
+    },
+    "greeting": {
+        "bonjour", "bonsoir", "salut", "coucou", "hello", "hi", "hey", "salam", "aslema", "allo", "allô",
+    },
+    "thanks": {
+        "merci", "merci beaucoup", "merci bien", "thanks", "thank you", "d'accord", "ok", "okay",
+        "ok merci", "d'accord merci", "c'est noté", "c'est note", "compris", "parfait", "super",
+    },
+}
+
+# Prototype phrases for the embedding step
+PROTOTYPES = {
+    "greeting": [
+        "bonjour", "bonjour comment allez vous", "salut ça va", "bonsoir il y a quelqu'un",
+        "hello how are you", "allô vous m'entendez",
+    ],
+    "thanks": [
+        "merci beaucoup pour votre aide", "merci c'est gentil", "d'accord j'ai compris merci",
+        "thank you very much", "ok c'est bon merci",
+    ],
+    "exit": [
+        "au revoir et merci", "je vais raccrocher", "c'est tout pour moi", "on arrête là",
+        "goodbye see you",
+    ],
+    "emergency_numbers": [
+        "quel est le numéro du samu", "quel numéro appeler en cas d'urgence", "numéro des pompiers",
+        "numéro de la protection civile", "numéro de la police", "what is the emergency number",
+    ],
+    "capabilities": [
+        "qui êtes vous", "que pouvez vous faire", "tu es un robot", "à quoi sers tu",
+        "what can you do",
+    ],
+}
+
+
+# Answers that leave the user mid-procedure: numbered steps, first-aid imperatives or a question
+INSTRUCTION_PATTERN = re.compile(
+    r"(?im)^\s*(?:\d+[.)]|[-•*]|étape)\s"
+    r"|\b(?:appelez|placez|posez|appuyez|comprimez|continuez|comptez|vérifiez|allongez|basculez|inclinez|"
+    r"pincez|soufflez|insufflez|répétez|recommencez|alternez|tournez|mettez|gardez|surveillez|restez|"
+    r"maintenez|donnez|retirez|refroidissez|rincez|couvrez|levez|penchez|ouvrez|faites|dites-moi)\b"
+    r"|\?\s*$"
+)
+
+
+def _embed_texts(texts: List[str]) -> np.ndarray:
+    from .text_embedding import embed_texts  # charge sentence-transformers au premier usage
+
+    return embed_texts(texts)
+
+
+class TriageRouter:
+    """Keyword + embedding classifier sending non-questions to templated answers."""
+
+    def __init__(
+        self,
+        embed_fn: Optional[Callable[[List[str]], np.ndarray]] = None,
+        threshold: float = TRIAGE_THRESHOLD,
+        audit_path: Optional[str] = TRIAGE_AUDIT_LOG,
+        enabled: bool = TRIAGE_ENABLED,
+    ):
+        """
+        Args:
+            embed_fn: texts -> L2-normalized matrix (defaults to the shared sentence embedder)
+            threshold: Minimum cosine similarity with a prototype phrase
+            audit_path: Rotated JSONL file receiving every routing decision (None or "" disables it)
+            enabled: False routes everything to the crew
+        """
+        self.embed_fn = embed_fn or _embed_texts
+        self.threshold = threshold
+        self.audit_path = audit_path
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._audit_handler: Optional[QueueHandler] = None
+        self._audit_listener: Optional[QueueListener] = None
+        if audit_path:
+            self._start_audit_log(audit_path)
+        self._routes: List[str] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._embeddings_available = True
+
+    def _prototype_matrix(self) -> Optional[np.ndarray]:
+        """Embed the prototype phrases once; None when the embedder cannot be loaded"""
+        if self._matrix is None and self._embeddings_available:
+            with self._lock:
+                if self._matrix is None and self._embeddings_available:
+                    routes, phrases = [], []
+                    for route, examples in PROTOTYPES.items():
+                        routes += [route] * len(examples)
+                        phrases += [normalize_question(example) for example in examples]
+                    try:
+                        self._matrix = np.asarray(self.embed_fn(phrases), dtype=np.float32)
+                        self._routes = routes
+                    except Exception as e:
+                        print(f"⚠️ Triage par embeddings désactivé (règles uniquement): {e}")
+                        self._embeddings_available = False
+        return self._matrix
+
+    @staticmethod
+    def keyword_route(normalized: str) -> Optional[str]:
+        """Route of a message that is exactly one of the KEYWORD_RULES phrases (or a greeting + thanks mix)"""
+        for route, phrases in KEYWORD_RULES.items():
+            if normalized in phrases:
+                return route
+        words = normalized.replace("'", " ").split()
+        if words and len(words) <= 4:
+            if all(word in KEYWORD_RULES["greeting"] for word in words):
+                return "greeting"
+            if all(word in KEYWORD_RULES["thanks"] or word in KEYWORD_RULES["greeting"] for word in words):
+                return "thanks"
+        return None
+
+    @staticmethod
+    def in_conversation(conversation_history: Optional[List[Dict[str, Any]]]) -> bool:
+        """True when the last recent answer gave instructions or asked the user something"""
+        if not conversation_history:
+            return False
+        last = conversation_history[-1]
+        timestamp = last.get("unix_timestamp")
+        if timestamp and time.time() - float(timestamp) > TRIAGE_HISTORY_WINDOW:
+            return False
+        return bool(INSTRUCTION_PATTERN.search(last.get("bot_response") or ""))
+
+    def is_exit(self, text: str) -> bool:
+        """True when the message only asks to end the session ("au revoir", "merci au revoir"...)"""
+        normalized = normalize_question(text)
+        if self.keyword_route(normalized) == "exit":
+            return True
+        # Multi-word goodbyes inside a short message; single words ("fin", "stop") must stand alone
+        return (
+            len(normalized.split()) <= 5
+            and any(" " in phrase and phrase in normalized for phrase in KEYWORD_RULES["exit"])
+            and question_priority(text) != PRIORITY_URGENT
+        )
+
+    def route(
+        self, question: str, channel_id: str = "", conversation_history: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Classify one input.
+
+        Args:
+            question: User message
+            channel_id: Channel, for the audit log
+            conversation_history: Recent conversation pairs (oldest first); templates other
+                than goodbyes are not used while the last answer awaits a follow-up
+
+        Returns:
+            {"route", "answer", "method", "score", "latency_ms"}; answer is None for the crew route
+        """
+        started = time.perf_counter()
+        normalized = normalize_question(question)
+        route, method, score = ROUTE_CREW, "default", 0.0
+
+        if not self.enabled:
+            method = "disabled"
+        elif question_priority(question) == PRIORITY_URGENT:
+            method = "urgent_guard"
+        else:
+            keyword = self.keyword_route(normalized)
+            if keyword:
+                route, method, score = keyword, "keyword", 1.0
+            elif normalized and len(normalized.split()) <= TRIAGE_MAX_WORDS:
+                matrix = self._prototype_matrix()
+                if matrix is not None and matrix.size:
+                    try:
+                        scores = matrix @ np.asarray(self.embed_fn([normalized]), dtype=np.float32)[0]
+                        best = int(np.argmax(scores))
+                        score = float(scores[best])
+                        if score >= self.threshold:
+                            route, method = self._routes[best], "embedding"
+                        else:
+                            method = "embedding_below_threshold"
+                    except Exception as e:
+                        print(f"⚠️ Triage par embeddings indisponible: {e}")
+            if route not in (ROUTE_CREW, "exit") and self.in_conversation(conversation_history):
+                route, method = ROUTE_CREW, f"{method}_in_conversation"
+
+        decision = {
+            "route": route,
+            "answer": TEMPLATES.get(route),
+            "method": method,
+            "score": round(score, 4),
+            "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+        self._audit(channel_id, question, decision)
+        return decision
+
+    def _start_audit_log(self, path: str) -> None:
+        """Write audit records from a background thread to a size-rotated file"""
+        try:
+            file_handler = RotatingFileHandler(
+                path, maxBytes=TRIAGE_AUDIT_MAX_BYTES, backupCount=TRIAGE_AUDIT_BACKUPS, encoding="utf-8", delay=True,
+            )
+        except OSError as e:
+            print(f"⚠️ Journal de triage désactivé: {e}")
+            return
+        records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        self._audit_handler = QueueHandler(records)
+        self._audit_listener = QueueListener(records, file_handler)
+        self._audit_listener.start()
+        atexit.register(self.close)
+
+    def close(self) -> None:
+        """Flush pending audit records and stop the writer thread"""
+        if self._audit_listener is not None:
+            self._audit_listener.stop()
+            self._audit_listener = None
+            self._audit_handler = None
+
+    def _audit(self, channel_id: str, question: str, decision: Dict[str, Any]) -> None:
+        """Queue a routing decision for the JSONL audit log"""
+        if self._audit_handler is None:
+            return
+        record = {
+            "timestamp": datetime.now().isoformat(),
+            "channel_id": channel_id,
+            "question": (question or "")[:TRIAGE_AUDIT_QUESTION_CHARS],
+            **{key: value for key, value in decision.items() if key != "answer"},
+        }
+        self._audit_handler.emit(logging.makeLogRecord({"msg": json.dumps(record, ensure_ascii=False)}))
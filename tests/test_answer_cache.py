@@ -0,0 +1,44 @@
+"""
+Test du cache sémantique des réponses sur un Redis simulé (fakeredis)
+Vérifie qu'une question d'ouverture est servie depuis le cache et qu'une question
+posée en cours de conversation ne l'est jamais (l'état de l'urgence change la réponse).
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from monkedh.tools.answer_cache import KEY_PREFIX, SemanticAnswerCache, normalize_question
+
+
+def embed(text):
+    vector = np.zeros(64, dtype=np.float32)
+    for word in normalize_question(text).split():
+        vector[hash(word) % 64] += 1.0
+    return vector / max(np.linalg.norm(vector), 1e-6)
+
+
+@pytest.fixture
+def cache():
+    memory = SimpleNamespace(redis_client=fakeredis.FakeRedis(server=fakeredis.FakeServer()))
+    return SemanticAnswerCache(memory, embed_fn=embed)
+
+
+def test_opening_question_is_served_from_cache(cache):
+    assert cache.store("Comment faire un massage cardiaque ?", "Appuyez au centre de la poitrine.")
+    hit = cache.lookup("comment faire un massage cardiaque")
+    assert hit and hit["answer"] == "Appuyez au centre de la poitrine."
+
+
+def test_mid_conversation_question_bypasses_cache_without_redis(cache):
+    cache.store("Comment faire un massage cardiaque ?", "Appuyez au centre de la poitrine.")
+    history = [{"user_query": "Mon bébé de 6 mois ne respire plus", "bot_response": "Appelez le 190."}]
+    assert cache.lookup("Comment faire un massage cardiaque ?", history) is None
+    assert not cache.store("Comment faire un massage cardiaque ?", "Deux doigts.", history)
+
+    stats = cache.get_stats()
+    assert stats["bypassed"] == 1 and stats["hits"] == 0
+    assert b"bypassed" not in cache.memory.redis_client.hgetall(f"{KEY_PREFIX}:stats")
@@ -0,0 +1,60 @@
+"""
+Test du streaming de la réponse finale (console et TTS)
+Vérifie que seul le texte qui suit le marqueur « Final Answer: » est transmis, même
+quand le marqueur est coupé entre deux tokens, que chaque appel LLM repart de zéro
+et que les phrases sont regroupées puis lues dans l'ordre.
+"""
+
+from monkedh.tools.answer_streaming import SENTENCE_MIN_CHARS, FinalAnswerFilter, SentenceSpeaker
+
+
+def test_only_text_after_split_marker_is_forwarded():
+    tokens = []
+    stream = FinalAnswerFilter(tokens.append)
+    for chunk in ("Thought: je sais", " répondre\nFinal Ans", "wer:", "  ", " Appelez", " le 190."):
+        stream.feed(chunk)
+    assert "".join(tokens) == "Appelez le 190."
+    assert stream.streamed
+
+
+def test_each_llm_call_looks_for_the_marker_again():
+    tokens = []
+    stream = FinalAnswerFilter(tokens.append)
+    stream.feed("Final Answer: Action: recherche")
+    stream.reset()
+    stream.feed("Thought: j'ai les protocoles\n")
+    stream.feed("Final Answer: Allongez la victime.")
+    assert tokens == ["Action: recherche", "Allongez la victime."]
+
+
+def test_call_without_marker_forwards_nothing():
+    tokens = []
+    stream = FinalAnswerFilter(tokens.append)
+    stream.feed("Thought: je dois chercher\nAction: protocol_search")
+    assert tokens == [] and not stream.streamed
+
+
+def test_sentences_are_grouped_and_spoken_in_order():
+    spoken = []
+    speaker = SentenceSpeaker(spoken.append)
+    for token in ("Oui. ", "Appelez le 190 immédiatement. ", "Commencez le massage", " cardiaque", "! Fin"):
+        speaker.feed(token)
+    speaker.finish()
+    assert spoken == ["Oui. Appelez le 190 immédiatement.", "Commencez le massage cardiaque!", "Fin"]
+    assert all(len(sentence) >= SENTENCE_MIN_CHARS for sentence in spoken[:-1])
+    assert speaker.spoken == 3
+
+
+def test_tts_errors_do_not_stop_the_following_sentences():
+    spoken = []
+
+    def speak(sentence):
+        if not spoken:
+            spoken.append(None)
+            raise RuntimeError("TTS indisponible")
+        spoken.append(sentence)
+
+    speaker = SentenceSpeaker(speak)
+    speaker.feed("Première phrase assez longue pour partir. Deuxième phrase assez longue aussi. ")
+    speaker.finish()
+    assert spoken == [None, "Deuxième phrase assez longue aussi."]
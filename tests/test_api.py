@@ -0,0 +1,86 @@
+"""
+Test de l'API de service avec une fonction de réponse simulée (sans crewai ni LLM)
+Vérifie l'ordre d'exécution par canal, le parallélisme entre canaux, la contre-pression
+(429 / 503) et le flux SSE.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient
+
+from monkedh.api import ChatRequest, Overloaded, SessionScheduler, create_app
+
+
+def make_answer_fn(delay=0.05):
+    calls = []
+    lock = threading.Lock()
+
+    def answer(channel_id, user_id, username, question, on_token=None):
+        with lock:
+            calls.append((channel_id, question, time.perf_counter()))
+        for word in ("Appelez", "le", "190."):
+            if on_token:
+                on_token(word + " ")
+        time.sleep(delay)
+        return f"réponse à {question}"
+
+    return answer, calls
+
+
+def test_channel_questions_run_in_arrival_order_and_channels_in_parallel():
+    answer, calls = make_answer_fn(delay=0.1)
+
+    async def scenario():
+        scheduler = SessionScheduler(answer, workers=4, max_pending=10, channel_max_pending=3)
+        tasks = [scheduler.submit(ChatRequest(channel_id="a", question=f"q{i}")) for i in range(3)]
+        tasks.append(scheduler.submit(ChatRequest(channel_id="b", question="q0")))
+        started = time.perf_counter()
+        results = await asyncio.gather(*tasks)
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(scenario())
+    assert results[:3] == ["réponse à q0", "réponse à q1", "réponse à q2"]
+    assert [question for channel, question, _ in calls if channel == "a"] == ["q0", "q1", "q2"]
+    # Channel b did not wait behind channel a
+    assert elapsed < 0.1 * 4
+
+
+def test_backpressure_rejects_before_queueing():
+    answer, _ = make_answer_fn()
+
+    async def scenario():
+        scheduler = SessionScheduler(answer, workers=1, max_pending=3, channel_max_pending=2)
+        tasks = [scheduler.submit(ChatRequest(channel_id="a", question=f"q{i}")) for i in range(2)]
+        with pytest.raises(Overloaded) as channel_full:
+            scheduler.submit(ChatRequest(channel_id="a", question="q2"))
+        tasks.append(scheduler.submit(ChatRequest(channel_id="b", question="q0")))
+        with pytest.raises(Overloaded) as deployment_full:
+            scheduler.submit(ChatRequest(channel_id="c", question="q0"))
+        await asyncio.gather(*tasks)
+        return channel_full.value.status_code, deployment_full.value.status_code, scheduler.get_stats()
+
+    channel_status, deployment_status, stats = asyncio.run(scenario())
+    assert (channel_status, deployment_status) == (429, 503)
+    assert stats["rejected"] == 2 and stats["queued"] == 0 and stats["active_channels"] == 0
+
+
+def test_sse_stream_and_health():
+    answer, _ = make_answer_fn(delay=0)
+    client = TestClient(create_app(answer, workers=2))
+
+    with client.stream("POST", "/chat/stream", json={"channel_id": "a", "question": "q"}) as response:
+        body = "".join(response.iter_text())
+    assert response.status_code == 200
+    assert body.count("event: token") == 3
+    assert "event: done" in body and "réponse à q" in body
+
+    assert client.post("/chat", json={"channel_id": "a", "question": "q"}).json()["answer"] == "réponse à q"
+    assert client.get("/health/live").json() == {"status": "ok"}
+    assert client.get("/health/ready").json()["scheduler"]["completed"] == 2
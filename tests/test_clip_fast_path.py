@@ -0,0 +1,66 @@
+"""
+Test du chemin rapide par mots-clés du retriever d'images (sans encodage CLIP)
+Vérifie que les règles d'âge (bébé / adulte) et RCP du chemin CLIP s'appliquent aussi
+aux candidats mots-clés, que la pertinence rapportée reflète la couverture de la requête
+et qu'un préfixe de catégorie ambigu est signalé au lieu d'être deviné.
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("clip")
+
+from monkedh.tools.image_suggestion import clip_retriever
+from monkedh.tools.image_suggestion.clip_retriever import AmbiguousCategory, EmergencyImageRetriever
+
+
+@pytest.fixture(scope="module")
+def retriever():
+    """Keyword index over the shipped metadata, without loading the CLIP model"""
+    metadata_path = Path(clip_retriever.__file__).parent / "image_metadata.json"
+    with open(metadata_path, encoding="utf-8") as f:
+        metadata = json.load(f)["images"]
+    retriever = EmergencyImageRetriever.__new__(EmergencyImageRetriever)
+    retriever.metadata = metadata
+    retriever.valid_indices = list(range(len(metadata)))
+    retriever._build_keyword_index()
+    retriever._build_category_index()
+    return retriever
+
+
+def filenames(results):
+    return [Path(result["filename"]).name for result in results or []]
+
+
+def test_age_conflict_sends_query_to_clip(retriever):
+    # Keyword winners are adult images: the baby query must not be served from the index
+    assert retriever._fast_path("bouche à bouche bébé", 1) is None
+    assert retriever._fast_path("nourrisson heimlich", 1) is None
+    assert filenames(retriever._fast_path("heimlich adulte", 1)) == ["adult_heimlich_abdominal_thrusts.png"]
+
+
+def test_cpr_images_only_for_cpr_queries(retriever):
+    assert retriever._fast_path("bouche à bouche", 1) is None
+    assert filenames(retriever._fast_path("rcp bouche à bouche adulte", 1)) == ["adult_cpr_rescue_breathing.png"]
+
+
+def test_similarity_is_query_coverage(retriever):
+    full = retriever._fast_path("rcp bouche à bouche adulte", 1)
+    partial = retriever._fast_path("rcp bouche à bouche adulte tombé dans la piscine hier soir", 1)
+    assert full[0]["similarity"] == pytest.approx(1.0)
+    assert partial[0]["similarity"] < 0.5
+    # Coverage is not a CLIP cosine: relevance is judged against the keyword threshold
+    assert (full[0]["match_type"], full[0]["relevant"]) == ("keyword", True)
+    assert not partial[0]["relevant"]
+
+
+def test_category_prefix_must_be_unambiguous(retriever):
+    assert retriever.resolve_category("CPR") == "rcp"
+    assert retriever.resolve_category("heim") == "etouffement"
+    assert retriever.resolve_category("adulte") is None
+    with pytest.raises(AmbiguousCategory) as ambiguous:
+        retriever.resolve_category("position")
+    assert ambiguous.value.candidates == ["Position Latérale de Sécurité", "Positionnement"]
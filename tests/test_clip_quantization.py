@@ -0,0 +1,97 @@
+"""
+Test de parité de l'encodeur texte CLIP quantifié (int8 dynamique, CPU)
+Vérifie que l'image top-1 des requêtes de référence de clip_retriever.py est inchangée
+et compare latence et mémoire (RSS) entre le modèle float32 et le modèle int8.
+"""
+
+import gc
+import os
+import time
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("clip")
+
+from monkedh.tools.image_suggestion.clip_retriever import (
+    SAMPLE_QUERIES,
+    EmergencyImageRetriever,
+)
+
+
+def current_rss_mb() -> float:
+    """RSS courant du processus en Mo (Linux /proc, sinon psutil)"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def top1_filenames(retriever: EmergencyImageRetriever) -> list:
+    """Image top-1 de chaque requête de référence, chemin CLIP forcé (sans fast path mots-clés)"""
+    return [
+        retriever.retrieve(query, top_k=1, use_fast_path=False)[0]["filename"]
+        for query in SAMPLE_QUERIES
+    ]
+
+
+def time_text_encoder(retriever: EmergencyImageRetriever, repeats: int = 20) -> float:
+    """Latence moyenne (ms) d'un encodage texte, cache désactivé"""
+    retriever._encode_texts([SAMPLE_QUERIES[0]])  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for query in SAMPLE_QUERIES:
+            retriever._encode_texts([query])
+    return (time.perf_counter() - start) * 1000 / (repeats * len(SAMPLE_QUERIES))
+
+
+@pytest.fixture(scope="module")
+def retriever():
+    return EmergencyImageRetriever(text_cache_path="", warm_cache=False, quantize=False)
+
+
+def test_quantized_text_encoder_keeps_top1(retriever):
+    if retriever.device != "cpu":
+        pytest.skip("La quantification dynamique int8 ne s'applique qu'au CPU")
+
+    float_top1 = top1_filenames(retriever)
+    retriever.use_quantized_text_encoder(True)
+    try:
+        quantized_top1 = top1_filenames(retriever)
+    finally:
+        retriever.use_quantized_text_encoder(False)
+
+    assert quantized_top1 == float_top1
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("COMPARAISON ENCODEUR TEXTE CLIP : FLOAT32 vs INT8")
+    print("=" * 60)
+
+    rss_before = current_rss_mb()
+    retriever = EmergencyImageRetriever(text_cache_path="", warm_cache=False, quantize=False)
+    rss_float = current_rss_mb()
+    float_top1 = top1_filenames(retriever)
+    float_ms = time_text_encoder(retriever)
+
+    gc.collect()
+    rss_before_int8 = current_rss_mb()
+    retriever.use_quantized_text_encoder(True)
+    rss_int8 = current_rss_mb()
+    quantized_top1 = top1_filenames(retriever)
+    int8_ms = time_text_encoder(retriever)
+
+    print(f"\nParité top-1 : {'✓ identique' if quantized_top1 == float_top1 else '✗ DIFFÉRENTE'}")
+    for query, f_name, q_name in zip(SAMPLE_QUERIES, float_top1, quantized_top1):
+        marker = "✓" if f_name == q_name else "✗"
+        print(f"  {marker} {query}: {os.path.basename(f_name)} / {os.path.basename(q_name)}")
+
+    print(f"\nLatence encodage texte : float32 {float_ms:.1f} ms | int8 {int8_ms:.1f} ms "
+          f"(x{float_ms / int8_ms:.2f})")
+    print(f"RSS modèle float32 : +{rss_float - rss_before:.0f} Mo")
+    print(f"RSS encodeur int8  : +{rss_int8 - rss_before_int8:.0f} Mo (en plus du modèle float, "
+          f"conservé pour les embeddings images)")
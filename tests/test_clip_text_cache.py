@@ -0,0 +1,75 @@
+"""
+Test du cache des embeddings texte CLIP du retriever d'images (encodeur simulé)
+Vérifie que les variantes triviales d'une requête partagent une entrée, que le LRU
+reste borné, que le pré-chauffage n'encode que les requêtes manquantes et que le
+cache disque est ignoré s'il a été construit par un autre encodeur.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("clip")
+
+from monkedh.tools.image_suggestion.clip_retriever import EmergencyImageRetriever
+
+
+def make_retriever(tmp_path, size=4, encoder="ViT-B/32"):
+    """Retriever with only the text cache initialised, encoding through a counting stub"""
+    retriever = EmergencyImageRetriever.__new__(EmergencyImageRetriever)
+    retriever.text_encoder_name = encoder
+    retriever.text_cache_size = size
+    retriever.text_cache_path = str(tmp_path / "text_embeddings_cache.npz")
+    retriever._text_cache = OrderedDict()
+    retriever._text_cache_lock = threading.Lock()
+    retriever._text_cache_dirty = False
+    retriever.encoded = []
+
+    def encode_texts(texts):
+        retriever.encoded.extend(texts)
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+    retriever._encode_texts = encode_texts
+    return retriever
+
+
+def test_query_variants_share_one_entry(tmp_path):
+    retriever = make_retriever(tmp_path)
+    first = retriever.encode_query("Massage  Cardiaque")
+    second = retriever.encode_query(" massage cardiaque ")
+    assert retriever.encoded == ["massage cardiaque"]
+    assert first is second
+
+
+def test_cache_is_bounded_lru(tmp_path):
+    retriever = make_retriever(tmp_path, size=2)
+    for query in ("pls", "rcp", "pls", "heimlich"):
+        retriever.encode_query(query)
+    assert list(retriever._text_cache) == ["pls", "heimlich"]
+
+
+def test_warm_encodes_only_missing_queries(tmp_path):
+    retriever = make_retriever(tmp_path, size=4)
+    retriever.encode_query("rcp")
+    assert retriever.warm_text_cache(["RCP", "pls", "Pls", "heimlich", "bébé", "noyade"]) == 4
+    # Only as many as the cache holds, so nothing just warmed is evicted
+    assert retriever.encoded == ["rcp", "pls", "heimlich", "bébé", "noyade"]
+    assert list(retriever._text_cache) == ["pls", "heimlich", "bébé", "noyade"]
+
+
+def test_disk_cache_round_trip_checks_encoder(tmp_path):
+    retriever = make_retriever(tmp_path)
+    retriever.encode_query("position latérale de sécurité")
+    retriever.save_text_cache()
+
+    reloaded = make_retriever(tmp_path)
+    reloaded._load_text_cache()
+    reloaded.encode_query("Position latérale de sécurité")
+    assert reloaded.encoded == []
+
+    quantized = make_retriever(tmp_path, encoder="ViT-B/32-int8")
+    quantized._load_text_cache()
+    assert not quantized._text_cache
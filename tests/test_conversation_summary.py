@@ -0,0 +1,69 @@
+"""
+Test du résumé glissant de la conversation avec une mémoire simulée (sans Redis ni LLM)
+Vérifie que les échanges déjà résumés sont reconnus malgré des fuseaux horaires différents
+et qu'aucun échange n'est perdu quand le budget de tokens en écarte ou que le résumé
+d'arrière-plan est en retard.
+"""
+
+from monkedh.tools.conversation_summary import ConversationSummarizer
+
+
+class FakeMemory:
+    def __init__(self, summary="", covered_until=""):
+        self.state = {"summary": summary, "covered_until": covered_until}
+        self.pairs = []
+
+    def get_conversation_pairs(self, channel_id):
+        return self.pairs
+
+    def get_conversation_summary(self, channel_id):
+        return dict(self.state)
+
+    def store_conversation_summary(self, channel_id, summary, covered_until):
+        self.state = {"summary": summary, "covered_until": covered_until}
+        return True
+
+    def build_conversation_context(self, conversation_history, summary=None):
+        lines = [f"Résumé: {summary}"] if summary else []
+        lines += [f"Q: {turn['user_query']}\nR: {turn['bot_response']}" for turn in conversation_history]
+        return "\n".join(lines)
+
+
+def turn(question, timestamp, answer="Continuez les compressions."):
+    return {"user_query": question, "bot_response": answer, "timestamp": timestamp}
+
+
+def test_covered_turns_are_compared_as_times_not_strings():
+    memory = FakeMemory(summary="Adulte inconscient.", covered_until="2026-01-01T10:00:00+00:00")
+    memory.pairs = [
+        # 09:30 UTC, already folded although the string sorts after covered_until
+        turn("Il ne respire plus", "2026-01-01T10:30:00+01:00"),
+        turn("Il vomit", "2026-01-01T10:15:00Z"),
+        turn("Dernière question", "2026-01-01T10:20:00Z"),
+    ]
+    seen = []
+    summarizer = ConversationSummarizer(memory, summarize_fn=lambda summary, turns: seen.extend(turns) or "ok", raw_turns=1)
+    summarizer._update("canal")
+    assert [pair["user_query"] for pair in seen] == ["Il vomit"]
+    assert memory.state == {"summary": "ok", "covered_until": "2026-01-01T10:15:00Z"}
+
+
+def test_turns_dropped_for_the_budget_are_folded_into_the_summary():
+    memory = FakeMemory()
+    history = [
+        turn("Mon bébé de 6 mois s'étouffe", "2026-01-01T10:00:00", "Donnez 5 tapes dans le dos. " * 40),
+        turn("Ça ne marche pas", "2026-01-01T10:01:00", "Faites 5 compressions thoraciques. " * 40),
+        turn("Il pleure maintenant", "2026-01-01T10:02:00", "Bien, surveillez sa respiration."),
+    ]
+    summarizer = ConversationSummarizer(memory, raw_turns=3, token_budget=200)
+    context, stats = summarizer.build_context("canal", history)
+    assert "Mon bébé de 6 mois s'étouffe" in context
+    assert "Il pleure maintenant" in context
+    assert stats["tokens_used"] < stats["tokens_full"]
+
+
+def test_turns_not_yet_summarized_are_not_skipped():
+    memory = FakeMemory(summary="", covered_until="")
+    history = [turn(f"question {i}", f"2026-01-01T10:0{i}:00") for i in range(4)]
+    context, _ = ConversationSummarizer(memory, raw_turns=2).build_context("canal", history)
+    assert all(f"question {i}" in context for i in range(4))
@@ -0,0 +1,67 @@
+"""
+Test du pool de crews avec un constructeur simulé (sans crewai ni LLM)
+Vérifie la réutilisation des crews, la remise à zéro entre les exécutions et qu'un
+appelant en attente obtient un crew reconstruit quand une exécution échoue.
+"""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from monkedh.crew_pool import CrewPool
+
+
+def make_builder():
+    built = []
+
+    def builder():
+        crew = SimpleNamespace(tasks=[SimpleNamespace(output=None)], agents=[], index=len(built))
+        built.append(crew)
+        return crew
+
+    return builder, built
+
+
+def test_crews_are_reused_and_reset():
+    builder, built = make_builder()
+    pool = CrewPool(builder, size=2)
+    with pool.checkout("a") as crew:
+        crew.tasks[0].output = "réponse"
+    with pool.checkout("b") as again:
+        assert again is crew and again.tasks[0].output is None
+    assert len(built) == 1
+    assert pool.get_stats()["runs"] == 2
+
+
+def test_waiter_gets_a_replacement_when_a_run_fails():
+    builder, built = make_builder()
+    pool = CrewPool(builder, size=1)
+    running, waiter_started, fail = threading.Event(), threading.Event(), threading.Event()
+    got = []
+
+    def failing_run():
+        with pytest.raises(RuntimeError):
+            with pool.checkout("a"):
+                running.set()
+                fail.wait(5)
+                raise RuntimeError("échec du LLM")
+
+    def waiting_run():
+        running.wait(5)
+        waiter_started.set()
+        with pool.checkout("b") as crew:
+            got.append(crew)
+
+    threads = [threading.Thread(target=failing_run), threading.Thread(target=waiting_run)]
+    for thread in threads:
+        thread.start()
+    waiter_started.wait(5)
+    fail.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert got and got[0] is built[1]
+    stats = pool.get_stats()
+    assert (stats["created"], stats["idle"], stats["discarded"]) == (1, 1, 1)
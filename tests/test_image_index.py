@@ -0,0 +1,75 @@
+"""
+Test des index vectoriels d'images (recherche exacte et HNSW local)
+Vérifie que HNSW rend les mêmes voisins que la recherche exacte, que les filtres
+sélectifs retombent sur la recherche exacte, et que le graphe persisté n'est réutilisé
+que si son empreinte correspond aux embeddings et libellés courants.
+"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("clip")
+pytest.importorskip("crewai")
+pytest.importorskip("hnswlib")
+
+from monkedh.tools.image_suggestion import image_index
+from monkedh.tools.image_suggestion.image_index import HnswImageIndex, NumpyImageIndex, index_fingerprint
+
+
+def dataset(n=300, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.normal(size=(n, dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    payloads = [
+        {"category": "RCP" if i % 3 else "Étouffement", "subcategory": "Bébé" if i == 7 else "Adulte"}
+        for i in range(n)
+    ]
+    return embeddings, payloads
+
+
+def rows(results):
+    return [row for row, _ in results]
+
+
+def test_hnsw_matches_exact_search():
+    embeddings, payloads = dataset()
+    exact, hnsw = NumpyImageIndex(embeddings, payloads), HnswImageIndex(embeddings, payloads)
+    query = embeddings[42]
+    assert rows(hnsw.search(query, 5)) == rows(exact.search(query, 5))
+    assert hnsw.search(query, 1)[0] == (42, pytest.approx(1.0, abs=1e-4))
+    filtered = hnsw.search(query, 5, category=" étouffement ")
+    assert rows(filtered) == rows(exact.search(query, 5, category="Étouffement"))
+
+
+def test_selective_filter_falls_back_to_exact_search():
+    embeddings, payloads = dataset()
+    hnsw = HnswImageIndex(embeddings, payloads)
+    # A single row passes the filter: the graph walk cannot collect k neighbours
+    assert rows(hnsw.search(embeddings[0], 3, subcategory="bébé")) == [7]
+    assert hnsw.search(embeddings[0], 3, category="inconnue") == []
+
+
+def test_persisted_graph_reused_only_with_matching_fingerprint(tmp_path, monkeypatch):
+    embeddings, payloads = dataset()
+    index_path = str(tmp_path / "images.hnsw")
+    HnswImageIndex(embeddings, payloads, index_path=index_path)
+    with open(f"{index_path}.sha256", encoding="utf-8") as f:
+        assert f.read() == index_fingerprint(embeddings, payloads)
+
+    built = []
+    original_index = image_index.hnswlib.Index
+
+    class CountingIndex(original_index):
+        def init_index(self, *args, **kwargs):
+            built.append(True)
+            return super().init_index(*args, **kwargs)
+
+    monkeypatch.setattr(image_index.hnswlib, "Index", CountingIndex)
+    HnswImageIndex(embeddings, payloads, index_path=index_path)
+    assert built == []
+
+    relabelled = [dict(payload, category="PLS") for payload in payloads]
+    assert index_fingerprint(embeddings, relabelled) != index_fingerprint(embeddings, payloads)
+    HnswImageIndex(embeddings, relabelled, index_path=index_path)
+    assert built == [True]
@@ -0,0 +1,86 @@
+"""
+Test du limiteur LLM distribué sur un Redis simulé (fakeredis + Lua)
+Vérifie la priorité des urgences vitales, le passage des résumés après les questions,
+la concurrence par canal, l'équité entre canaux (un canal bloqué ne retient pas les autres)
+et le délai de nouvelle tentative.
+"""
+
+import pytest
+
+pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+import fakeredis
+
+from monkedh.tools.llm_limiter import PRIORITY_BACKGROUND, PRIORITY_NORMAL, PRIORITY_URGENT, LLMRateLimiter
+
+
+class FakeMemory:
+    def __init__(self):
+        self.redis_client = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+
+
+def make_limiter(max_concurrent=2, channel_max_concurrent=1):
+    return LLMRateLimiter(
+        FakeMemory(), rate_per_minute=6000, burst=100, channel_rate_per_minute=6000, channel_burst=100,
+        max_concurrent=max_concurrent, channel_max_concurrent=channel_max_concurrent,
+    )
+
+
+def acquire(limiter, channel_id, ticket, priority=PRIORITY_NORMAL):
+    return limiter.try_acquire(limiter.memory.redis_client, channel_id, ticket, priority)
+
+
+def test_urgent_waiter_overtakes_earlier_normal_waiters():
+    limiter = make_limiter(max_concurrent=1)
+    assert acquire(limiter, "a", "running")[0]
+    assert not acquire(limiter, "b", "normal")[0]
+    assert not acquire(limiter, "c", "urgent", PRIORITY_URGENT)[0]
+
+    limiter.release(limiter.memory.redis_client, "a", "running")
+    granted, _, rank = acquire(limiter, "b", "normal")
+    assert not granted and rank == 1
+    assert acquire(limiter, "c", "urgent", PRIORITY_URGENT)[0]
+
+
+def test_background_waiter_yields_to_later_user_turns():
+    limiter = make_limiter(max_concurrent=1)
+    assert acquire(limiter, "a", "running")[0]
+    assert not acquire(limiter, "summary", "background", PRIORITY_BACKGROUND)[0]
+    assert not acquire(limiter, "b", "normal")[0]
+    assert limiter.get_stats()["queued_background"] == 1
+
+    limiter.release(limiter.memory.redis_client, "a", "running")
+    granted, _, rank = acquire(limiter, "summary", "background", PRIORITY_BACKGROUND)
+    assert not granted and rank == 1
+    assert acquire(limiter, "b", "normal")[0]
+
+
+def test_channel_concurrency_is_capped():
+    limiter = make_limiter(max_concurrent=4)
+    assert acquire(limiter, "a", "a1")[0]
+    granted, retry_after, _ = acquire(limiter, "a", "a2")
+    assert not granted and retry_after > 0
+    assert acquire(limiter, "b", "b1")[0]
+
+    limiter.release(limiter.memory.redis_client, "a", "a1")
+    assert acquire(limiter, "a", "a2")[0]
+
+
+def test_blocked_channel_does_not_hold_back_other_channels():
+    limiter = make_limiter(max_concurrent=2)
+    assert acquire(limiter, "a", "a1")[0]
+    # a2 waits for channel a and must not take the last global slot from b1
+    assert not acquire(limiter, "a", "a2")[0]
+    granted, _, rank = acquire(limiter, "b", "b1")
+    assert granted and rank == 0
+
+
+def test_refused_waiters_get_an_estimated_delay():
+    limiter = make_limiter(max_concurrent=1)
+    assert acquire(limiter, "a", "running")[0]
+    granted, retry_after, _ = acquire(limiter, "b", "b1")
+    assert not granted
+    # No run measured yet: about one LLM_HOLD_ESTIMATE, not an immediate retry
+    assert retry_after >= 1
+    assert limiter.get_stats()["queued"] == 1
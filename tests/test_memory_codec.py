@@ -0,0 +1,55 @@
+"""
+Test de l'encodage compact des entrées de mémoire conversationnelle
+Vérifie l'aller-retour (octet magique, champs courts, horodatage à la milliseconde),
+la lecture des anciennes entrées JSON et le seuil de compression zstd.
+"""
+
+import json
+import time
+
+import pytest
+
+from monkedh.tools import memory_codec
+from monkedh.tools.memory_codec import FLAG_ZSTD, MAGIC, ZSTD_MIN_BYTES, decode_entry, encode_entry
+
+PAIR = {
+    "user_id": "user-1",
+    "username": "Témoin",
+    "user_query": "Mon voisin ne respire plus, que faire ?",
+    "bot_response": "Appelez le 190 et commencez le massage cardiaque.",
+    "unix_timestamp": 1767261600.123,
+}
+
+
+def test_round_trip_with_magic_byte():
+    raw = encode_entry(PAIR)
+    assert raw[0] == MAGIC and b"bot_response" not in raw
+    entry = decode_entry(raw)
+    assert {key: entry[key] for key in ("user_id", "username", "user_query", "bot_response")} == {
+        key: PAIR[key] for key in ("user_id", "username", "user_query", "bot_response")
+    }
+    assert entry["unix_timestamp"] == int(PAIR["unix_timestamp"])
+    assert entry["timestamp"].endswith(".123000")
+
+
+def test_legacy_json_entries_stay_readable():
+    legacy = dict(PAIR, timestamp="2026-01-01T10:00:00", unix_timestamp=1767261600)
+    assert decode_entry(json.dumps(legacy)) == legacy
+    assert decode_entry(b"not json") is None
+    assert decode_entry(bytes((MAGIC, 99, 0)) + b"x") is None
+
+
+def test_only_large_entries_are_compressed():
+    pytest.importorskip("zstandard")
+    small = encode_entry(PAIR)
+    large = encode_entry(dict(PAIR, bot_response="Continuez les compressions. " * 100))
+    assert not small[2] & FLAG_ZSTD
+    assert large[2] & FLAG_ZSTD and len(large) < ZSTD_MIN_BYTES * 2
+    assert decode_entry(large)["bot_response"].startswith("Continuez")
+
+
+def test_json_payload_without_msgpack(monkeypatch):
+    monkeypatch.setattr(memory_codec, "msgpack", None)
+    raw = encode_entry(dict(PAIR, unix_timestamp=time.time()))
+    assert raw[2] & memory_codec.FLAG_JSON
+    assert decode_entry(raw)["user_query"] == PAIR["user_query"]
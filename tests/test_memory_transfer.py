@@ -0,0 +1,81 @@
+"""
+Test de l'export / import JSONL de la mémoire conversationnelle sur un Redis simulé
+Vérifie l'aller-retour de chaque type de clé (entrées horodatées à la milliseconde, termes, vecteurs, résumés,
+autres clés par DUMP/RESTORE) avec leur TTL restant, et la fusion ou le
+remplacement des clés existantes à l'import.
+"""
+
+import io
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("crewai")
+pytest.importorskip("lupa")
+fakeredis = pytest.importorskip("fakeredis")
+
+from monkedh.tools import memory_transfer, redis_storage
+from monkedh.tools.memory_codec import decode_entry
+from monkedh.tools.redis_storage import RedisMemory, channel_key
+
+
+def use_client(monkeypatch, client):
+    monkeypatch.setattr(memory_transfer, "get_redis_memory", lambda: SimpleNamespace(redis_client=client))
+
+
+@pytest.fixture
+def exported(monkeypatch):
+    monkeypatch.setattr(redis_storage, "MEMORY_EMBEDDINGS", False)
+    memory = RedisMemory()
+    memory._client = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    for channel_id in ("a", "b"):
+        assert memory.store_conversation_pair(channel_id, "user-1", f"question {channel_id}", "Appelez le 190.")
+        assert memory.store_memory_item(channel_id, f"victime {channel_id}", {"source": "test"})
+    assert memory.store_conversation_summary("a", "Adulte inconscient.", "2026-01-01T10:00:00")
+    memory._client.lset(channel_key("conversation_vectors", "a"), 0, np.ones(4, dtype=np.float16).tobytes())
+    memory._client.set("conversation_crew:user-1:short_term", "brut", ex=600)
+    memory._client.set("autre:cle", "non exportée")
+
+    use_client(monkeypatch, memory._client)
+    out = io.StringIO()
+    assert memory_transfer.export_memory(out, batch_size=2) == 13
+    return memory._client, out.getvalue()
+
+
+def test_export_import_round_trip(exported, monkeypatch):
+    source, jsonl = exported
+    records = [json.loads(line) for line in jsonl.splitlines()]
+    types = {record["key"].split(":", 1)[0]: record["type"] for record in records}
+    assert types == {
+        "conversation": "entries", "conversation_pairs": "entries", "conversation_terms": "strings",
+        "conversation_vectors": "base64", "conversation_pair_vectors": "base64",
+        "conversation_summary": "hash", "conversation_crew": "dump", "conversation_users": "dump",
+    }
+
+    target = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    use_client(monkeypatch, target)
+    assert memory_transfer.import_memory(io.StringIO(jsonl), batch_size=5) == 13
+    assert sorted(target.keys()) == sorted(key for key in source.keys() if key != b"autre:cle")
+    for key in (channel_key("conversation_pairs", "a"), channel_key("conversation", "b")):
+        assert [decode_entry(raw) for raw in target.lrange(key, 0, -1)] == [decode_entry(raw) for raw in source.lrange(key, 0, -1)]
+    for key in (channel_key("conversation_terms", "a"), channel_key("conversation_vectors", "a")):
+        assert target.lrange(key, 0, -1) == source.lrange(key, 0, -1)
+    assert target.hgetall(channel_key("conversation_summary", "a")) == source.hgetall(channel_key("conversation_summary", "a"))
+    assert target.get("conversation_crew:user-1:short_term") == b"brut"
+    assert target.pfcount(redis_storage.USERS_HLL_KEY) == 1
+    assert 0 < target.ttl(channel_key("conversation_pairs", "a")) <= redis_storage.CONVERSATION_TTL
+    assert 0 < target.ttl("conversation_crew:user-1:short_term") <= 600
+
+
+def test_import_merges_unless_replace(exported, monkeypatch):
+    _, jsonl = exported
+    target = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    use_client(monkeypatch, target)
+    key = channel_key("conversation_pairs", "a")
+    memory_transfer.import_memory(io.StringIO(jsonl))
+    memory_transfer.import_memory(io.StringIO(jsonl))
+    assert target.llen(key) == 2
+    memory_transfer.import_memory(io.StringIO(jsonl), replace=True)
+    assert target.llen(key) == 1
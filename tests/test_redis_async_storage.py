@@ -0,0 +1,46 @@
+"""
+Test de la mémoire conversationnelle asynchrone sur un Redis simulé (fakeredis + Lua)
+Vérifie que l'historique relu à l'écriture reste borné et que les pools asyncio
+sont liés à leur boucle d'événements et oubliés avec elle.
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("crewai")
+pytest.importorskip("lupa")
+fakeredis = pytest.importorskip("fakeredis")
+
+from monkedh.tools import redis_async_storage
+from monkedh.tools.redis_async_storage import AsyncRedisMemory, get_async_connection_pool
+
+
+def test_prefetched_pairs_are_served_once_and_bounded(monkeypatch):
+    monkeypatch.setattr(redis_async_storage, "memory_embeddings_enabled", lambda: False)
+
+    async def scenario():
+        memory = AsyncRedisMemory()
+        memory._client = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer())
+        memory._prefetched_pairs.max_channels = 2
+        for channel_id in ("a", "b", "c"):
+            assert await memory.store_conversation_pair(channel_id, "user-1", f"question {channel_id}", "réponse")
+        prefetched = memory._prefetched_pairs.get("c")
+        pairs = await memory.get_conversation_pairs("c")
+        return prefetched, pairs, memory._prefetched_pairs.get("a"), memory._prefetched_pairs.get("c")
+
+    prefetched, pairs, evicted, consumed = asyncio.run(scenario())
+    assert prefetched == pairs and pairs[-1]["user_query"] == "question c"
+    assert evicted is None and consumed is None
+
+
+def test_pools_follow_their_event_loop():
+    async def pool():
+        return get_async_connection_pool()
+
+    first = asyncio.run(pool())
+    second = asyncio.run(pool())
+    assert first is not second
+    # Both loops are closed: no pool bound to either of them can be handed out again
+    assert all(loop.is_closed() for loop in redis_async_storage._async_pools.keys())
+    assert len(redis_async_storage._async_pools) <= 1
@@ -0,0 +1,80 @@
+"""
+Test du mode Redis Cluster de la mémoire conversationnelle
+Vérifie que toutes les clés d'un canal tombent dans le même slot (hash tag {channel_id})
+et, si un cluster local est disponible, qu'écriture / lecture / stats fonctionnent dessus.
+
+Cluster local de test (3 primaires + 3 répliques sur les ports 7000-7005) :
+    docker run -d -e IP=0.0.0.0 -p 7000-7005:7000-7005 grokzen/redis-cluster:7.0.10
+    REDIS_CLUSTER_NODES=127.0.0.1:7000,127.0.0.1:7001,127.0.0.1:7002 REDIS_PASSWORD= pytest tests/test_redis_cluster.py
+"""
+
+import os
+import uuid
+
+import pytest
+
+pytest.importorskip("redis")
+pytest.importorskip("crewai")
+
+from redis.crc import key_slot
+
+from monkedh.tools import redis_storage
+from monkedh.tools.redis_storage import RedisMemory, channel_key, channel_from_key_suffix
+
+CHANNEL_KINDS = ("conversation", "conversation_pairs", "conversation_summary")
+
+
+@pytest.fixture
+def cluster_mode(monkeypatch):
+    monkeypatch.setattr(redis_storage, "REDIS_CLUSTER", True)
+
+
+def test_channel_keys_share_one_slot(cluster_mode):
+    for channel_id in ("default_channel", "monkedh:default_channel:short_term", "voice_channel"):
+        slots = {key_slot(channel_key(kind, channel_id).encode()) for kind in CHANNEL_KINDS}
+        assert len(slots) == 1
+
+
+def test_channel_round_trips_through_key_suffix(cluster_mode):
+    key = channel_key("conversation_pairs", "voice_channel")
+    assert key == "conversation_pairs:{voice_channel}"
+    assert channel_from_key_suffix(key[len("conversation_pairs:"):]) == "voice_channel"
+
+
+def test_single_node_keeps_legacy_key_names(monkeypatch):
+    monkeypatch.setattr(redis_storage, "REDIS_CLUSTER", False)
+    assert channel_key("conversation", "default_channel") == "conversation:default_channel"
+
+
+@pytest.mark.skipif(not os.getenv("REDIS_CLUSTER_NODES"), reason="REDIS_CLUSTER_NODES non défini (pas de cluster local)")
+def test_memory_on_local_cluster(cluster_mode, monkeypatch):
+    monkeypatch.setattr(redis_storage, "REDIS_CLUSTER_NODES", os.environ["REDIS_CLUSTER_NODES"])
+    monkeypatch.setattr(redis_storage, "HISTORY_CACHE_MODE", "off")
+    memory = RedisMemory()
+    assert memory.redis_client is not None
+
+    channels = [f"cluster-test-{uuid.uuid4().hex[:8]}" for _ in range(8)]
+    try:
+        for channel_id in channels:
+            for turn in range(3):
+                assert memory.store_conversation_pair(channel_id, "user-1", f"question {turn}", f"réponse {turn}")
+            assert memory.store_conversation_summary(channel_id, "résumé", "2026-01-01T00:00:00")
+            assert memory.store_memory_item(channel_id, "valeur", {"source": "test"})
+
+            pairs = memory.get_conversation_pairs(channel_id)
+            assert [pair["user_query"] for pair in pairs] == ["question 0", "question 1", "question 2"]
+            assert memory.get_conversation_summary(channel_id)["summary"] == "résumé"
+
+        # Channels are spread over several primaries
+        owners = {
+            memory.redis_client.get_node_from_key(channel_key("conversation_pairs", channel_id)).name
+            for channel_id in channels
+        }
+        assert len(owners) > 1
+
+        stats = memory.get_memory_stats(max_age=0)
+        assert stats["total_pair_channels"] >= len(channels)
+    finally:
+        for channel_id in channels:
+            for kind in CHANNEL_KINDS:
+                memory.redis_client.delete(channel_key(kind, channel_id))
@@ -0,0 +1,251 @@
+"""
+Test de la mémoire conversationnelle Redis sur un Redis simulé (fakeredis + Lua)
+Vérifie le pool de connexions partagé (créé sans I/O, borné, un par instance), l'écriture bornée en un seul aller-retour MULTI/EXEC (nombre d'entrées, budget d'octets, listes parallèles alignées,
+âge maximal à la lecture), la recherche par termes côté serveur (SEARCH_SCRIPT), le calcul des embeddings
+hors du chemin de la requête (case vide remplie ensuite par FILL_VECTOR_SCRIPT), le mode dégradé (écritures appliquées localement, mises en
+file puis rejouées par le thread de santé au retour de Redis), les statistiques mémoire (SCAN, tranches de TTL),
+l'invalidation du cache d'historique (écritures propres, notifications d'autres nœuds, LRU, TTL) et que
+l'échec d'un embedding de requête n'est pas gardé en cache.
+"""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("crewai")
+pytest.importorskip("lupa")
+fakeredis = pytest.importorskip("fakeredis")
+
+from monkedh.tools import redis_storage
+from monkedh.tools.memory_codec import decode_entry, encode_entry
+from monkedh.tools.redis_storage import RedisMemory, _HistoryCache, channel_key, terms_value
+
+ITEM_LISTS = ("conversation", "conversation_terms", "conversation_vectors")
+
+
+@pytest.fixture
+def memory(monkeypatch):
+    monkeypatch.setattr(redis_storage, "MEMORY_EMBEDDINGS", False)
+    memory = RedisMemory()
+    memory._client = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    return memory
+
+
+def list_lengths(memory, channel_id="canal"):
+    return [memory._client.llen(channel_key(kind, channel_id)) for kind in ITEM_LISTS]
+
+
+def test_connection_pool_is_shared_lazy_and_bounded(monkeypatch):
+    monkeypatch.setattr(redis_storage, "_pools", {})
+    monkeypatch.setattr(redis_storage, "_memories", {})
+    pool = redis_storage.get_connection_pool(host="127.0.0.1", port=1, db=0)
+    assert redis_storage.get_connection_pool(host="127.0.0.1", port=1) is pool
+    assert redis_storage.get_connection_pool(host="127.0.0.1", port=1, db=1) is not pool
+    assert pool.max_connections == redis_storage.REDIS_MAX_CONNECTIONS
+    assert not pool._connections or all(connection is None for connection in pool._connections)
+    assert redis_storage.get_redis_memory(host="127.0.0.1", port=1) is redis_storage.get_redis_memory(host="127.0.0.1", port=1, db=0)
+
+
+def test_failed_connection_is_not_retried_during_cooldown(monkeypatch):
+    monkeypatch.setattr(redis_storage, "_pools", {})
+    monkeypatch.setattr(redis_storage, "REDIS_RECONNECT_COOLDOWN", 60)
+    attempts = []
+    get_pool = redis_storage.get_connection_pool
+    monkeypatch.setattr(redis_storage, "get_connection_pool", lambda **settings: attempts.append(settings) or get_pool(**settings))
+    memory = RedisMemory(host="127.0.0.1", port=1)
+    assert attempts == []
+    assert memory.redis_client is None and memory.redis_client is None
+    assert len(attempts) == 1
+
+
+def record_round_trips(client, monkeypatch):
+    """Commands sent outside a pipeline, and the commands of each executed pipeline"""
+    direct, pipelines = [], []
+    execute_command, pipeline = client.execute_command, client.pipeline
+
+    def recording_pipeline(transaction=True, **kwargs):
+        pipe = pipeline(transaction=transaction, **kwargs)
+        execute = pipe.execute
+
+        def recording_execute(*args, **kwargs):
+            pipelines.append((transaction, [command[0][0] for command in pipe.command_stack]))
+            return execute(*args, **kwargs)
+
+        pipe.execute = recording_execute
+        return pipe
+
+    monkeypatch.setattr(client, "execute_command", lambda *args, **kwargs: direct.append(args[0]) or execute_command(*args, **kwargs))
+    monkeypatch.setattr(client, "pipeline", recording_pipeline)
+    return direct, pipelines
+
+
+def test_writes_take_one_transactional_round_trip(memory, monkeypatch):
+    monkeypatch.setattr(redis_storage, "HISTORY_CACHE_MODE", "off")
+    direct, pipelines = record_round_trips(memory._client, monkeypatch)
+    assert memory.store_conversation_pair("canal", "user-1", "Il ne respire plus", "Appelez le 190.")
+    assert memory.store_memory_item("canal", "victime adulte", {})
+    assert direct == []
+    assert pipelines == [(True, ["EVAL", "PFADD"]), (True, ["EVAL"])]
+    assert memory._client.ttl(channel_key("conversation_pairs", "canal")) == redis_storage.CONVERSATION_TTL
+
+
+def test_push_trim_caps_count_and_keeps_parallel_lists_aligned(memory):
+    for i in range(redis_storage.CONVERSATION_MEMORY_LIMIT + 2):
+        assert memory.store_memory_item("canal", f"valeur numéro {i}", {})
+    assert list_lengths(memory) == [redis_storage.CONVERSATION_MEMORY_LIMIT] * 3
+    client = memory._client
+    newest = decode_entry(client.lindex(channel_key("conversation", "canal"), 0))
+    assert newest["value"] == f"valeur numéro {redis_storage.CONVERSATION_MEMORY_LIMIT + 1}"
+    assert client.lindex(channel_key("conversation_terms", "canal"), 0).decode() == terms_value(newest["value"])
+
+
+def test_byte_budget_trims_every_list_but_keeps_the_newest_entry(memory, monkeypatch):
+    monkeypatch.setattr(redis_storage, "CONVERSATION_MAX_BYTES", 300)
+    for i in range(5):
+        assert memory.store_memory_item("canal", "compressions " * 20 + str(i), {})
+    assert list_lengths(memory) == [1, 1, 1]
+    assert decode_entry(memory._client.lindex(channel_key("conversation", "canal"), 0))["value"].endswith("4")
+
+
+def test_search_scores_whole_terms_server_side(memory):
+    # Written before the terms index existed: substring-filtered in Python, after the scored items
+    legacy = {"value": "Ancien arrêt cardiaque", "metadata": {}, "unix_timestamp": time.time()}
+    memory._client.rpush(channel_key("conversation", "canal"), encode_entry(legacy))
+    for value in ("Victime adulte inconsciente", "Arrêt cardiaque chez un adulte", "Bébé qui tousse"):
+        assert memory.store_memory_item("canal", value, {})
+
+    results = memory.get_memory_items("canal", 5, query="arret cardiaque adulte", score_threshold=0.3)
+    assert [(item["value"], round(item["score"], 2)) for item in results] == [
+        ("Arrêt cardiaque chez un adulte", 1.0), ("Victime adulte inconsciente", 0.33),
+    ]
+    assert memory.get_memory_items("canal", 5, query="adulte inconscient", score_threshold=0.6) == []
+    assert [item["value"] for item in memory.get_memory_items("canal", 5, query="cardiaque")] == [
+        "Arrêt cardiaque chez un adulte", "Ancien arrêt cardiaque",
+    ]
+    # No indexable term: newest items, unfiltered
+    assert len(memory.get_memory_items("canal", 5, query="a ?")) == 4
+
+
+VECTORS = {"victime adulte inconsciente": [1, 0, 0, 0], "bébé qui tousse": [0, 1, 0, 0], "arrêt cardiaque": [0.8, 0.6, 0, 0]}
+
+
+def test_vectors_are_filled_after_the_write(memory, monkeypatch):
+    monkeypatch.setattr(redis_storage, "MEMORY_EMBEDDINGS", True)
+    released = threading.Event()
+
+    def embed(text):
+        if text != "arrêt cardiaque":
+            released.wait(5)
+        return np.array(VECTORS[text], dtype=np.float16).tobytes()
+
+    monkeypatch.setattr(redis_storage, "embed_for_memory", embed)
+    redis_storage._cached_query_embedding.cache_clear()
+    memory._vector_filler = redis_storage._VectorFiller(lambda: memory._client)
+    vectors_key = channel_key("conversation_vectors", "canal")
+    for value in ("victime adulte inconsciente", "bébé qui tousse"):
+        assert memory.store_memory_item("canal", value, {})
+    # The write did not wait for the embedder: empty slots, nothing to rank yet
+    assert memory._client.lrange(vectors_key, 0, -1) == [b"", b""]
+    assert memory.search_memory("canal", "arrêt cardiaque", 5) is None
+
+    released.set()
+    deadline = time.monotonic() + 5
+    while b"" in memory._client.lrange(vectors_key, 0, -1) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # Each vector landed in its own entry's slot although later pushes shifted the indexes
+    results = memory.search_memory("canal", "arrêt cardiaque", 5, score_threshold=0.7)
+    assert [(item["value"], round(item["score"], 1)) for item in results] == [("victime adulte inconsciente", 0.8)]
+
+
+def test_entries_older_than_max_age_are_not_read(memory):
+    key = channel_key("conversation_pairs", "canal")
+    stale = {"user_query": "ancienne", "bot_response": "r", "unix_timestamp": time.time() - 2 * redis_storage.CONVERSATION_MAX_AGE}
+    memory._client.lpush(key, encode_entry(stale), encode_entry(dict(stale, user_query="récente", unix_timestamp=time.time())))
+    assert [pair["user_query"] for pair in memory.get_conversation_pairs("canal")] == ["récente"]
+
+
+def test_degraded_mode_queues_writes_and_replays_them(monkeypatch):
+    monkeypatch.setattr(redis_storage, "MEMORY_EMBEDDINGS", False)
+    monkeypatch.setattr(redis_storage, "DEGRADED_HEALTH_CHECK_INTERVAL", 0.01)
+    client, online = fakeredis.FakeRedis(server=fakeredis.FakeServer()), [False]
+    monkeypatch.setattr(RedisMemory, "redis_client", property(lambda self: client if online[0] else None))
+    memory = RedisMemory()
+
+    assert memory.store_conversation_pair("canal", "user-1", "Il ne respire plus", "Appelez le 190.")
+    assert memory.store_memory_item("canal", "victime adulte", {})
+    assert memory.store_conversation_summary("canal", "Adulte inconscient.", "2026-01-01T10:00:00")
+    assert memory.degraded and memory.get_memory_stats()["queued_writes"] == 3
+    assert [pair["user_query"] for pair in memory.get_conversation_pairs("canal")] == ["Il ne respire plus"]
+    assert memory.get_memory_items("canal", 5)[0]["value"] == "victime adulte"
+    assert memory.get_conversation_summary("canal")["summary"] == "Adulte inconscient."
+    assert client.dbsize() == 0
+
+    online[0] = True
+    deadline = time.monotonic() + 5
+    while memory.degraded and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not memory.degraded
+    assert client.llen(channel_key("conversation_pairs", "canal")) == 1
+    assert client.llen(channel_key("conversation", "canal")) == 1
+    assert client.hget(channel_key("conversation_summary", "canal"), "summary") == "Adulte inconscient.".encode()
+
+
+def test_default_ttl_is_counted_in_the_last_bucket(memory):
+    assert memory.store_conversation_pair("canal", "user-1", "Il ne respire plus", "Appelez le 190.")
+    stats = memory.get_memory_stats(max_age=0)
+    assert stats["ttl_distribution"]["6h-24h"] == 1
+    assert stats["ttl_distribution"][">24h"] == 0
+
+
+def test_history_cache_skips_own_writes_and_evicts_on_foreign_ones():
+    cache = _HistoryCache(max_channels=2)
+    cache.expect_own_write("canal")
+    cache.put("canal", ["écrit ici"])
+    for event in ("lpush", "ltrim", "expire"):
+        cache.on_keyspace_event("canal", event)
+    assert cache.get("canal") == ["écrit ici"]
+    # Another node pushed, or the key was deleted
+    cache.on_keyspace_event("canal", "lpush")
+    assert cache.get("canal") is None
+    cache.put("canal", ["relu"])
+    cache.on_keyspace_event("canal", "del")
+    assert cache.get("canal") is None
+
+
+def test_history_cache_is_bounded_by_channels_and_ttl():
+    cache = _HistoryCache(max_channels=2, ttl=0.05)
+    for channel_id in ("a", "b", "c"):
+        cache.put(channel_id, [channel_id])
+        cache.expect_own_write(channel_id)
+    assert cache.get("a") is None and cache.get("c") == ["c"]
+    assert list(cache._own_writes) == ["b", "c"]
+    time.sleep(0.1)
+    assert cache.get("c") is None
+    # An own write whose notification was lost no longer hides a foreign write
+    cache.put("c", ["c"])
+    cache.on_keyspace_event("c", "lpush")
+    assert cache.get("c") is None and "c" not in cache._own_writes
+
+
+def test_history_cache_stays_off_without_confirmed_notifications(memory):
+    # fakeredis does not implement CONFIG GET: the flags cannot be confirmed
+    assert not memory._history_cache_enabled()
+    assert memory.store_conversation_pair("canal", "user-1", "Il ne respire plus", "Appelez le 190.")
+    assert memory._history_cache.get("canal") is None
+
+
+def test_local_history_cache_is_written_through(memory, monkeypatch):
+    monkeypatch.setattr(redis_storage, "HISTORY_CACHE_MODE", "local")
+    assert memory.store_conversation_pair("canal", "user-1", "Il ne respire plus", "Appelez le 190.")
+    memory._client.delete(channel_key("conversation_pairs", "canal"))
+    assert [pair["user_query"] for pair in memory.get_conversation_pairs("canal")] == ["Il ne respire plus"]
+
+
+def test_failed_query_embedding_is_not_cached(monkeypatch):
+    replies = iter([b"", np.ones(4, dtype=np.float16).tobytes()])
+    monkeypatch.setattr(redis_storage, "embed_for_memory", lambda text: next(replies))
+    redis_storage._cached_query_embedding.cache_clear()
+    assert redis_storage.embed_query("arrêt cardiaque") is None
+    assert redis_storage.embed_query("arrêt cardiaque").tolist() == [1.0] * 4
@@ -0,0 +1,77 @@
+"""
+Test des entrées passées au crew par chaque point d'entrée (question, train, test)
+Vérifie que chaque variable interpolée par tasks.yaml est fournie, pour que
+crew.kickoff / crew.train / crew.test ne s'arrêtent pas sur l'interpolation.
+"""
+
+import re
+from contextlib import contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("crewai")
+
+from monkedh import main
+
+TASKS_YAML = Path(main.__file__).parent / "config" / "tasks.yaml"
+
+
+def task_variables():
+    return set(re.findall(r"\{([a-z_]+)\}", TASKS_YAML.read_text(encoding="utf-8")))
+
+
+class FakeCrew:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def kickoff(self, inputs):
+        self.calls.append(("kickoff", inputs))
+        return SimpleNamespace(raw="réponse")
+
+    def train(self, n_iterations, filename, inputs):
+        self.calls.append(("train", inputs))
+
+    def test(self, n_iterations, eval_llm, inputs):
+        self.calls.append(("test", inputs))
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(main, "Monkedh", lambda: SimpleNamespace(crew=lambda: FakeCrew(calls)))
+    monkeypatch.setattr(main.tool_prefetcher, "enabled", False)
+    return calls
+
+
+def test_train_and_test_inputs_cover_task_variables(calls, monkeypatch):
+    monkeypatch.setattr(main.sys, "argv", ["train", "1", "train.pkl"])
+    main.train()
+    monkeypatch.setattr(main.sys, "argv", ["test", "1", "gpt-4o"])
+    main.test()
+    assert [name for name, _ in calls] == ["train", "test"]
+    for _, inputs in calls:
+        assert task_variables() <= set(inputs)
+
+
+def test_process_question_inputs_cover_task_variables(calls, monkeypatch):
+    @contextmanager
+    def checkout(channel_id):
+        yield FakeCrew(calls)
+
+    @contextmanager
+    def slot(channel_id, question):
+        yield
+
+    monkeypatch.setattr(main.redis_memory, "get_conversation_pairs", lambda channel_id, limit: [])
+    monkeypatch.setattr(main.triage_router, "route", lambda *args: {"route": main.ROUTE_CREW})
+    monkeypatch.setattr(main.answer_cache, "lookup", lambda *args: None)
+    monkeypatch.setattr(main.answer_cache, "store", lambda *args: False)
+    monkeypatch.setattr(main.conversation_summarizer, "build_context", lambda channel_id, history: ("", {"tokens_used": 0, "tokens_saved": 0}))
+    monkeypatch.setattr(main.llm_limiter, "slot", slot)
+    monkeypatch.setattr(main, "store_answer", lambda *args: None)
+
+    pool = SimpleNamespace(checkout=checkout)
+    assert main.process_question(pool, "canal", "user-1", "Ali", "Comment faire un massage cardiaque ?") == "réponse"
+    assert task_variables() <= set(calls[0][1])
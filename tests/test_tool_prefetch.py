@@ -0,0 +1,67 @@
+"""
+Test du préchargement concurrent des outils image et RAG (outils simulés)
+Vérifie que les relances sont cherchées avec la question précédente, que les deux outils
+tournent en parallèle et qu'un outil lent, en échec ou désactivé laisse la consigne
+d'appeler l'outil à l'agent.
+"""
+
+import threading
+import time
+
+from monkedh.tools.tool_prefetch import (
+    MISSING_IMAGE_CONTEXT,
+    MISSING_PROTOCOL_CONTEXT,
+    TOOL_PREFETCH_QUERY_CHARS,
+    ToolPrefetcher,
+    prefetch_query,
+)
+
+
+class FakeTool:
+    def __init__(self, output="", delay=0.0, error=None):
+        self.output, self.delay, self.error = output, delay, error
+        self.queries = []
+
+    def run(self, query):
+        self.queries.append(query)
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.output
+
+
+def test_follow_up_query_includes_previous_question():
+    history = [{"user_query": "Mon père s'étouffe", "bot_response": "..."}]
+    assert prefetch_query("et pour un bébé ?", history) == "Mon père s'étouffe et pour un bébé ?"
+    assert prefetch_query("Brûlure à la main") == "Brûlure à la main"
+    assert len(prefetch_query("x" * 1000, history)) == TOOL_PREFETCH_QUERY_CHARS
+
+
+def test_tools_run_concurrently():
+    both_started = threading.Barrier(2, timeout=2)
+
+    class MeetingTool(FakeTool):
+        def run(self, query):
+            both_started.wait()  # Breaks (BrokenBarrierError) if the calls are sequential
+            return super().run(query)
+
+    image, rag = MeetingTool("![pls](pls.png)"), MeetingTool("Protocole PLS")
+    prefetcher = ToolPrefetcher(image, rag, timeout=5)
+    inputs = prefetcher.collect(prefetcher.submit("Position latérale de sécurité"))
+    assert inputs == {"image_context": "![pls](pls.png)", "protocol_context": "Protocole PLS"}
+    assert image.queries == rag.queries == ["Position latérale de sécurité"]
+
+
+def test_slow_failed_or_disabled_tools_leave_placeholders():
+    prefetcher = ToolPrefetcher(FakeTool("image", delay=1.0), FakeTool("❌ Error: Qdrant indisponible"), timeout=0.1)
+    started = time.monotonic()
+    inputs = prefetcher.collect(prefetcher.submit("Hémorragie"))
+    assert time.monotonic() - started < 0.5
+    assert inputs == {"image_context": MISSING_IMAGE_CONTEXT, "protocol_context": MISSING_PROTOCOL_CONTEXT}
+
+    failing = ToolPrefetcher(FakeTool(error=RuntimeError("CLIP indisponible")), FakeTool("Protocole"))
+    assert failing.collect(failing.submit("Brûlure"))["image_context"] == MISSING_IMAGE_CONTEXT
+
+    disabled = ToolPrefetcher(FakeTool("image"), FakeTool("protocole"), enabled=False)
+    assert disabled.submit("Brûlure") == {}
+    assert disabled.collect({}) == {"image_context": MISSING_IMAGE_CONTEXT, "protocol_context": MISSING_PROTOCOL_CONTEXT}
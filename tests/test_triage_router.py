@@ -0,0 +1,69 @@
+"""
+Test du tri rapide des messages devant le crew (embedder simulé, sans LLM)
+Vérifie les réponses préparées (mots-clés, prototype le plus proche), que les urgences et
+les vraies questions vont au crew, qu'un « ok » ou « merci » au milieu d'une procédure
+reste dans l'échange en cours, et que le journal d'audit n'est écrit que sur demande.
+"""
+
+import json
+import time
+
+import numpy as np
+
+from monkedh.tools.answer_cache import normalize_question
+from monkedh.tools.triage_router import PROTOTYPES, ROUTE_CREW, TEMPLATES, TriageRouter
+
+
+def embed(texts):
+    """Bag of words, L2-normalized"""
+    matrix = np.zeros((len(texts), 256), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in normalize_question(text).split():
+            matrix[row, hash(word) % 256] += 1.0
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-6)
+
+
+def pair(bot_response, age=0):
+    return {"user_query": "...", "bot_response": bot_response, "unix_timestamp": time.time() - age}
+
+
+def test_templates_for_small_talk_and_fixed_questions():
+    router = TriageRouter(embed_fn=embed, audit_path=None)
+    assert router.route("Bonjour !")["answer"] == TEMPLATES["greeting"]
+    assert router.route("ok merci")["route"] == "thanks"
+    decision = router.route(PROTOTYPES["emergency_numbers"][0].capitalize() + " ?")
+    assert (decision["route"], decision["method"]) == ("emergency_numbers", "embedding")
+
+
+def test_urgent_and_open_questions_go_to_the_crew():
+    router = TriageRouter(embed_fn=embed, audit_path=None)
+    assert router.route("Bonjour, il ne respire plus")["method"] == "urgent_guard"
+    decision = router.route("Comment soigner une brûlure au deuxième degré sur la main de mon fils ?")
+    assert (decision["route"], decision["answer"]) == (ROUTE_CREW, None)
+    assert TriageRouter(embed_fn=embed, audit_path=None, enabled=False).route("bonjour")["route"] == ROUTE_CREW
+
+
+def test_acknowledgement_during_a_procedure_stays_with_the_crew():
+    router = TriageRouter(embed_fn=embed, audit_path=None)
+    ongoing = [pair("1. Placez vos mains au centre de la poitrine. 2. Comprimez fort.")]
+    decision = router.route("ok", conversation_history=ongoing)
+    assert (decision["route"], decision["answer"], decision["method"]) == (ROUTE_CREW, None, "keyword_in_conversation")
+    # Goodbyes still end the session; a finished or stale exchange gets the template
+    assert router.route("au revoir", conversation_history=ongoing)["route"] == "exit"
+    assert router.route("merci", conversation_history=[pair("Voilà, c'est tout.")])["route"] == "thanks"
+    stale = [pair("Continuez les compressions.", age=2 * 3600)]
+    assert not TriageRouter.in_conversation(stale)
+    assert TriageRouter.in_conversation([pair("Est-ce qu'il respire ?")])
+
+
+def test_audit_log_is_opt_in(tmp_path):
+    path = tmp_path / "triage.jsonl"
+    TriageRouter(embed_fn=embed, audit_path="").route("bonjour", "canal")
+    assert not path.exists()
+
+    router = TriageRouter(embed_fn=embed, audit_path=str(path))
+    router.route("bonjour", "canal")
+    router.close()
+    record = json.loads(path.read_text(encoding="utf-8"))
+    assert (record["channel_id"], record["question"], record["route"]) == ("canal", "bonjour", "greeting")
+    assert "answer" not in record